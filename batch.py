@@ -0,0 +1,133 @@
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from bignum import expand, is_big
+from currency import RateTable
+from expression import SizeBudget, compile_expression
+from money import format_many, format_minor, to_minor, to_minor_many
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Total bits of integer powers and products one line may compute; every
+# digit of the result is written out, which takes about as long again
+LINE_MAX_BITS = 1 << 20
+
+_LINE_BUDGET = SizeBudget(LINE_MAX_BITS)
+
+# Lines such as "100 USD to EUR", "2.5 gbp -> jpy" or "10 EUR → USD"
+CONVERSION_PATTERN = re.compile(
+    r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)\s*([A-Za-z]{3})\s*'
+    r'(?:to|in|->|→)\s*([A-Za-z]{3})\s*$', re.IGNORECASE)
+
+# Rate table used by worker processes, set by init_worker
+_table = None
+
+
+def init_worker(rates):
+    global _table
+    _table = RateTable(rates)
+
+
+def process_line(line, table):
+    """Evaluate one input line and return the text to write for it"""
+    line = line.strip()
+    if not line:
+        return ""
+    try:
+        match = CONVERSION_PATTERN.match(line)
+        if match:
+            amount, from_curr, to_curr = match.groups()
+            from_curr, to_curr = from_curr.upper(), to_curr.upper()
+            result = table.money.convert(to_minor(amount, from_curr), from_curr, to_curr)
+            return format_minor(result, to_curr)
+        with _LINE_BUDGET:
+            value = compile_expression(line, budgeted=True)()
+        # Batch output keeps every digit; str() refuses huge integers
+        return expand(value) if is_big(value) else str(value)
+    except Exception:
+        return "Error"
+
+
+def process_chunk(lines, table=None):
+    """Evaluate a chunk of lines, converting all currency lines in one bulk call"""
+    table = table or _table
+    results = []
+    positions, amounts, from_codes, to_codes = [], [], [], []
+    for line in lines:
+        match = CONVERSION_PATTERN.match(line)
+        if match:
+            amount, from_curr, to_curr = match.groups()
+            from_curr, to_curr = from_curr.upper(), to_curr.upper()
+            if from_curr in table and to_curr in table:
+                positions.append(len(results))
+                amounts.append(amount)
+                from_codes.append(from_curr)
+                to_codes.append(to_curr)
+                results.append(None)
+                continue
+        results.append(process_line(line, table))
+    if positions:
+        money = table.money
+        try:
+            converted = money.convert_many(to_minor_many(amounts, from_codes), from_codes, to_codes)
+        except OverflowError:
+            # Amounts beyond int64 batches are converted one at a time
+            converted = [money.convert(to_minor(amount, from_curr), from_curr, to_curr)
+                         for amount, from_curr, to_curr in zip(amounts, from_codes, to_codes)]
+        for position, result in zip(positions, format_many(converted, to_codes)):
+            results[position] = result
+    return results
+
+
+def _chunks(lines, chunk_size):
+    iterator = iter(lines)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(lines, output, rates, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream lines through the evaluator and write results in input order
+
+    Chunks are fanned out over a process pool with at most two chunks per
+    worker in flight, so memory stays constant regardless of input size.
+    workers=0 evaluates in the current process.
+    """
+    if workers == 0:
+        init_worker(rates)
+        for chunk in _chunks(lines, chunk_size):
+            output.writelines(result + "\n" for result in process_chunk(chunk))
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(rates,)) as executor:
+        max_pending = workers * 2
+        pending = deque()
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(executor.submit(process_chunk, chunk))
+            if len(pending) >= max_pending:
+                output.writelines(result + "\n" for result in pending.popleft().result())
+        while pending:
+            output.writelines(result + "\n" for result in pending.popleft().result())
+
+
+def run_batch_file(path, output_path, rates, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Run a batch from a file path or '-' for stdin/stdout"""
+    source = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    target = sys.stdout if output_path in (None, '-') else open(output_path, 'w', encoding='utf-8')
+    try:
+        run_batch(source, target, rates, workers, chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        else:
+            target.flush()
@@ -0,0 +1,65 @@
+"""Measure mode switching latency in the GUI
+
+Needs a display; on headless machines run it under Xvfb:
+
+    xvfb-run python benchmarks/bench_switch_mode.py --rounds 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["standard", "scientific", "currency", "statistics"]
+
+
+def measure(app, rounds):
+    """Per-switch latencies in milliseconds, including the resulting redraw"""
+    root = app.root
+    samples = []
+    for i in range(rounds):
+        mode = MODES[i % len(MODES)]
+        start = time.perf_counter()
+        app.switch_mode(mode)
+        root.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    import tkinter as tk
+    from gui import AdvancedCalculator
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"No display available ({e}); run under xvfb-run", file=sys.stderr)
+        return 2
+    # History and the rate cache go to a temporary directory, not the user's
+    with tempfile.TemporaryDirectory(prefix='bench-switch-mode-') as home:
+        os.environ['XDG_DATA_HOME'] = os.path.join(home, 'data')
+        os.environ['XDG_CACHE_HOME'] = os.path.join(home, 'cache')
+        app = AdvancedCalculator(root)
+        root.update()
+
+        # The first pass builds each panel; later switches only raise cached frames
+        first = measure(app, len(MODES))
+        samples = measure(app, args.rounds)
+        root.destroy()
+
+    samples.sort()
+    print(f"first switch per mode: {', '.join(f'{ms:.2f}' for ms in first)} ms")
+    print(f"cached switches: mean {statistics.mean(samples):.3f} ms, "
+          f"p50 {samples[len(samples) // 2]:.3f} ms, p95 {samples[int(len(samples) * 0.95)]:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Check that the engine layer imports within a startup time budget
+
+Runs a fresh interpreter with `python -X importtime`, reports the cumulative
+import time of each module and fails if it is over budget or if it pulled in
+the GUI, network or NumPy layers.
+
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --ci
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import time budget per module on a developer machine
+BUDGET_MS = 40.0
+
+# The budget used with --ci. Shared CI runners are slower and noisier than
+# a developer machine (even one busy machine has measured the same tree at
+# 35 to 85 ms), so CI only catches gross regressions by time; the
+# lazy-import check below is exact and applies in both modes
+CI_BUDGET_MS = 100.0
+
+# Modules that must stay lazy for each checked import
+FORBIDDEN = {
+    'engine': ['tkinter', 'requests', 'numpy'],
+    'calculator': ['tkinter', 'requests', 'numpy'],
+}
+
+
+def import_time(module, runs=5):
+    """Best cumulative import time in microseconds and the set of modules imported"""
+    best = None
+    imported = set()
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            name = name.strip()
+            imported.add(name.split('.')[0])
+            if name == module:
+                total = int(cumulative)
+                best = total if best is None else min(best, total)
+    return best, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help=f"maximum cumulative import time per module (default {BUDGET_MS:g} ms)")
+    parser.add_argument('--ci', action='store_true',
+                        help=f"use the CI budget of {CI_BUDGET_MS:g} ms unless --budget-ms is given")
+    parser.add_argument('--runs', type=int, default=5, help="interpreter launches per module; the best is kept")
+    parser.add_argument('modules', nargs='*', default=sorted(FORBIDDEN))
+    args = parser.parse_args(argv)
+    if args.budget_ms is None:
+        args.budget_ms = CI_BUDGET_MS if args.ci else BUDGET_MS
+
+    failed = False
+    for module in args.modules:
+        total, imported = import_time(module, args.runs)
+        leaked = [name for name in FORBIDDEN.get(module, []) if name in imported]
+        status = "ok"
+        if total / 1000 > args.budget_ms:
+            status = "OVER BUDGET"
+            failed = True
+        if leaked:
+            status = f"imports {', '.join(leaked)}"
+            failed = True
+        print(f"{module:<12} {total / 1000:8.2f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Load test the calculator service with many pipelined connections
+
+    python benchmarks/load_test.py                       # starts its own offline server
+    python benchmarks/load_test.py --connect 127.0.0.1:8765 --connections 32
+    python benchmarks/load_test.py --compare-subprocess 20 --output load.json
+
+Each connection keeps up to --depth requests in flight, mixing currency
+conversions, scientific functions and expressions. The report gives
+throughput and latency percentiles; --compare-subprocess also times the
+old approach of starting calculator.py once per calculation.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+CALCULATOR = os.path.join(REPO_ROOT, 'calculator.py')
+
+CODES = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'CNY', 'INR', 'KRW']
+FUNCTIONS = ['sin', 'cos', 'sqrt', 'log', 'square']
+MIXES = ('convert', 'function', 'evaluate')
+
+
+def make_request(kind, i):
+    if kind == 'convert':
+        return {'op': 'convert', 'amount': i % 1000 + 0.5,
+                'from': CODES[i % len(CODES)], 'to': CODES[(i * 7 + 1) % len(CODES)]}
+    if kind == 'function':
+        return {'op': 'function', 'function': FUNCTIONS[i % len(FUNCTIONS)], 'value': i % 360 + 1}
+    return {'op': 'evaluate', 'expression': f"{i % 97}*{i % 13 + 1}+{i % 7}/3-2**{i % 10}"}
+
+
+async def run_connection(open_connection, kinds, count, depth, offset, latencies, errors):
+    reader, writer = await open_connection()
+    sent = deque()
+    window = asyncio.Semaphore(depth)
+
+    async def receive():
+        for _ in range(count):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Server closed the connection")
+            latencies.append(time.perf_counter() - sent.popleft())
+            if 'error' in json.loads(line):
+                errors[0] += 1
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for i in range(count):
+        await window.acquire()
+        request = make_request(kinds[i % len(kinds)], offset + i)
+        sent.append(time.perf_counter())
+        writer.write(json.dumps(request).encode() + b'\n')
+        if i % depth == depth - 1:
+            await writer.drain()
+    await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def load(open_connection, connections, count, depth, kinds):
+    latencies = []
+    errors = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*[run_connection(open_connection, kinds, count, depth, c * count, latencies, errors)
+                           for c in range(connections)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_ms': {
+            'mean': statistics.fmean(latencies) * 1000,
+            'p50': percentile(0.5) * 1000,
+            'p95': percentile(0.95) * 1000,
+            'p99': percentile(0.99) * 1000,
+            'max': latencies[-1] * 1000,
+        },
+    }
+
+
+def start_server(workers):
+    """Start an offline server on a free port and return (process, address)"""
+    command = [sys.executable, CALCULATOR, '--serve', '127.0.0.1:0', '--offline']
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stderr=subprocess.PIPE, text=True)
+    for line in process.stderr:
+        if 'listening on' in line:
+            return process, line.rsplit(' ', 1)[1].strip()
+    raise RuntimeError("Server exited before it started listening")
+
+
+def time_subprocess(count):
+    """Seconds per calculation when starting calculator.py for each one"""
+    command = [sys.executable, CALCULATOR, '--batch', '-', '--offline', '--workers', '0']
+    start = time.perf_counter()
+    for i in range(count):
+        subprocess.run(command, input=f"{i} USD to EUR\n", capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connect', metavar='HOST:PORT', help="test a running server instead of starting one")
+    parser.add_argument('--socket', metavar='PATH', help="test a running server on a Unix socket")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes for the started server")
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help="requests per connection")
+    parser.add_argument('--depth', type=int, default=64, help="requests in flight per connection")
+    parser.add_argument('--mix', default=','.join(MIXES),
+                        help="comma-separated request kinds to cycle through (default all)")
+    parser.add_argument('--compare-subprocess', type=int, default=0, metavar='N',
+                        help="also time N one-shot calculator.py runs")
+    parser.add_argument('--output', metavar='PATH', help="write the report as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    kinds = [kind.strip() for kind in args.mix.split(',') if kind.strip()]
+    if not kinds or set(kinds) - set(MIXES):
+        parser.error(f"--mix takes kinds from {', '.join(MIXES)}")
+
+    process = None
+    if args.socket:
+        open_connection = lambda: asyncio.open_unix_connection(args.socket)
+    else:
+        address = args.connect
+        if address is None:
+            process, address = start_server(args.workers)
+        host, _, port = address.rpartition(':')
+        open_connection = lambda: asyncio.open_connection(host, int(port))
+
+    try:
+        report = asyncio.run(load(open_connection, args.connections, args.requests, args.depth, kinds))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latency = report['latency_ms']
+    print(f"{report['requests']} requests ({report['errors']} errors) in {report['seconds']:.2f}s: "
+          f"{report['requests_per_second']:.0f} req/s")
+    print(f"latency ms: mean {latency['mean']:.2f}  p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  "
+          f"p99 {latency['p99']:.2f}  max {latency['max']:.2f}")
+    if args.compare_subprocess:
+        per_call = time_subprocess(args.compare_subprocess)
+        report['subprocess_seconds_per_call'] = per_call
+        print(f"one process per calculation: {per_call * 1000:.1f} ms per call "
+              f"({1 / per_call:.0f} calls/s)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
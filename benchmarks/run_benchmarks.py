@@ -0,0 +1,401 @@
+"""Benchmark the calculator's hot paths and compare against a saved baseline
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.2
+
+Each benchmark reports seconds per call (best and median of several
+repeats). With --baseline, any benchmark whose median is more than
+--threshold slower than the baseline is flagged and the exit status is 1.
+GUI benchmarks need a display; run under `xvfb-run` on headless machines,
+otherwise they are reported as skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+SHORT_EXPRESSION = "12.5×4−3÷7"
+LONG_EXPRESSION = "+".join(f"({i}×{i + 1}−{i}÷7)" for i in range(1, 200))
+
+MODES = ["standard", "scientific", "currency", "statistics"]
+
+SCIENTIFIC_FUNCTIONS = ['sin', 'cos', 'tan', 'log', 'ln', 'sqrt', 'cbrt', 'square', 'cube']
+
+BULK_ROWS = 100000
+
+# name -> setup function returning a zero-argument callable to time, or a
+# string explaining why the benchmark was skipped
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _temp_dir(prefix):
+    # A temporary directory removed when the run exits
+    import atexit
+    import shutil
+    import tempfile
+    path = tempfile.mkdtemp(prefix=prefix)
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def _private_dirs():
+    # XDG variables pointing the GUI's history and rate cache at temporary
+    # directories, so GUI benchmarks neither read nor write the user's files
+    return {'XDG_DATA_HOME': _temp_dir('bench-data-'), 'XDG_CACHE_HOME': _temp_dir('bench-cache-')}
+
+
+def _engine():
+    from engine import CalculatorEngine
+    from rates import FALLBACK_RATES
+    return CalculatorEngine(dict(FALLBACK_RATES))
+
+
+@benchmark('calculate.short')
+def bench_calculate_short():
+    engine = _engine()
+    return lambda: engine.calculate(SHORT_EXPRESSION)
+
+
+@benchmark('calculate.short.uncached')
+def bench_calculate_short_uncached():
+    from expression import clear_cache
+    engine = _engine()
+
+    def run():
+        clear_cache()
+        engine.calculate(SHORT_EXPRESSION)
+    return run
+
+
+@benchmark('calculate.long')
+def bench_calculate_long():
+    engine = _engine()
+    return lambda: engine.calculate(LONG_EXPRESSION)
+
+
+@benchmark('calculate.long.uncached')
+def bench_calculate_long_uncached():
+    from expression import clear_cache
+    engine = _engine()
+
+    def run():
+        clear_cache()
+        engine.calculate(LONG_EXPRESSION)
+    return run
+
+
+def _scientific(func):
+    def setup():
+        engine = _engine()
+        return lambda: engine.scientific_function(func, "0.75")
+    return setup
+
+
+for _func in SCIENTIFIC_FUNCTIONS:
+    benchmark(f'scientific_function.{_func}')(_scientific(_func))
+
+
+@benchmark('convert_currency.single')
+def bench_convert_single():
+    engine = _engine()
+    return lambda: engine.convert_currency(125.5, 'EUR', 'JPY')
+
+
+def _without_numpy(func, *modules):
+    # func run with the modules' optional NumPy hidden, to time the
+    # pure-Python paths on machines that have NumPy installed
+    def run():
+        saved = [module.np for module in modules]
+        for module in modules:
+            module.np = None
+        try:
+            return func()
+        finally:
+            for module, np in zip(modules, saved):
+                module.np = np
+    return run
+
+
+def _bulk_rows(codes):
+    from_codes = [codes[i % len(codes)] for i in range(BULK_ROWS)]
+    to_codes = [codes[(i * 7) % len(codes)] for i in range(BULK_ROWS)]
+    return from_codes, to_codes
+
+
+@benchmark(f'convert_currency.bulk_{BULK_ROWS}')
+def bench_convert_bulk():
+    engine = _engine()
+    table = engine.rate_table
+    amounts = [float(i % 1000) + 0.25 for i in range(BULK_ROWS)]
+    from_codes, to_codes = _bulk_rows(table.codes)
+    return lambda: table.convert(amounts, from_codes, to_codes)
+
+
+@benchmark(f'convert_currency.bulk_python_{BULK_ROWS}')
+def bench_convert_bulk_python():
+    import currency
+    from rates import FALLBACK_RATES
+    table = _without_numpy(lambda: currency.RateTable(dict(FALLBACK_RATES)), currency)()
+    amounts = [float(i % 1000) + 0.25 for i in range(BULK_ROWS)]
+    from_codes, to_codes = _bulk_rows(table.codes)
+    return _without_numpy(lambda: table.convert(amounts, from_codes, to_codes), currency)
+
+
+@benchmark(f'money.convert_many_{BULK_ROWS}')
+def bench_money_convert_many():
+    engine = _engine()
+    table = engine.rate_table.money
+    units = [(i % 1000) * 100 + 25 for i in range(BULK_ROWS)]
+    from_codes, to_codes = _bulk_rows(table.codes)
+    return lambda: table.convert_many(units, from_codes, to_codes)
+
+
+@benchmark(f'money.convert_many_python_{BULK_ROWS}')
+def bench_money_convert_many_python():
+    import money
+    table = _engine().rate_table.money
+    units = [(i % 1000) * 100 + 25 for i in range(BULK_ROWS)]
+    from_codes, to_codes = _bulk_rows(table.codes)
+    return _without_numpy(lambda: table.convert_many(units, from_codes, to_codes), money)
+
+
+# Made-up three-letter codes for the synthetic rate history
+HISTORY_CODES = [f"X{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(30)]
+
+
+def _rate_history(years=10):
+    # A synthetic store of daily rates for 30 currencies in a temporary directory
+    from datetime import date, timedelta
+    from rate_history import RateHistory
+    history = RateHistory(_temp_dir('bench-rate-history-'))
+    start = date(2000, 1, 1)
+    history.import_snapshots((start + timedelta(days=day), {code: 1 + k + (day % 97) / 100
+                                                            for k, code in enumerate(HISTORY_CODES)})
+                             for day in range(years * 365))
+    return history, start
+
+
+@benchmark('rate_history.point')
+def bench_rate_history_point():
+    history, start = _rate_history()
+    return lambda: history.convert(125.5, HISTORY_CODES[1], HISTORY_CODES[2], '2005-06-15')
+
+
+@benchmark(f'rate_history.bulk_{BULK_ROWS}')
+def bench_rate_history_bulk():
+    from datetime import timedelta
+    history, start = _rate_history()
+    days = [start + timedelta(days=(i * 37) % (10 * 365)) for i in range(BULK_ROWS)]
+    amounts = [float(i % 1000) + 0.25 for i in range(BULK_ROWS)]
+    from_codes = [HISTORY_CODES[i % 30] for i in range(BULK_ROWS)]
+    return lambda: history.convert_many(amounts, from_codes, HISTORY_CODES[0], days)
+
+
+# An integer of about 300,000 digits, like a large factorial or power
+BIG_INTEGER_BITS = 1000000
+
+
+@benchmark('bignum.short_form')
+def bench_bignum_short_form():
+    from bignum import format_value
+    value = 3 ** (BIG_INTEGER_BITS * 63 // 100)
+    return lambda: format_value(value)
+
+
+@benchmark('bignum.expand')
+def bench_bignum_expand():
+    from bignum import expand
+    value = 3 ** (BIG_INTEGER_BITS * 63 // 100)
+    return lambda: expand(value)
+
+
+def _number_file(rows):
+    # A two-column CSV export of synthetic amounts in a temporary directory
+    path = os.path.join(_temp_dir('bench-stats-'), 'amounts.csv')
+    with open(path, 'w') as file:
+        file.write("id,amount\n")
+        file.writelines(f"{i},{(i * 7919) % 100003 / 7.0}\n" for i in range(rows))
+    return path
+
+
+@benchmark(f'stats.in_memory_{BULK_ROWS}')
+def bench_stats_in_memory():
+    from stats import np, summarize_file
+    if np is None:
+        return "NumPy not installed"
+    path = _number_file(BULK_ROWS)
+    return lambda: summarize_file(path, column=1)
+
+
+@benchmark(f'stats.streaming_{BULK_ROWS}')
+def bench_stats_streaming():
+    from stats import summarize_file
+    path = _number_file(BULK_ROWS)
+    return lambda: summarize_file(path, column=1, in_memory_bytes=0)
+
+
+def _gui_app():
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return None, f"no display ({e})"
+    from gui import AdvancedCalculator
+    os.environ.update(_private_dirs())
+    app = AdvancedCalculator(root)
+    root.update()
+    return app, None
+
+
+@benchmark('gui.switch_mode')
+def bench_switch_mode():
+    app, reason = _gui_app()
+    if app is None:
+        return reason
+    # Build every panel first so this measures the cached switch
+    for mode in MODES:
+        app.switch_mode(mode)
+    state = {'index': 0}
+
+    def run():
+        state['index'] += 1
+        app.switch_mode(MODES[state['index'] % len(MODES)])
+        app.root.update_idletasks()
+    return run
+
+
+@benchmark('gui.create_buttons')
+def bench_create_buttons():
+    app, reason = _gui_app()
+    if app is None:
+        return reason
+
+    def run():
+        # Drop the cached panel so each call measures a full build
+        panel = app.mode_panels.pop(app.current_mode)
+        panel.destroy()
+        app.create_buttons()
+        app.root.update_idletasks()
+    return run
+
+
+def _cold_import(module):
+    # A fresh interpreter each call, so this includes interpreter startup
+    def setup():
+        import subprocess
+        return lambda: subprocess.run([sys.executable, '-c', f'import {module}'], cwd=REPO_ROOT, check=True)
+    return setup
+
+
+for _module in ('engine', 'calculator', 'gui'):
+    benchmark(f'import.{_module}')(_cold_import(_module))
+
+
+@benchmark('startup.gui')
+def bench_startup():
+    import subprocess
+    import tkinter as tk
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as e:
+        return f"no display ({e})"
+    code = ("import tkinter as tk; from gui import AdvancedCalculator; "
+            "root = tk.Tk(); AdvancedCalculator(root); root.update(); root.destroy()")
+    env = dict(os.environ, **_private_dirs())
+    return lambda: subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env, check=True)
+
+
+def measure(func, repeat, min_time):
+    """Seconds per call as (best, median), timing enough calls to fill min_time"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed / number] + [t / number for t in timer.repeat(repeat - 1, number)]
+    return min(samples), statistics.median(samples), number
+
+
+def run(names, repeat, min_time):
+    results = {}
+    for name in names:
+        setup = BENCHMARKS[name]
+        func = setup()
+        if isinstance(func, str):
+            results[name] = {'skipped': func}
+            print(f"{name:<36} skipped: {func}")
+            continue
+        best, median, number = measure(func, repeat, min_time)
+        results[name] = {'best': best, 'median': median, 'number': number}
+        print(f"{name:<36} {median * 1e6:12.2f} us  (best {best * 1e6:.2f} us, {number} calls x {repeat})")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change against baseline and return the names that regressed"""
+    regressions = []
+    print(f"\nComparison with baseline (threshold {threshold:.0%}):")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if 'median' not in result or not base or 'median' not in base:
+            continue
+        change = result['median'] / base['median'] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<36} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', metavar='PATH', help="write results as JSON to PATH")
+    parser.add_argument('--baseline', metavar='PATH', help="compare results against a saved baseline")
+    parser.add_argument('--save-baseline', metavar='PATH', help="save results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="seconds each timing sample should last (default 0.05)")
+    parser.add_argument('--filter', default='', help="only run benchmarks whose name contains this text")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run(names, args.repeat, args.min_time),
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(report['results'], baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import decimal
+from fractions import Fraction
+
+# Integers longer than this are shown in short form; str() on them gets
+# slow, and Python refuses it outright beyond 4300 digits
+SHORT_FORM_BITS = 4000
+
+# Digits shown at the front and back of a short form
+LEAD_DIGITS = 12
+TRAIL_DIGITS = 6
+
+# Pieces this small are converted with str() by to_decimal_string()
+_DIRECT_BITS = 3000
+
+# Bits kept from the top of an integer to estimate its leading digits
+_TOP_BITS = 160
+
+
+def is_big(value):
+    """Whether value is an exact number too long to convert to text directly"""
+    if isinstance(value, int):
+        return value.bit_length() > SHORT_FORM_BITS
+    if isinstance(value, Fraction):
+        return max(value.numerator.bit_length(), value.denominator.bit_length()) > SHORT_FORM_BITS
+    return False
+
+
+def digit_count(n):
+    return _leading(n, 1)[1]
+
+
+def leading_digits(n, count=LEAD_DIGITS):
+    """The first count decimal digits of abs(n), without converting all of it"""
+    return _leading(n, count)[0]
+
+
+def _leading(n, count):
+    # Returns (first count digits, number of digits) of abs(n)
+    n = abs(n)
+    bits = n.bit_length()
+    if bits <= _DIRECT_BITS:
+        text = str(n)
+        return text[:count], len(text)
+
+    # n lies between top << shift and (top + 1) << shift; when both bounds
+    # agree on the leading digits, so does n. The bounds are rounded
+    # outwards, one more step each for the rounding inside the power, so
+    # a value like 10**k - 1 never looks like 10**k
+    shift = bits - _TOP_BITS
+    top = n >> shift
+    with decimal.localcontext() as context:
+        context.prec = count + 40
+        context.Emax = decimal.MAX_EMAX
+        context.rounding = decimal.ROUND_FLOOR
+        low = (decimal.Decimal(top) * decimal.Decimal(2) ** shift).next_minus()
+        context.rounding = decimal.ROUND_CEILING
+        high = (decimal.Decimal(top + 1) * decimal.Decimal(2) ** shift).next_plus()
+    low_digits = low.as_tuple().digits[:count]
+    if low.adjusted() == high.adjusted() and low_digits == high.as_tuple().digits[:count]:
+        return ''.join(map(str, low_digits)), low.adjusted() + 1
+
+    # n is within a hair of a digit boundary, as powers of ten are; one
+    # exact division settles it
+    digits = low.adjusted() + 1
+    head = n // 10 ** (digits - count)
+    limit = 10 ** count
+    while head >= limit:
+        digits += 1
+        head //= 10
+    return str(head), digits
+
+
+def trailing_digits(n, count=TRAIL_DIGITS):
+    """The last count decimal digits of abs(n), zero padded"""
+    return str(abs(n) % 10 ** count).zfill(count)
+
+
+def scientific(n, count=LEAD_DIGITS):
+    """Integer n as "d.ddd…e+N", from its leading digits only"""
+    head, digits = _leading(n, count)
+    sign = '-' if n < 0 else ''
+    mantissa = head[0] + ('.' + head[1:].rstrip('0') if head[1:].rstrip('0') else '')
+    return f"{sign}{mantissa}e+{digits - 1}"
+
+
+def abbreviate(n):
+    """Integer n as leading…trailing digits with its digit count"""
+    head, digits = _leading(n, LEAD_DIGITS)
+    sign = '-' if n < 0 else ''
+    return f"{sign}{head}…{trailing_digits(n)} ({digits} digits)"
+
+
+def format_value(value):
+    """Display text for a result, short forms for exact values too long to show"""
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            value = value.numerator
+        elif is_big(value):
+            with decimal.localcontext() as context:
+                context.prec = LEAD_DIGITS
+                context.Emax = decimal.MAX_EMAX
+                context.Emin = decimal.MIN_EMIN
+                ratio = decimal.Decimal(value.numerator) / decimal.Decimal(value.denominator)
+                return f"≈{ratio:.{LEAD_DIGITS - 1}e}"
+        else:
+            return f"{value.numerator}/{value.denominator}"
+    if isinstance(value, int) and value.bit_length() > SHORT_FORM_BITS:
+        return scientific(value)
+    return str(value)
+
+
+def describe(value):
+    """One line about a big result for the history bar"""
+    if isinstance(value, Fraction):
+        return (f"fraction of a {digit_count(value.numerator)}-digit numerator "
+                f"and {digit_count(value.denominator)}-digit denominator")
+    return abbreviate(value)
+
+
+def to_decimal_string(n):
+    """Full decimal expansion of any integer in subquadratic time
+
+    str() is quadratic in the number of digits and limited to 4300 of
+    them. This splits n in half by bits, converts the halves recursively
+    and joins them as hi * 2**k + lo in decimal arithmetic, whose large
+    multiplications are fast, so a million digits take seconds, not hours.
+    """
+    if n.bit_length() <= _DIRECT_BITS:
+        return str(n)
+    powers = {}
+    D = decimal.Decimal
+
+    def power_of_two(bits):
+        # 2**bits as a Decimal, memoized since each split size repeats
+        result = powers.get(bits)
+        if result is None:
+            if bits <= _DIRECT_BITS:
+                result = D(1 << bits)
+            else:
+                half = power_of_two(bits >> 1)
+                result = half * half
+                if bits & 1:
+                    result *= 2
+            powers[bits] = result
+        return result
+
+    def convert(n, bits):
+        if bits <= _DIRECT_BITS:
+            return D(n)
+        low_bits = bits >> 1
+        high = n >> low_bits
+        low = n - (high << low_bits)
+        return convert(high, bits - low_bits) * power_of_two(low_bits) + convert(low, low_bits)
+
+    with decimal.localcontext() as context:
+        # Exact arithmetic: enough precision for every digit, and inexact
+        # results would be a bug rather than something to round
+        context.prec = decimal.MAX_PREC
+        context.Emax = decimal.MAX_EMAX
+        context.Emin = decimal.MIN_EMIN
+        context.traps[decimal.Inexact] = True
+        result = convert(abs(n), n.bit_length())
+    return ('-' if n < 0 else '') + str(result)
+
+
+def expand(value):
+    """Full exact text of an integer or fraction"""
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return to_decimal_string(value.numerator)
+        return f"{to_decimal_string(value.numerator)}/{to_decimal_string(value.denominator)}"
+    return to_decimal_string(value)
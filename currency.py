@@ -0,0 +1,113 @@
+# Stands in for NumPy until _numpy() first imports it, so building a table
+# when rates are set does not load NumPy on the startup path
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+
+def _numpy():
+    # NumPy, imported on first use, or None when it is not installed
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+class RateTable:
+    """Cross-rate matrix built once per rate update
+
+    Currency codes are mapped to integer indices and matrix[i][j] holds the
+    factor converting an amount in codes[i] into codes[j]. With NumPy the
+    matrix is a 2-D array and convert() handles whole columns in one pass.
+    The matrix is only built on first use, since conversions normally go
+    through the exact MoneyTable instead.
+    """
+
+    def __init__(self, rates):
+        self.codes = sorted(rates)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.rates = rates
+        self._money = None
+        self._matrix = None
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def matrix(self):
+        """Factor matrix for every pair, built on first use"""
+        if self._matrix is None:
+            values = [float(self.rates[code]) for code in self.codes]
+            np = _numpy()
+            if np is not None:
+                base = np.array(values)
+                self._matrix = base[np.newaxis, :] / base[:, np.newaxis]
+            else:
+                self._matrix = [[to_rate / from_rate for to_rate in values] for from_rate in values]
+        return self._matrix
+
+    @property
+    def money(self):
+        """MoneyTable for exact minor-unit conversion at these rates, built on first use"""
+        if self._money is None:
+            from money import MoneyTable
+            self._money = MoneyTable(self.rates)
+        return self._money
+
+    def rate(self, from_curr, to_curr):
+        """Factor converting one unit of from_curr into to_curr"""
+        try:
+            return float(self.matrix[self.index[from_curr]][self.index[to_curr]])
+        except KeyError:
+            raise KeyError("Currency not found in exchange rates") from None
+
+    def convert_one(self, amount, from_curr, to_curr):
+        return amount * self.rate(from_curr, to_curr)
+
+    def indices(self, codes):
+        """Map currency codes to matrix indices, vectorized when NumPy is available"""
+        if isinstance(codes, str):
+            return self._code_index(codes)
+        np = _numpy()
+        if np is not None:
+            if isinstance(codes, np.ndarray):
+                unique, inverse = np.unique(codes, return_inverse=True)
+                lookup = np.array([self._code_index(str(code)) for code in unique], dtype=np.intp)
+                return lookup[inverse]
+            # For a list, a dict lookup per code beats np.unique(), which sorts
+            try:
+                return np.fromiter(map(self.index.__getitem__, codes), dtype=np.intp, count=len(codes))
+            except KeyError as error:
+                raise KeyError(f"Currency {error.args[0]!r} not found in exchange rates") from None
+        return [self._code_index(code) for code in codes]
+
+    def _code_index(self, code):
+        try:
+            return self.index[code]
+        except KeyError:
+            raise KeyError(f"Currency {code!r} not found in exchange rates") from None
+
+    def convert(self, amounts, from_codes, to_codes):
+        """Convert a column of amounts; either code argument may be a single code
+
+        Returns a NumPy array when NumPy is installed and a list otherwise.
+        """
+        from_idx = self.indices(from_codes)
+        to_idx = self.indices(to_codes)
+        np = _numpy()
+        if np is not None:
+            return np.asarray(amounts, dtype=float) * self.matrix[from_idx, to_idx]
+
+        count = len(amounts)
+        if isinstance(from_idx, int):
+            from_idx = [from_idx] * count
+        if isinstance(to_idx, int):
+            to_idx = [to_idx] * count
+        matrix = self.matrix
+        return [amount * matrix[i][j] for amount, i, j in zip(amounts, from_idx, to_idx)]
@@ -0,0 +1,210 @@
+# Kept free of tkinter, requests and NumPy imports so worker processes can
+# import it cheaply; the rate table is only loaded once rates are set, and
+# NumPy only with the first conversion that needs it.
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from bignum import format_value
+from expression import (EXACT_MAX_POWER_BITS, FUNCTIONS, ExpressionError, SizeBudget, check_power, compile_expression,
+                        evaluate, normalize)
+from history import HistoryEntry, HistoryLog
+from instrumentation import timed
+from rates import FALLBACK_RATES
+from sheet import Sheet, parse_definition
+
+CURRENCY_SYMBOLS = {
+    'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'CAD': 'C$',
+    'AUD': 'A$', 'CHF': 'Fr', 'CNY': '¥', 'INR': '₹', 'KRW': '₩'
+}
+
+# Recent history entries kept in memory; older ones stay in the on-disk log
+HISTORY_SIZE = 100
+
+# Scientific functions that raise to a fixed power, checked against the size limit
+_POWER_FUNCTIONS = {'square': 2, 'cube': 3}
+
+# Total bits of integer powers and products that reading the display exactly
+# for a scientific function may compute; it runs on the UI thread, so this
+# keeps the worst case to about one power as big as MAX_POWER_BITS
+EXACT_DISPLAY_MAX_BITS = 1 << 20
+
+_EXACT_DISPLAY_BUDGET = SizeBudget(EXACT_DISPLAY_MAX_BITS)
+
+# The same limit for each variable a definition computes, since the
+# variables window defines them on the UI thread too
+DEFINITION_MAX_BITS = 1 << 20
+
+
+# An immutable view of the published rates; readers take one and use it
+# throughout so a concurrent refresh never mixes two rate tables
+RatesSnapshot = namedtuple('RatesSnapshot', 'version rates table status fetched_at')
+
+
+class CalculatorEngine:
+    """Calculator state and operations without any GUI dependency"""
+
+    def __init__(self, rates=None, history_path=None, rate_history_path=None):
+        self.variables = Sheet(DEFINITION_MAX_BITS)
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.history_log = None
+        if history_path:
+            self.history_log = HistoryLog(history_path)
+            self.history.extend(self.history_log.recent(HISTORY_SIZE))
+        self.currency_symbols = dict(CURRENCY_SYMBOLS)
+        # The historical rate store is opened on the first dated conversion
+        self.rate_history_path = rate_history_path
+        self._rate_history = None
+        self._rates_lock = threading.Lock()
+        # Called with each newly published RatesSnapshot, on the publishing thread
+        self.rates_listeners = []
+        self.rates = RatesSnapshot(0, {}, None, "", 0)
+        if rates is not None:
+            self.set_rates(rates)
+
+    @timed('engine.calculate')
+    def calculate(self, text, exact=False):
+        """Evaluate display text, record it in history and return the result
+
+        Text like "rate = 1.07" or "f(x) = x*rate" defines a variable or
+        function instead and returns its value. A definition that fails to
+        evaluate is kept, so fixing what it refers to fixes it, but raises.
+        With exact, integers and fractions stay exact.
+        """
+        definition = parse_definition(text)
+        if definition is not None:
+            name = definition[0]
+            self.define(text)
+            if name in self.variables.errors:
+                raise ExpressionError(self.variables.errors[name])
+            return self.variables.values[name]
+        expression = normalize(text)
+        result = evaluate(expression, self.variables.values, exact)
+        self.add_to_history(f"{expression} = {format_value(result)}", expression)
+        return result
+
+    @timed('engine.define')
+    def define(self, text):
+        """Define a variable or function from "name = ..." text and return the names recomputed"""
+        recomputed = self.variables.define(text)
+        self.add_to_history(self.variables.describe(parse_definition(text)[0]))
+        return recomputed
+
+    @timed('engine.scientific_function')
+    def scientific_function(self, func, text, exact=False, value=None):
+        """Apply a scientific function to the value shown in text
+
+        value, if given, is the exact number behind a short form in text.
+        With exact, text is evaluated exactly within EXACT_DISPLAY_MAX_BITS,
+        and square and cube of integers and fractions stay exact.
+        """
+        if value is None:
+            if exact:
+                with _EXACT_DISPLAY_BUDGET:
+                    value = compile_expression(text, exact=True, budgeted=True)()
+            else:
+                value = float(text)
+        if func in _POWER_FUNCTIONS:
+            check_power(value, _POWER_FUNCTIONS[func], EXACT_MAX_POWER_BITS if exact else None)
+        result = FUNCTIONS[func](value)
+        self.add_to_history(f"{func}({text}) = {format_value(result)}", f"{func}({text})")
+        return result
+
+    # Readers of these get the values from a single snapshot
+    exchange_rates = property(lambda self: self.rates.rates)
+    rate_table = property(lambda self: self.rates.table)
+    rates_status = property(lambda self: self.rates.status)
+    rates_version = property(lambda self: self.rates.version)
+
+    @timed('engine.set_rates')
+    def set_rates(self, rates, status="", fetched_at=None):
+        """Publish new rates and return True, or False if newer rates are already published
+
+        The rate table is built outside the lock and then swapped in with a
+        new version number, so the rate loader thread can call this while
+        the UI is converting. rates_listeners are then called from the
+        calling thread and must hand the snapshot over to their own thread.
+        """
+        from currency import RateTable
+
+        rate_table = RateTable(rates)
+        with self._rates_lock:
+            current = self.rates
+            if fetched_at is not None and fetched_at < current.fetched_at:
+                return False
+            snapshot = self.rates = RatesSnapshot(current.version + 1, rates, rate_table, status,
+                                                  current.fetched_at if fetched_at is None else fetched_at)
+        for listener in list(self.rates_listeners):
+            listener(snapshot)
+        return True
+
+    def apply_rates_entry(self, entry):
+        """Set rates from a RateCache entry, or the fallback rates if entry is None"""
+        if entry is None:
+            return self.set_rates(dict(FALLBACK_RATES), "Built-in fallback rates (offline)")
+        fetched = datetime.fromtimestamp(entry['fetched_at']).strftime('%Y-%m-%d %H:%M')
+        source = f" from {entry['provider']}" if entry.get('provider') else ""
+        return self.set_rates(entry['rates'], f"Rates as of {fetched}{source}", entry['fetched_at'])
+
+    def has_currency(self, code):
+        table = self.rates.table
+        return table is not None and code in table
+
+    @property
+    def rate_history(self):
+        if self._rate_history is None:
+            from rate_history import RateHistory
+            self._rate_history = RateHistory(self.rate_history_path)
+        return self._rate_history
+
+    @timed('engine.convert_currency')
+    def convert_currency(self, amount, from_curr, to_curr, as_of=None, rounding=None):
+        """Convert amount and record it in history; raises KeyError for unknown currencies
+
+        The amount is rounded to whole minor units of from_curr and the
+        result to those of to_curr, in exact integer arithmetic (see
+        money.py), and returned as a Decimal; rounding is a decimal ROUND_*
+        mode, ROUND_HALF_EVEN by default. With as_of (a date or
+        "YYYY-MM-DD") the stored historical rates for that day are used
+        instead of the current ones.
+        """
+        import money
+
+        if as_of is not None:
+            table = self.rate_history.money_table((from_curr, to_curr), as_of)
+        else:
+            rate_table = self.rates.table
+            if rate_table is None or from_curr not in rate_table or to_curr not in rate_table:
+                raise KeyError("Currency not found in exchange rates")
+            table = rate_table.money
+        rounding = rounding or money.DEFAULT_ROUNDING
+        units = money.to_minor(amount, from_curr, rounding)
+        result = table.convert(units, from_curr, to_curr, rounding)
+
+        from_symbol = self.currency_symbols.get(from_curr, from_curr)
+        to_symbol = self.currency_symbols.get(to_curr, to_curr)
+        dated = f" (as of {as_of})" if as_of is not None else ""
+        self.add_to_history(f"{from_symbol}{money.format_minor(units, from_curr)} → "
+                            f"{to_symbol}{money.format_minor(result, to_curr)}{dated}")
+        return money.to_decimal(result, to_curr)
+
+    def add_to_history(self, calculation, expression=None):
+        """Record a calculation; expression is what recalling it puts back on the display"""
+        if self.history_log is not None:
+            entry = self.history_log.append(expression, calculation)
+        else:
+            entry = HistoryEntry(expression or '', calculation, time.time())
+        self.history.append(entry)
+
+    def recent_history(self, count=2):
+        return [entry.text for entry in list(self.history)[-count:]]
+
+    def search_history(self, query, prefix=False, limit=100):
+        """Matching history entries, newest first, from the log or from memory"""
+        if self.history_log is not None:
+            return self.history_log.search(query, prefix, limit)
+        matches = [entry for entry in reversed(self.history)
+                   if (entry.expression.startswith(query) if prefix
+                       else query in entry.expression or query in entry.text)]
+        return matches[:limit]
@@ -0,0 +1,134 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+import bignum
+import expression
+
+# Seconds an evaluation may run before the worker is killed
+DEFAULT_TIMEOUT = 5.0
+
+
+def _worker_main(conn, max_power_bits):
+    """Evaluate (job_id, text, variables, exact) requests from conn until the pipe closes"""
+    expression.MAX_POWER_BITS = max_power_bits
+    while True:
+        try:
+            job_id, text, variables, exact = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            normalized = expression.normalize(text)
+            result = expression.evaluate(normalized, variables, exact)
+            # Huge numbers come back whole alongside their short form, which
+            # is quick to make; the UI expands them only when asked
+            big = result if bignum.is_big(result) else None
+            conn.send((job_id, 'ok', normalized, bignum.format_value(result), big))
+        except expression.ResultTooLarge as e:
+            conn.send((job_id, 'too_large', text, str(e), None))
+        except Exception as e:
+            conn.send((job_id, 'error', text, str(e), None))
+
+
+class BackgroundEvaluator:
+    """Evaluates expressions in a worker process with a time budget
+
+    Results arrive on `results`, a thread-safe queue the UI polls with
+    after(), as (job_id, status, expression, text, value) tuples where status
+    is 'ok', 'error', 'too_large', 'timeout' or 'cancelled'. text is the
+    display text, a short form for huge results, whose exact value is then
+    passed as value (None otherwise). Integer arithmetic
+    holds the GIL, so a thread could not be interrupted; a worker process
+    that overruns its budget or is cancelled is killed and replaced on the
+    next submit.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_power_bits=None):
+        self.timeout = timeout
+        self.max_power_bits = max_power_bits or expression.MAX_POWER_BITS
+        self.results = queue.Queue()
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self._job_id = 0
+        self._active = None
+        self._cancelled = threading.Event()
+
+    @property
+    def busy(self):
+        return self._active is not None
+
+    def start(self):
+        """Start the worker ahead of the first submit so it is warm when needed"""
+        with self._lock:
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._process is None or not self._process.is_alive():
+            parent_conn, child_conn = self._context.Pipe()
+            self._process = self._context.Process(target=_worker_main,
+                                                  args=(child_conn, self.max_power_bits), daemon=True)
+            self._process.start()
+            child_conn.close()
+            self._conn = parent_conn
+
+    def submit(self, text, variables=None, exact=False):
+        """Start evaluating text and return its job id; one job runs at a time
+
+        variables must be picklable, as it is sent to the worker process.
+        With exact, integers and fractions are kept exact (see expression).
+        """
+        with self._lock:
+            if self._active is not None:
+                raise RuntimeError("An evaluation is already running")
+            self._ensure_worker()
+            self._job_id += 1
+            job_id = self._active = self._job_id
+            self._cancelled.clear()
+            conn = self._conn
+            conn.send((job_id, text, variables, exact))
+        threading.Thread(target=self._wait, args=(job_id, text, conn), daemon=True).start()
+        return job_id
+
+    def cancel(self):
+        if self.busy:
+            self._cancelled.set()
+
+    def _wait(self, job_id, text, conn):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            if self._cancelled.is_set():
+                outcome = (job_id, 'cancelled', text, "", None)
+                self._kill()
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                outcome = (job_id, 'timeout', text, "", None)
+                self._kill()
+                break
+            try:
+                if conn.poll(min(remaining, 0.05)):
+                    outcome = conn.recv()
+                    break
+            except (EOFError, OSError):
+                outcome = (job_id, 'error', text, "Worker process exited", None)
+                self._kill()
+                break
+        with self._lock:
+            self._active = None
+        self.results.put(outcome)
+
+    def _kill(self):
+        with self._lock:
+            process, self._process = self._process, None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if process is not None:
+            process.kill()
+            process.join()
+
+    def close(self):
+        self._kill()
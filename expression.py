@@ -0,0 +1,505 @@
+import math
+import operator
+import re
+import threading
+from fractions import Fraction
+from functools import lru_cache
+from numbers import Rational
+
+# Maximum number of compiled expressions kept in the LRU cache
+CACHE_SIZE = 2048
+
+# Largest integer power result, in bits, that evaluation will attempt
+MAX_POWER_BITS = 1 << 20
+
+# The same limit for exact evaluation, which shows big results in short
+# form instead of converting every digit; the largest take about a second
+EXACT_MAX_POWER_BITS = 1 << 23
+
+# Display symbols and their Python operator equivalents
+DISPLAY_SYMBOLS = {'×': '*', '÷': '/', '−': '-', 'π': 'pi'}
+
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+
+def _cbrt(value):
+    return value ** (1/3)
+
+
+# Functions available inside expressions; trig works in degrees like the
+# scientific buttons do
+FUNCTIONS = {
+    'sin': lambda value: math.sin(math.radians(value)),
+    'cos': lambda value: math.cos(math.radians(value)),
+    'tan': lambda value: math.tan(math.radians(value)),
+    'log': math.log10,
+    'ln': math.log,
+    'sqrt': math.sqrt,
+    'cbrt': _cbrt,
+    'square': lambda value: value ** 2,
+    'cube': lambda value: value ** 3,
+}
+
+# Functions above that are integer powers, charged like ** to a size budget
+_FUNCTION_POWERS = {'square': 2, 'cube': 3}
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_]\w*)
+      | (?P<op>\*\*|//|[-+*/%(),])
+    )""", re.VERBOSE)
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be parsed or evaluated"""
+
+
+class ResultTooLarge(ExpressionError):
+    """Raised when an exact result would exceed MAX_POWER_BITS or the size budget"""
+
+
+def check_power(base, exponent, limit=None):
+    """Reject integer powers whose result would exceed limit bits (MAX_POWER_BITS)
+
+    Costs one log2 and a multiply, so it runs before every integer power.
+    """
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        limit = MAX_POWER_BITS if limit is None else limit
+        # Every such power has at least exponent bits; checking that first
+        # also keeps huge exponents out of the float multiply
+        if exponent > limit or math.log2(abs(base)) * exponent > limit:
+            raise ResultTooLarge("Result too large")
+
+
+# Bits left in this thread's size budget, in .bits; None outside a SizeBudget block
+_budget = threading.local()
+
+
+class SizeBudget:
+    """Limits the exact powers and products of budgeted expressions
+
+    Inside a with block, expressions compiled with budgeted=True charge the
+    size of every integer or fraction power and product they compute,
+    constant folding included, and raise ResultTooLarge once the total
+    would pass bits. The check runs before the work, so the whole block has
+    a bounded cost.
+    Every block starts from the full budget, so one instance can be reused,
+    also from several threads; blocks do not nest.
+    """
+
+    __slots__ = ('bits',)
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __enter__(self):
+        _budget.bits = self.bits
+        return self
+
+    def __exit__(self, *exc_info):
+        _budget.bits = None
+
+
+def _charge(bits):
+    remaining = getattr(_budget, 'bits', None)
+    if remaining is not None:
+        if bits > remaining:
+            raise ResultTooLarge("Result too large")
+        _budget.bits = remaining - bits
+
+
+def _bits(value):
+    # Size of an exact number: a fraction is as big as its two integers
+    if isinstance(value, int):
+        return value.bit_length()
+    return value.numerator.bit_length() + value.denominator.bit_length()
+
+
+def budgeted_pow(power):
+    """Wrap a power function so exact powers are charged to the size budget"""
+    def charged(base, exponent):
+        if isinstance(exponent, int) and isinstance(base, Rational) and exponent:
+            if isinstance(base, int):
+                if exponent > 0 and abs(base) > 1:
+                    _charge(exponent if exponent.bit_length() > 1000 else math.log2(abs(base)) * exponent)
+            else:
+                _charge(_bits(base) * abs(exponent))
+        return power(base, exponent)
+    return charged
+
+
+def budgeted_mul(left, right):
+    """Multiply, charging integer and fraction products to the size budget"""
+    if isinstance(left, Rational) and isinstance(right, Rational):
+        _charge(_bits(left) + _bits(right))
+    return left * right
+
+
+def _budgeted_power_function(exponent):
+    power = budgeted_pow(safe_pow)
+    return lambda value: power(value, exponent)
+
+
+def safe_pow(base, exponent):
+    check_power(base, exponent)
+    return base ** exponent
+
+
+def exact_value(value):
+    """Collapse a Fraction with denominator 1 to an int"""
+    if isinstance(value, Fraction) and value.denominator == 1:
+        return value.numerator
+    return value
+
+
+def exact_divide(left, right):
+    """Division that keeps integers and fractions exact"""
+    if isinstance(left, Rational) and isinstance(right, Rational):
+        if right == 0:
+            raise ZeroDivisionError("division by zero")
+        return exact_value(Fraction(left, right))
+    return left / right
+
+
+def exact_pow(base, exponent):
+    """Power that keeps integers and fractions exact, negative exponents included"""
+    if isinstance(base, Rational) and isinstance(exponent, int):
+        # Both the numerator and the denominator grow with the exponent
+        check_power(max(abs(base.numerator), base.denominator), abs(exponent), EXACT_MAX_POWER_BITS)
+        if exponent < 0:
+            if base == 0:
+                raise ZeroDivisionError("division by zero")
+            return exact_value(Fraction(base) ** exponent)
+        return exact_value(base ** exponent)
+    return safe_pow(base, exponent)
+
+
+# Operators used when evaluating exactly: / makes fractions instead of floats
+EXACT_OPERATORS = dict(BINARY_OPERATORS, **{'/': exact_divide})
+
+
+def normalize(text):
+    """Turn display text into the canonical form used as the cache key"""
+    for symbol, replacement in DISPLAY_SYMBOLS.items():
+        text = text.replace(symbol, replacement)
+    return ''.join(text.split())
+
+
+def tokenize(text, exact=False):
+    """Split a normalized expression into (kind, value) tokens
+
+    With exact, decimal literals become Fractions rather than floats.
+    """
+    tokens = []
+    position = 0
+    length = len(text)
+    while position < length:
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise ExpressionError(f"Unexpected character {text[position]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = _parse_number(value, exact)
+        tokens.append((kind, value))
+        position = match.end()
+    tokens.append(('end', None))
+    return tokens
+
+
+def _parse_number(text, exact=False):
+    if '.' in text or 'e' in text or 'E' in text:
+        return exact_value(Fraction(text)) if exact else float(text)
+    # Python rejects decimal integers with leading zeros, so do we
+    if len(text) > 1 and text[0] == '0' and text.strip('0'):
+        raise ExpressionError(f"Invalid number {text!r}")
+    return int(text)
+
+
+class Parser:
+    """Recursive descent parser producing a tuple-based AST
+
+    Nodes are ('num', value), ('name', name), ('neg', node), ('pos', node),
+    ('call', name, args), ('pow', base, exponent) and ('chain', first, steps)
+    where steps is a tuple of (op, node) pairs applied left to right. Chains
+    keep long runs like 1+2+3+... flat instead of thousands of levels deep.
+    Precedence and associativity follow Python, so results match what eval()
+    produced.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def parse(self):
+        node = self.expression()
+        if self.peek()[0] != 'end':
+            raise ExpressionError(f"Unexpected token {self.peek()[1]!r}")
+        return node
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def accept(self, *ops):
+        kind, value = self.peek()
+        if kind == 'op' and value in ops:
+            self.index += 1
+            return value
+        return None
+
+    def expect(self, op):
+        if not self.accept(op):
+            raise ExpressionError(f"Expected {op!r}")
+
+    def expression(self):
+        return self.chain(self.term, ('+', '-'))
+
+    def term(self):
+        return self.chain(self.unary, ('*', '/', '//', '%'))
+
+    def chain(self, operand, ops):
+        first = operand()
+        steps = []
+        while True:
+            op = self.accept(*ops)
+            if op is None:
+                break
+            steps.append((op, operand()))
+        if not steps:
+            return first
+        return ('chain', first, tuple(steps))
+
+    def unary(self):
+        op = self.accept('+', '-')
+        if op == '-':
+            return ('neg', self.unary())
+        if op == '+':
+            return ('pos', self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.accept('**'):
+            # Right associative and binds tighter than a unary minus on its left
+            node = ('pow', node, self.unary())
+        return node
+
+    def atom(self):
+        kind, value = self.advance()
+        if kind == 'number':
+            return ('num', value)
+        if kind == 'name':
+            if self.accept('('):
+                args = []
+                if not self.accept(')'):
+                    args.append(self.expression())
+                    while self.accept(','):
+                        args.append(self.expression())
+                    self.expect(')')
+                return ('call', value, tuple(args))
+            return ('name', value)
+        if kind == 'op' and value == '(':
+            node = self.expression()
+            self.expect(')')
+            return node
+        if kind == 'end':
+            raise ExpressionError("Unexpected end of expression")
+        raise ExpressionError(f"Unexpected token {value!r}")
+
+
+def parse(text, exact=False):
+    """Parse a normalized expression into an AST"""
+    return Parser(tokenize(text, exact)).parse()
+
+
+def _constant(value):
+    return lambda env: value
+
+
+def _compile_node(node, names, exact=False, budgeted=False):
+    """Compile an AST node into (closure, is_constant, constant_value)
+
+    With exact, division and powers keep integers and fractions exact.
+    With budgeted, integer powers and products charge the SizeBudget.
+    """
+    kind = node[0]
+
+    if kind == 'num':
+        return _constant(node[1]), True, node[1]
+
+    if kind == 'name':
+        name = node[1]
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return _constant(value), True, value
+        names.add(name)
+
+        def lookup(env):
+            try:
+                return env[name]
+            except (KeyError, TypeError):
+                raise ExpressionError(f"Unknown name {name!r}") from None
+        return lookup, False, None
+
+    if kind in ('neg', 'pos'):
+        operand, is_const, value = _compile_node(node[1], names, exact, budgeted)
+        func = operator.neg if kind == 'neg' else operator.pos
+        if is_const:
+            folded = _fold(func, value)
+            if folded is not _NOT_FOLDED:
+                return _constant(folded), True, folded
+        return (lambda env: func(operand(env))), False, None
+
+    if kind == 'call':
+        name, args = node[1], node[2]
+        func = FUNCTIONS.get(name)
+        if func is None:
+            return _compile_user_call(name, args, names, exact, budgeted), False, None
+        if len(args) != 1:
+            raise ExpressionError(f"{name}() takes exactly one argument")
+        if budgeted and name in _FUNCTION_POWERS:
+            func = _budgeted_power_function(_FUNCTION_POWERS[name])
+        operand, is_const, value = _compile_node(args[0], names, exact, budgeted)
+        if is_const:
+            folded = _fold(func, value)
+            if folded is not _NOT_FOLDED:
+                return _constant(folded), True, folded
+        return (lambda env: func(operand(env))), False, None
+
+    if kind == 'pow':
+        base, base_const, base_value = _compile_node(node[1], names, exact, budgeted)
+        exponent, exponent_const, exponent_value = _compile_node(node[2], names, exact, budgeted)
+        power = exact_pow if exact else safe_pow
+        if budgeted:
+            power = budgeted_pow(power)
+        if base_const and exponent_const:
+            # Folding lets towers like 9**9**9 fail the size check here,
+            # before anything expensive runs
+            check_power(base_value, exponent_value, EXACT_MAX_POWER_BITS if exact else None)
+            folded = _fold(power, base_value, exponent_value)
+            if folded is not _NOT_FOLDED:
+                return _constant(folded), True, folded
+        if exponent_const:
+            return (lambda env: power(base(env), exponent_value)), False, None
+        return (lambda env: power(base(env), exponent(env))), False, None
+
+    # Left-to-right chain of binary operators; fold the constant prefix
+    first, is_const, value = _compile_node(node[1], names, exact, budgeted)
+    operators = EXACT_OPERATORS if exact else BINARY_OPERATORS
+    if budgeted:
+        operators = dict(operators, **{'*': budgeted_mul})
+    steps = []
+    for op, operand_node in node[2]:
+        func = operators[op]
+        operand, operand_const, operand_value = _compile_node(operand_node, names, exact, budgeted)
+        if is_const and not steps and operand_const:
+            folded = _fold(func, value, operand_value)
+            if folded is not _NOT_FOLDED:
+                value = folded
+                first = _constant(folded)
+                continue
+        steps.append((func, operand))
+    if not steps:
+        return first, is_const, value
+    steps = tuple(steps)
+
+    def run_chain(env):
+        result = first(env)
+        for func, operand in steps:
+            result = func(result, operand(env))
+        return result
+    return run_chain, False, None
+
+
+def _compile_user_call(name, args, names, exact=False, budgeted=False):
+    # Anything that is not a built-in function is looked up in the variables
+    # when the expression runs, so user-defined functions can change later
+    names.add(name)
+    operands = tuple(_compile_node(arg, names, exact, budgeted)[0] for arg in args)
+
+    def call(env):
+        try:
+            func = env[name]
+        except (KeyError, TypeError):
+            raise ExpressionError(f"Unknown function {name!r}") from None
+        if not callable(func):
+            raise ExpressionError(f"{name!r} is not a function")
+        return func(*[operand(env) for operand in operands])
+    return call
+
+
+_NOT_FOLDED = object()
+
+
+def _fold(func, *args):
+    # Errors such as division by zero are left for evaluation time
+    try:
+        return func(*args)
+    except Exception:
+        return _NOT_FOLDED
+
+
+class CompiledExpression:
+    """A parsed expression compiled into a tree of closures"""
+
+    __slots__ = ('source', 'names', '_func')
+
+    def __init__(self, source, func, names):
+        self.source = source
+        self.names = frozenset(names)
+        self._func = func
+
+    def __call__(self, variables=None):
+        return self._func(variables)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile_normalized(text, exact=False, budgeted=False):
+    names = set()
+    func = _compile_node(parse(text, exact), names, exact, budgeted)[0]
+    if exact:
+        inner = func
+        func = lambda env: exact_value(inner(env))
+    return CompiledExpression(text, func, names)
+
+
+def compile_expression(text, exact=False, budgeted=False):
+    """Compile display text, reusing a cached result for repeated input
+
+    With exact, integers and fractions stay exact: 1/3 is Fraction(1, 3)
+    and 0.1 is Fraction(1, 10). Functions such as sin still give floats.
+    With budgeted, compiling and running inside a SizeBudget stop with
+    ResultTooLarge once the integer results would pass the budget.
+    """
+    return _compile_normalized(normalize(text), exact, budgeted)
+
+
+def evaluate(text, variables=None, exact=False):
+    """Evaluate display text with optional variable bindings"""
+    return compile_expression(text, exact)(variables)
+
+
+def cache_info():
+    return _compile_normalized.cache_info()
+
+
+def clear_cache():
+    _compile_normalized.cache_clear()
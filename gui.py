@@ -0,0 +1,1001 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import math
+import sys
+import queue
+import signal
+import threading
+import time
+import bignum
+from engine import CalculatorEngine
+from history import default_history_path
+from evaluator import BackgroundEvaluator
+import instrumentation
+from incremental import IncrementalEvaluator
+from input_buffer import InputBuffer
+from instrumentation import timed
+from rate_view import RateListView
+from rates import RateCache
+
+# Characters of input shown on the display; longer input shows its tail
+DISPLAY_CHARS = 22
+
+# How often the UI checks for a finished background evaluation
+RESULT_POLL_MS = 15
+
+# Entries shown by the history search and the pause in typing before it runs
+HISTORY_SEARCH_LIMIT = 200
+HISTORY_SEARCH_DELAY_MS = 150
+
+# How often the UI checks for rates published by the background loader
+RATES_POLL_MS = 250
+
+# Pause in typing before the live result preview is updated
+PREVIEW_DELAY_MS = 120
+
+# Total bits of integer powers and products one preview update may compute;
+# it runs on the Tk thread, so anything bigger waits for = and the worker
+PREVIEW_MAX_BITS = 1 << 16
+
+# Digits per line when a huge result is expanded in full
+EXPAND_LINE_DIGITS = 100
+
+
+class AdvancedCalculator:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Advanced Calculator Pro")
+        self.root.geometry("420x650")
+        self.root.configure(bg='#1a1a1a')
+        self.root.resizable(False, False)
+        
+        # Variables
+        # The buffer owns the input; current_input only mirrors its visible tail
+        self.input = InputBuffer("0")
+        self.current_input = tk.StringVar()
+        self.current_input.set("0")
+        self.display_pending = None
+        self.preview = IncrementalEvaluator(PREVIEW_MAX_BITS)
+        self.preview_pending = None
+        self.preview_version = None
+        self.current_mode = "standard"
+        self.mode_buttons = {}
+        self.mode_panels = {}
+        self.rate_view = None
+        # The exact value behind a short form on the display, if any
+        self.big_result = None
+        self.statistics_running = False
+        self.statistics_updates = queue.Queue()
+        
+        # Calculation state, history and currency data live in the engine
+        try:
+            self.engine = CalculatorEngine(history_path=default_history_path())
+        except OSError as e:
+            print(f"History log unavailable, keeping history in memory: {e}", file=sys.stderr)
+            self.engine = CalculatorEngine()
+        self.rate_cache = RateCache()
+        
+        # "=" evaluates in a worker process so a runaway expression cannot freeze the window
+        self.evaluator = BackgroundEvaluator()
+        self.evaluator.start()
+        
+        # Load exchange rates; the loader thread reports new ones through a queue
+        self.rate_updates = queue.Queue()
+        self.engine.rates_listeners.append(lambda snapshot: self.rate_updates.put(snapshot.version))
+        self.load_exchange_rates()
+        
+        # Create GUI
+        self.create_widgets()
+        
+        self.root.after(RATES_POLL_MS, self.poll_rates)
+        
+        # Bind keyboard events
+        self.create_key_bindings()
+        self.root.bind('<Key>', self.on_key_press)
+        self.root.bind('<Control-h>', lambda event: self.open_history())
+        self.root.focus_set()
+        
+        if instrumentation.ENABLED:
+            self.start_instrumentation()
+    
+    def start_instrumentation(self):
+        """Watch for main loop stalls and let F12 or SIGUSR1 dump the metrics"""
+        self.loop_monitor = instrumentation.EventLoopMonitor(self.root)
+        self.loop_monitor.start()
+        self.root.bind('<F12>', lambda event: self.dump_metrics())
+        if hasattr(signal, 'SIGUSR1'):
+            # Signal handlers run in the main thread, so hand the dump to Tk
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.root.after_idle(self.dump_metrics))
+    
+    def dump_metrics(self):
+        path = instrumentation.metrics.dump()
+        self.history_label.config(text=f"Metrics written to {path}")
+    
+    @timed('gui.load_exchange_rates')
+    def load_exchange_rates(self):
+        """Load cached exchange rates immediately and revalidate stale ones in the background"""
+        entry = self.rate_cache.load()
+        self.engine.apply_rates_entry(entry)
+        if self.rate_cache.is_stale(entry):
+            self.rate_cache.refresh_async(entry, self.engine.apply_rates_entry)
+    
+    def create_widgets(self):
+        # Style configuration
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        # Configure custom styles
+        style.configure('Display.TLabel', 
+                       background='#2d2d2d', 
+                       foreground='white', 
+                       font=('Arial', 24, 'bold'),
+                       anchor='e')
+        
+        style.configure('Mode.TButton',
+                       background='#4a4a4a',
+                       foreground='white',
+                       font=('Arial', 10))
+        
+        # Main frame
+        main_frame = tk.Frame(self.root, bg='#1a1a1a')
+        main_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        # Mode selection
+        mode_frame = tk.Frame(main_frame, bg='#1a1a1a')
+        mode_frame.pack(fill='x', pady=(0, 10))
+        
+        modes = [("Standard", "standard"), ("Scientific", "scientific"), ("Currency", "currency"),
+                 ("Stats", "statistics")]
+        for text, mode in modes:
+            btn = tk.Button(mode_frame, text=text, 
+                          command=lambda m=mode: self.switch_mode(m),
+                          bg='#4a4a4a' if mode != self.current_mode else '#007acc',
+                          fg='white', font=('Arial', 10, 'bold'),
+                          relief='flat', padx=15, pady=5)
+            btn.pack(side='left', padx=2)
+            self.mode_buttons[mode] = btn
+        
+        tk.Button(mode_frame, text="History", command=self.open_history,
+                 bg='#4a4a4a', fg='white', font=('Arial', 10, 'bold'),
+                 relief='flat', padx=10, pady=5).pack(side='right', padx=2)
+        tk.Button(mode_frame, text="Variables", command=self.open_variables,
+                 bg='#4a4a4a', fg='white', font=('Arial', 10, 'bold'),
+                 relief='flat', padx=10, pady=5).pack(side='right', padx=2)
+        # Exact keeps integers and fractions exact, so 1/3 stays 1/3 and huge
+        # results keep every digit
+        self.exact = tk.BooleanVar(value=False)
+        tk.Checkbutton(mode_frame, text="Exact", variable=self.exact,
+                      bg='#1a1a1a', fg='white', selectcolor='#2d2d2d', activebackground='#1a1a1a',
+                      font=('Arial', 10, 'bold')).pack(side='right', padx=2)
+        
+        # Display
+        display_frame = tk.Frame(main_frame, bg='#2d2d2d', relief='sunken', bd=2)
+        display_frame.pack(fill='x', pady=(0, 15))
+        
+        self.display = tk.Label(display_frame, textvariable=self.current_input,
+                               bg='#2d2d2d', fg='white', font=('Arial', 24, 'bold'),
+                               anchor='e', padx=10, pady=15)
+        self.display.pack(fill='both')
+        
+        # History display (small)
+        history_frame = tk.Frame(main_frame, bg='#1a1a1a')
+        history_frame.pack(fill='x', pady=(0, 10))
+        self.history_label = tk.Label(history_frame, text="", bg='#1a1a1a', fg='#888',
+                                     font=('Arial', 10), anchor='e')
+        self.history_label.pack(side='right', fill='x', expand=True)
+        # Shown while the display holds the short form of a huge result
+        self.expand_button = tk.Button(history_frame, text="Expand", command=self.expand_result,
+                                      bg='#4a4a4a', fg='white', font=('Arial', 9), relief='flat', padx=8)
+        
+        # Button frame
+        self.button_frame = tk.Frame(main_frame, bg='#1a1a1a')
+        self.button_frame.pack(fill='both', expand=True)
+        # Mode panels are stacked in one cell and raised when their mode is selected
+        self.button_frame.grid_rowconfigure(0, weight=1)
+        self.button_frame.grid_columnconfigure(0, weight=1)
+        
+        # Create buttons based on mode
+        self.create_buttons()
+    
+    @timed('gui.create_buttons')
+    def create_buttons(self):
+        """Show the panel for the current mode, building it on first use"""
+        panel = self.mode_panels.get(self.current_mode)
+        if panel is None:
+            panel = tk.Frame(self.button_frame, bg='#1a1a1a')
+            panel.grid(row=0, column=0, sticky='nsew')
+            if self.current_mode == "standard":
+                self.create_standard_buttons(panel)
+            elif self.current_mode == "scientific":
+                self.create_scientific_buttons(panel)
+            elif self.current_mode == "currency":
+                self.create_currency_buttons(panel)
+            elif self.current_mode == "statistics":
+                self.create_statistics_panel(panel)
+            self.mode_panels[self.current_mode] = panel
+        panel.tkraise()
+    
+    def create_standard_buttons(self, panel):
+        # Button configuration
+        btn_config = {
+            'font': ('Arial', 12, 'bold'),
+            'relief': 'flat',
+            'bd': 1,
+            'padx': 5,
+            'pady': 5
+        }
+        
+        # Button colors
+        number_color = '#4a4a4a'
+        operator_color = '#007acc'
+        special_color = '#ff6b35'
+        
+        buttons = [
+            ('C', 0, 0, special_color, self.clear),
+            ('±', 0, 1, special_color, self.toggle_sign),
+            ('%', 0, 2, operator_color, lambda: self.append_operator('%')),
+            ('÷', 0, 3, operator_color, lambda: self.append_operator('/')),
+            
+            ('7', 1, 0, number_color, lambda: self.append_number('7')),
+            ('8', 1, 1, number_color, lambda: self.append_number('8')),
+            ('9', 1, 2, number_color, lambda: self.append_number('9')),
+            ('×', 1, 3, operator_color, lambda: self.append_operator('*')),
+            
+            ('4', 2, 0, number_color, lambda: self.append_number('4')),
+            ('5', 2, 1, number_color, lambda: self.append_number('5')),
+            ('6', 2, 2, number_color, lambda: self.append_number('6')),
+            ('−', 2, 3, operator_color, lambda: self.append_operator('-')),
+            
+            ('1', 3, 0, number_color, lambda: self.append_number('1')),
+            ('2', 3, 1, number_color, lambda: self.append_number('2')),
+            ('3', 3, 2, number_color, lambda: self.append_number('3')),
+            ('+', 3, 3, operator_color, lambda: self.append_operator('+')),
+            
+            ('0', 4, 0, number_color, lambda: self.append_number('0')),
+            ('.', 4, 1, number_color, lambda: self.append_number('.')),
+            ('⌫', 4, 2, special_color, self.backspace),
+            ('=', 4, 3, operator_color, self.calculate)
+        ]
+        
+        for text, row, col, color, command in buttons:
+            btn = tk.Button(panel, text=text, command=command,
+                          bg=color, fg='white', **btn_config)
+            btn.grid(row=row, column=col, sticky='nsew', padx=1, pady=1)
+        
+        # Configure grid weights
+        for i in range(5):
+            panel.grid_rowconfigure(i, weight=1)
+        for i in range(4):
+            panel.grid_columnconfigure(i, weight=1)
+    
+    def create_scientific_buttons(self, panel):
+        btn_config = {
+            'font': ('Arial', 10, 'bold'),
+            'relief': 'flat',
+            'bd': 1,
+            'padx': 2,
+            'pady': 2
+        }
+        
+        number_color = '#4a4a4a'
+        operator_color = '#007acc'
+        special_color = '#ff6b35'
+        scientific_color = '#8b4a8b'
+        
+        buttons = [
+            ('sin', 0, 0, scientific_color, lambda: self.scientific_function('sin')),
+            ('cos', 0, 1, scientific_color, lambda: self.scientific_function('cos')),
+            ('tan', 0, 2, scientific_color, lambda: self.scientific_function('tan')),
+            ('log', 0, 3, scientific_color, lambda: self.scientific_function('log')),
+            ('ln', 0, 4, scientific_color, lambda: self.scientific_function('ln')),
+            ('C', 0, 5, special_color, self.clear),
+            
+            ('x²', 1, 0, scientific_color, lambda: self.scientific_function('square')),
+            ('x³', 1, 1, scientific_color, lambda: self.scientific_function('cube')),
+            ('√', 1, 2, scientific_color, lambda: self.scientific_function('sqrt')),
+            ('∛', 1, 3, scientific_color, lambda: self.scientific_function('cbrt')),
+            ('xʸ', 1, 4, scientific_color, lambda: self.append_operator('**')),
+            ('÷', 1, 5, operator_color, lambda: self.append_operator('/')),
+            
+            ('7', 2, 0, number_color, lambda: self.append_number('7')),
+            ('8', 2, 1, number_color, lambda: self.append_number('8')),
+            ('9', 2, 2, number_color, lambda: self.append_number('9')),
+            ('(', 2, 3, operator_color, lambda: self.append_operator('(')),
+            (')', 2, 4, operator_color, lambda: self.append_operator(')')),
+            ('×', 2, 5, operator_color, lambda: self.append_operator('*')),
+            
+            ('4', 3, 0, number_color, lambda: self.append_number('4')),
+            ('5', 3, 1, number_color, lambda: self.append_number('5')),
+            ('6', 3, 2, number_color, lambda: self.append_number('6')),
+            ('π', 3, 3, scientific_color, lambda: self.append_constant('π')),
+            ('e', 3, 4, scientific_color, lambda: self.append_constant('e')),
+            ('−', 3, 5, operator_color, lambda: self.append_operator('-')),
+            
+            ('1', 4, 0, number_color, lambda: self.append_number('1')),
+            ('2', 4, 1, number_color, lambda: self.append_number('2')),
+            ('3', 4, 2, number_color, lambda: self.append_number('3')),
+            ('±', 4, 3, special_color, self.toggle_sign),
+            ('%', 4, 4, operator_color, lambda: self.append_operator('%')),
+            ('+', 4, 5, operator_color, lambda: self.append_operator('+')),
+            
+            ('0', 5, 0, number_color, lambda: self.append_number('0')),
+            ('.', 5, 1, number_color, lambda: self.append_number('.')),
+            ('⌫', 5, 2, special_color, self.backspace),
+            ('=', 5, 3, operator_color, self.calculate),
+            ('Table', 5, 4, scientific_color, self.open_function_table)
+        ]
+        
+        for text, row, col, color, command in buttons:
+            btn = tk.Button(panel, text=text, command=command,
+                          bg=color, fg='white', **btn_config)
+            btn.grid(row=row, column=col, sticky='nsew', padx=1, pady=1)
+        
+        # Configure grid weights
+        for i in range(6):
+            panel.grid_rowconfigure(i, weight=1)
+        for i in range(6):
+            panel.grid_columnconfigure(i, weight=1)
+    
+    def create_currency_buttons(self, panel):
+        # Currency input frame
+        currency_frame = tk.Frame(panel, bg='#1a1a1a')
+        currency_frame.pack(fill='x', pady=(0, 10))
+        
+        tk.Label(currency_frame, text="Amount:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left', padx=5)
+        
+        self.amount_entry = tk.Entry(currency_frame, font=('Arial', 12), width=15,
+                                   bg='#2d2d2d', fg='white', insertbackground='white')
+        self.amount_entry.pack(side='left', padx=5)
+        
+        tk.Label(currency_frame, text="As of:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left', padx=5)
+        
+        # YYYY-MM-DD converts at stored historical rates; blank uses the current ones
+        self.as_of_entry = tk.Entry(currency_frame, font=('Arial', 12), width=11,
+                                  bg='#2d2d2d', fg='white', insertbackground='white')
+        self.as_of_entry.pack(side='left', padx=5)
+        
+        # Currency selection
+        currency_select_frame = tk.Frame(panel, bg='#1a1a1a')
+        currency_select_frame.pack(fill='x', pady=(0, 10))
+        
+        tk.Label(currency_select_frame, text="From:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left', padx=5)
+        
+        self.from_currency = ttk.Combobox(currency_select_frame, values=list(self.engine.currency_symbols.keys()),
+                                        width=8, font=('Arial', 11))
+        self.from_currency.set('USD')
+        self.from_currency.pack(side='left', padx=5)
+        
+        tk.Label(currency_select_frame, text="To:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left', padx=10)
+        
+        self.to_currency = ttk.Combobox(currency_select_frame, values=list(self.engine.currency_symbols.keys()),
+                                      width=8, font=('Arial', 11))
+        self.to_currency.set('EUR')
+        self.to_currency.pack(side='left', padx=5)
+        
+        # Convert button
+        convert_btn = tk.Button(currency_select_frame, text="Convert", command=self.convert_currency,
+                              bg='#007acc', fg='white', font=('Arial', 12, 'bold'),
+                              relief='flat', padx=20, pady=5)
+        convert_btn.pack(side='left', padx=20)
+        
+        # Quick conversion buttons
+        quick_frame = tk.Frame(panel, bg='#1a1a1a')
+        quick_frame.pack(fill='x', pady=(0, 10))
+        
+        tk.Label(quick_frame, text="Quick Convert:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12, 'bold')).pack(anchor='w', pady=5)
+        
+        quick_conversions = [
+            ('USD → EUR', 'USD', 'EUR'),
+            ('EUR → USD', 'EUR', 'USD'),
+            ('USD → GBP', 'USD', 'GBP'),
+            ('GBP → USD', 'GBP', 'USD'),
+            ('USD → JPY', 'USD', 'JPY'),
+            ('JPY → USD', 'JPY', 'USD')
+        ]
+        
+        for i, (text, from_curr, to_curr) in enumerate(quick_conversions):
+            row = i // 3
+            col = i % 3
+            
+            btn = tk.Button(quick_frame, text=text,
+                          command=lambda f=from_curr, t=to_curr: self.quick_convert(f, t),
+                          bg='#4a4a4a', fg='white', font=('Arial', 10),
+                          relief='flat', padx=10, pady=5)
+            btn.grid(row=row, column=col, sticky='ew', padx=2, pady=2)
+        
+        # Configure grid weights for quick conversion buttons
+        for i in range(3):
+            quick_frame.grid_columnconfigure(i, weight=1)
+        
+        # Exchange rates display
+        rates_frame = tk.Frame(panel, bg='#1a1a1a')
+        rates_frame.pack(fill='both', expand=True, pady=(10, 0))
+        
+        tk.Label(rates_frame, text="Current Exchange Rates (USD base):", 
+                bg='#1a1a1a', fg='white', font=('Arial', 12, 'bold')).pack(anchor='w')
+        
+        self.rate_view = RateListView(rates_frame, self.engine.currency_symbols, on_pick=self.to_currency.set)
+        self.rate_view.frame.pack(fill='both', expand=True, pady=5)
+        self.currency_codes = None
+        
+        self.update_rates_display()
+    
+    def create_statistics_panel(self, panel):
+        tk.Label(panel, text="Paste a column of numbers:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(anchor='w')
+        self.statistics_text = tk.Text(panel, height=5, bg='#2d2d2d', fg='white', insertbackground='white')
+        self.statistics_text.pack(fill='x', pady=(0, 10))
+        
+        # A file path overrides pasted values; large files are streamed
+        file_frame = tk.Frame(panel, bg='#1a1a1a')
+        file_frame.pack(fill='x', pady=(0, 10))
+        tk.Label(file_frame, text="Or file:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left')
+        self.statistics_path = tk.Entry(file_frame, width=18, bg='#2d2d2d', fg='white', insertbackground='white')
+        self.statistics_path.pack(side='left', padx=5)
+        tk.Button(file_frame, text="Browse", command=self.browse_statistics_file, bg='#4a4a4a', fg='white',
+                 relief='flat', padx=8).pack(side='left')
+        tk.Label(file_frame, text="Column:", bg='#1a1a1a', fg='white',
+                font=('Arial', 12)).pack(side='left', padx=(10, 0))
+        self.statistics_column = tk.Entry(file_frame, width=3, bg='#2d2d2d', fg='white', insertbackground='white')
+        self.statistics_column.insert(0, "1")
+        self.statistics_column.pack(side='left', padx=5)
+        
+        tk.Button(panel, text="Compute", command=self.compute_statistics, bg='#007acc', fg='white',
+                 font=('Arial', 12, 'bold'), relief='flat', padx=20, pady=5).pack(anchor='w')
+        self.statistics_output = tk.Text(panel, height=14, bg='#2d2d2d', fg='white', font=('Courier', 10))
+        self.statistics_output.pack(fill='both', expand=True, pady=(10, 0))
+    
+    def browse_statistics_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Data files", "*.csv *.txt *.tsv"), ("All files", "*")])
+        if path:
+            self.statistics_path.delete(0, tk.END)
+            self.statistics_path.insert(0, path)
+    
+    def compute_statistics(self):
+        """Summarize the pasted values or file on a background thread"""
+        from stats import summarize_file, summarize_text
+        
+        if self.statistics_running:
+            return
+        try:
+            column = int(self.statistics_column.get() or "1") - 1
+            if column < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Column must be a whole number from 1")
+            return
+        path = self.statistics_path.get().strip()
+        pasted = self.statistics_text.get('1.0', tk.END)
+        updates = self.statistics_updates
+        if path:
+            work = lambda: summarize_file(path, column, progress=lambda fraction: updates.put(('progress', fraction)))
+        elif pasted.strip():
+            work = lambda: summarize_text(pasted)
+        else:
+            messagebox.showerror("Error", "Paste some numbers or choose a file")
+            return
+        
+        def run():
+            try:
+                updates.put(('done', work()))
+            except Exception as e:
+                updates.put(('error', e))
+        
+        self.statistics_running = True
+        self.show_statistics(["Computing…"])
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(RESULT_POLL_MS, self.poll_statistics)
+    
+    def poll_statistics(self):
+        """Show progress and the finished summary from the statistics thread"""
+        from stats import format_summary
+        
+        progress = None
+        while True:
+            try:
+                kind, value = self.statistics_updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                progress = value
+                continue
+            self.statistics_running = False
+            if kind == 'done':
+                self.show_statistics(format_summary(value))
+            else:
+                self.show_statistics([])
+                messagebox.showerror("Error", f"Could not compute statistics: {value}")
+            return
+        if progress is not None:
+            self.show_statistics([f"Reading… {progress:.0%}"])
+        self.root.after(RESULT_POLL_MS, self.poll_statistics)
+    
+    def show_statistics(self, lines):
+        self.statistics_output.delete('1.0', tk.END)
+        self.statistics_output.insert('1.0', "\n".join(lines))
+    
+    @timed('gui.switch_mode')
+    def switch_mode(self, mode):
+        previous = self.current_mode
+        self.current_mode = mode
+        self.clear()
+        self.create_buttons()
+        
+        # Update mode button colors
+        self.mode_buttons[previous].configure(bg='#4a4a4a')
+        self.mode_buttons[mode].configure(bg='#007acc')
+    
+    def set_input(self, text, value=None):
+        """Replace the input; value is the exact number when text is its short form"""
+        self.input.set(text)
+        self.show_big_result(value)
+        self.cancel_preview()
+        self.schedule_display()
+    
+    def show_big_result(self, value):
+        self.big_result = value
+        if value is None:
+            self.expand_button.pack_forget()
+        else:
+            self.expand_button.pack(side='left')
+    
+    def input_edited(self):
+        """Redraw after a keystroke and preview the result once typing pauses"""
+        if self.big_result is not None:
+            self.show_big_result(None)
+        self.schedule_display()
+        self.cancel_preview()
+        self.preview_pending = self.root.after(PREVIEW_DELAY_MS, self.update_preview)
+    
+    def cancel_preview(self):
+        if self.preview_pending is not None:
+            self.root.after_cancel(self.preview_pending)
+            self.preview_pending = None
+    
+    @timed('gui.update_preview')
+    def update_preview(self):
+        """Show the running result of the input where the history line sits"""
+        self.preview_pending = None
+        if self.evaluator.busy:
+            return
+        variables = self.engine.variables
+        if variables.version != self.preview_version:
+            # Cached subtotals may use values that have since changed
+            self.preview.reset()
+            self.preview_version = variables.version
+        try:
+            value = self.preview.update(self.input.text(), variables.values)
+        except Exception:
+            # Incomplete input such as "12+" has no result yet
+            self.history_label.config(text="")
+            return
+        if self.preview.is_literal:
+            return
+        self.history_label.config(text=f"= {bignum.format_value(value)}")
+    
+    def schedule_display(self):
+        """Redraw the display once the event queue is idle, coalescing bursts of keystrokes"""
+        if self.display_pending is None:
+            self.display_pending = self.root.after_idle(self.refresh_display)
+    
+    @timed('gui.refresh_display')
+    def refresh_display(self):
+        self.display_pending = None
+        self.current_input.set(self.input.tail(DISPLAY_CHARS))
+    
+    def append_number(self, number):
+        self.input.append_number(number)
+        self.input_edited()
+    
+    def append_operator(self, operator):
+        self.input.append_operator(operator)
+        self.input_edited()
+    
+    def append_constant(self, constant):
+        if constant == 'π':
+            value = str(math.pi)
+        elif constant == 'e':
+            value = str(math.e)
+        else:
+            return
+        if self.input.is_zero():
+            self.input.set(value)
+        else:
+            self.input.append(value)
+        self.input_edited()
+    
+    def scientific_function(self, func):
+        try:
+            current = self.input.text()
+            if current == "0" or current == "":
+                return
+            
+            result = self.engine.scientific_function(func, current, self.exact.get(), self.big_result)
+            self.set_input(bignum.format_value(result), result if bignum.is_big(result) else None)
+            self.update_history_label()
+            
+        except Exception as e:
+            self.set_input("Error")
+    
+    def open_function_table(self):
+        """Open a window that tabulates a scientific function over a range or pasted values"""
+        from vectorized import FUNCTION_NAMES, apply_function, parse_values, value_range, write_table
+        
+        window = tk.Toplevel(self.root)
+        window.title("Function Table")
+        window.configure(bg='#1a1a1a')
+        
+        form = tk.Frame(window, bg='#1a1a1a')
+        form.pack(fill='x', padx=10, pady=10)
+        
+        tk.Label(form, text="Function:", bg='#1a1a1a', fg='white').grid(row=0, column=0, sticky='w')
+        func_box = ttk.Combobox(form, values=FUNCTION_NAMES, width=8, state='readonly')
+        func_box.set('sin')
+        func_box.grid(row=0, column=1, sticky='w', padx=5)
+        
+        entries = {}
+        for col, (label, default) in enumerate([("Start:", "0"), ("Stop:", "360"), ("Step:", "15")]):
+            tk.Label(form, text=label, bg='#1a1a1a', fg='white').grid(row=1, column=col * 2, sticky='w')
+            entry = tk.Entry(form, width=8, bg='#2d2d2d', fg='white', insertbackground='white')
+            entry.insert(0, default)
+            entry.grid(row=1, column=col * 2 + 1, padx=5, pady=5)
+            entries[label] = entry
+        
+        tk.Label(window, text="Or paste values (overrides range):", bg='#1a1a1a',
+                fg='white').pack(anchor='w', padx=10)
+        values_text = tk.Text(window, height=4, bg='#2d2d2d', fg='white', insertbackground='white')
+        values_text.pack(fill='x', padx=10)
+        
+        output = tk.Text(window, height=15, bg='#2d2d2d', fg='white', font=('Courier', 10))
+        table = {}
+        
+        def compute():
+            try:
+                pasted = values_text.get('1.0', tk.END).strip()
+                if pasted:
+                    inputs = parse_values(pasted)
+                else:
+                    inputs = value_range(float(entries["Start:"].get()), float(entries["Stop:"].get()),
+                                         float(entries["Step:"].get()))
+                outputs = apply_function(func_box.get(), inputs)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not build table: {e}", parent=window)
+                return
+            table.update(func=func_box.get(), inputs=inputs, outputs=outputs)
+            
+            # Only the first rows are shown; the full table can be saved
+            shown = min(len(inputs), 1000)
+            lines = [f"{inputs[i]:>16.8g}  {outputs[i]:.12g}" for i in range(shown)]
+            if shown < len(inputs):
+                lines.append(f"... {len(inputs) - shown} more rows, use Save CSV")
+            output.delete('1.0', tk.END)
+            output.insert('1.0', "\n".join(lines))
+        
+        def save():
+            if not table:
+                return
+            path = filedialog.asksaveasfilename(parent=window, defaultextension='.csv',
+                                                filetypes=[("CSV files", "*.csv")])
+            if path:
+                write_table(path, table['func'], table['inputs'], table['outputs'])
+        
+        buttons = tk.Frame(window, bg='#1a1a1a')
+        buttons.pack(fill='x', padx=10, pady=5)
+        tk.Button(buttons, text="Compute", command=compute, bg='#007acc', fg='white',
+                 relief='flat', padx=15).pack(side='left')
+        tk.Button(buttons, text="Save CSV", command=save, bg='#4a4a4a', fg='white',
+                 relief='flat', padx=15).pack(side='left', padx=5)
+        output.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+    
+    def clear(self):
+        self.set_input("0")
+        self.history_label.config(text="")
+    
+    def backspace(self):
+        self.input.backspace()
+        self.input_edited()
+    
+    def toggle_sign(self):
+        self.input.toggle_sign()
+        self.input_edited()
+    
+    def calculate(self):
+        if self.evaluator.busy:
+            return
+        self.evaluator.submit(self.input.text(), self.engine.variables.values or None, self.exact.get())
+        self.calculate_started = time.perf_counter()
+        self.history_label.config(text="Computing… (Esc to cancel)")
+        self.root.after(RESULT_POLL_MS, self.poll_result)
+    
+    def poll_result(self):
+        """Pick up the background evaluation result once it is ready"""
+        try:
+            job_id, status, expression, text, value = self.evaluator.results.get_nowait()
+        except queue.Empty:
+            self.root.after(RESULT_POLL_MS, self.poll_result)
+            return
+        
+        instrumentation.observe('gui.calculate_roundtrip', time.perf_counter() - self.calculate_started)
+        if status == 'ok':
+            self.engine.add_to_history(f"{expression} = {text}", expression)
+            self.set_input(text, value)
+            if value is None:
+                self.update_history_label()
+            else:
+                self.history_label.config(text=bignum.describe(value))
+        else:
+            self.set_input("Error")
+            if status == 'timeout':
+                self.history_label.config(text=f"Timed out after {self.evaluator.timeout:g}s")
+            elif status == 'cancelled':
+                self.history_label.config(text="Cancelled")
+            elif status == 'too_large':
+                self.history_label.config(text=text)
+            else:
+                self.update_history_label()
+    
+    def expand_result(self):
+        """Show every digit of the big result, converted on a background thread"""
+        value = self.big_result
+        if value is None:
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Full Result")
+        window.configure(bg='#1a1a1a')
+        status = tk.Label(window, text="Expanding…", bg='#1a1a1a', fg='#888', anchor='w')
+        status.pack(fill='x', padx=10, pady=(10, 0))
+        output = tk.Text(window, height=20, width=EXPAND_LINE_DIGITS + 2, bg='#2d2d2d', fg='white',
+                         font=('Courier', 10))
+        expanded = {}
+        
+        def copy():
+            if 'text' in expanded:
+                self.root.clipboard_clear()
+                self.root.clipboard_append(expanded['text'])
+        
+        def save():
+            if 'text' not in expanded:
+                return
+            path = filedialog.asksaveasfilename(parent=window, defaultextension='.txt',
+                                                filetypes=[("Text files", "*.txt")])
+            if path:
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(expanded['text'])
+        
+        buttons = tk.Frame(window, bg='#1a1a1a')
+        buttons.pack(fill='x', padx=10, pady=5)
+        tk.Button(buttons, text="Copy", command=copy, bg='#007acc', fg='white',
+                 relief='flat', padx=15).pack(side='left')
+        tk.Button(buttons, text="Save", command=save, bg='#4a4a4a', fg='white',
+                 relief='flat', padx=15).pack(side='left', padx=5)
+        output.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        
+        results = queue.Queue()
+        threading.Thread(target=lambda: results.put(bignum.expand(value)), daemon=True).start()
+        
+        def poll():
+            try:
+                text = results.get_nowait()
+            except queue.Empty:
+                self.root.after(RESULT_POLL_MS, poll)
+                return
+            if not window.winfo_exists():
+                return
+            expanded['text'] = text
+            # Tk slows to a crawl on very long lines, so the digits are wrapped
+            output.insert('1.0', "\n".join(text[i:i + EXPAND_LINE_DIGITS]
+                                           for i in range(0, len(text), EXPAND_LINE_DIGITS)))
+            status.config(text=bignum.describe(value))
+        
+        self.root.after(RESULT_POLL_MS, poll)
+    
+    def cancel_or_clear(self):
+        if self.evaluator.busy:
+            self.evaluator.cancel()
+        else:
+            self.clear()
+    
+    def update_history_label(self):
+        self.history_label.config(text=" | ".join(self.engine.recent_history()))
+    
+    def open_variables(self):
+        """Define variables and functions; double-clicking one inserts its name"""
+        window = tk.Toplevel(self.root)
+        window.title("Variables")
+        window.configure(bg='#1a1a1a')
+        sheet = self.engine.variables
+        
+        entry_frame = tk.Frame(window, bg='#1a1a1a')
+        entry_frame.pack(fill='x', padx=10, pady=(10, 0))
+        tk.Label(entry_frame, text="Define:", bg='#1a1a1a', fg='white').pack(side='left')
+        definition = tk.Entry(entry_frame, bg='#2d2d2d', fg='white', insertbackground='white')
+        definition.pack(side='left', fill='x', expand=True, padx=5)
+        status = tk.Label(window, text="e.g. rate = 1.07 or f(x) = x*rate - fee", bg='#1a1a1a', fg='#888',
+                          anchor='w')
+        status.pack(fill='x', padx=10)
+        
+        listing = tk.Listbox(window, width=50, height=20, bg='#2d2d2d', fg='white',
+                             font=('Arial', 10), activestyle='none')
+        listing.pack(fill='both', expand=True, padx=10, pady=10)
+        names = []
+        
+        def refresh():
+            names[:] = sorted(sheet.definitions)
+            listing.delete(0, tk.END)
+            for name in names:
+                listing.insert(tk.END, sheet.describe(name))
+        
+        def define(event=None):
+            try:
+                recomputed = self.engine.define(definition.get())
+            except Exception as e:
+                status.config(text=str(e))
+                return
+            status.config(text=f"Recomputed {len(recomputed)} value(s)")
+            definition.delete(0, tk.END)
+            refresh()
+            # The input may refer to what just changed
+            self.input_edited()
+        
+        def remove(event=None):
+            selection = listing.curselection()
+            if selection:
+                recomputed = sheet.remove(names[selection[0]])
+                status.config(text=f"Recomputed {len(recomputed)} value(s)")
+                refresh()
+                self.input_edited()
+        
+        def insert(event=None):
+            selection = listing.curselection()
+            if selection:
+                if self.input.is_zero():
+                    self.input.set(names[selection[0]])
+                else:
+                    self.input.append(names[selection[0]])
+                self.input_edited()
+        
+        definition.bind('<Return>', define)
+        listing.bind('<Double-Button-1>', insert)
+        listing.bind('<Delete>', remove)
+        definition.focus_set()
+        refresh()
+    
+    def open_history(self):
+        """Open a searchable view of the full history; picking an entry recalls it"""
+        window = tk.Toplevel(self.root)
+        window.title("History")
+        window.configure(bg='#1a1a1a')
+        
+        search_frame = tk.Frame(window, bg='#1a1a1a')
+        search_frame.pack(fill='x', padx=10, pady=10)
+        tk.Label(search_frame, text="Search:", bg='#1a1a1a', fg='white').pack(side='left')
+        query = tk.Entry(search_frame, bg='#2d2d2d', fg='white', insertbackground='white')
+        query.pack(side='left', fill='x', expand=True, padx=5)
+        prefix = tk.BooleanVar(value=False)
+        tk.Checkbutton(search_frame, text="Starts with", variable=prefix, bg='#1a1a1a', fg='white',
+                      selectcolor='#2d2d2d', activebackground='#1a1a1a').pack(side='left')
+        
+        results = tk.Listbox(window, width=50, height=20, bg='#2d2d2d', fg='white',
+                             font=('Arial', 10), activestyle='none')
+        results.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        shown = []
+        pending = {}
+        
+        def refresh():
+            pending.pop('after', None)
+            shown[:] = self.engine.search_history(query.get(), prefix.get(), HISTORY_SEARCH_LIMIT)
+            results.delete(0, tk.END)
+            for entry in shown:
+                results.insert(tk.END, entry.text)
+        
+        def schedule_refresh(event=None):
+            # Search once typing pauses rather than on every keystroke
+            if 'after' in pending:
+                window.after_cancel(pending['after'])
+            pending['after'] = window.after(HISTORY_SEARCH_DELAY_MS, refresh)
+        
+        def recall(event=None):
+            selection = results.curselection()
+            if not selection:
+                return
+            entry = shown[selection[0]]
+            if entry.expression:
+                self.set_input(entry.expression)
+                window.destroy()
+        
+        query.bind('<KeyRelease>', schedule_refresh)
+        prefix.trace_add('write', lambda *args: schedule_refresh())
+        results.bind('<Double-Button-1>', recall)
+        results.bind('<Return>', recall)
+        query.focus_set()
+        refresh()
+    
+    def convert_currency(self):
+        try:
+            # Passed on as text so every digit typed is kept; float() only validates
+            amount = self.amount_entry.get().strip()
+            float(amount)
+            from_curr = self.from_currency.get()
+            to_curr = self.to_currency.get()
+            as_of = self.as_of_entry.get().strip() or None
+            
+            if as_of is None and not (self.engine.has_currency(from_curr) and self.engine.has_currency(to_curr)):
+                messagebox.showerror("Error", "Currency not found in exchange rates")
+                return
+            
+            result = self.engine.convert_currency(amount, from_curr, to_curr, as_of)
+            self.set_input(str(result))
+            self.update_history_label()
+            
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid amount and a YYYY-MM-DD date")
+        except KeyError as e:
+            messagebox.showerror("Error", str(e.args[0]) if e.args else "Currency not found")
+        except Exception as e:
+            messagebox.showerror("Error", f"Conversion failed: {str(e)}")
+    
+    def quick_convert(self, from_curr, to_curr):
+        self.from_currency.set(from_curr)
+        self.to_currency.set(to_curr)
+        if self.amount_entry.get():
+            self.convert_currency()
+    
+    def update_rates_display(self):
+        if self.rate_view is None:
+            # The currency panel has not been built yet
+            return
+        # One snapshot, so a refresh landing mid-update cannot mix two rate sets
+        snapshot = self.engine.rates
+        self.rate_view.set_rates(snapshot.rates, snapshot.status)
+        codes = sorted(snapshot.rates)
+        if codes != self.currency_codes:
+            self.currency_codes = codes
+            self.from_currency.configure(values=codes)
+            self.to_currency.configure(values=codes)
+    
+    def poll_rates(self):
+        """Pick up rates published by the background loader and show them"""
+        updated = False
+        while True:
+            try:
+                self.rate_updates.get_nowait()
+            except queue.Empty:
+                break
+            updated = True
+        if updated:
+            self.update_rates_display()
+        self.root.after(RATES_POLL_MS, self.poll_rates)
+    
+    def create_key_bindings(self):
+        """Map typed characters and special keys to their actions"""
+        self.char_actions = {digit: (lambda d=digit: self.append_number(d)) for digit in '0123456789'}
+        self.char_actions['.'] = lambda: self.append_number('.')
+        for operator in '+-*/%':
+            self.char_actions[operator] = lambda o=operator: self.append_operator(o)
+        self.char_actions['='] = self.calculate
+        self.keysym_actions = {
+            'Return': self.calculate,
+            'BackSpace': self.backspace,
+            'Escape': self.cancel_or_clear,
+        }
+    
+    def on_key_press(self, event):
+        """Handle keyboard input"""
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            # Typing into a form field is not calculator input
+            return
+        action = self.char_actions.get(event.char) or self.keysym_actions.get(event.keysym)
+        if action:
+            action()
+
+
+def run():
+    root = tk.Tk()
+    app = AdvancedCalculator(root)
+    root.mainloop()
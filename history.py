@@ -0,0 +1,155 @@
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+HistoryEntry = namedtuple('HistoryEntry', 'expression text timestamp')
+
+# Each index record is the little-endian byte offset of one log line
+_OFFSET = struct.Struct('<Q')
+
+
+def default_history_path():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'plp-calculator', 'history.log')
+
+
+def _clean(field):
+    return field.replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+
+
+class HistoryLog:
+    """Append-only calculation history on disk with an offset index
+
+    The log holds one UTF-8 line per entry, "expression<TAB>text<TAB>time",
+    and a sidecar .idx file holds the byte offset of every line, so the
+    newest entries are read with two seeks however long the log grows.
+    Searches scan a memory map of the log from the end, keeping memory use
+    bounded. An index left short by a crash is rebuilt from the log on open,
+    and a torn final line is dropped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._log = open(path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._count = self._repair_index()
+
+    def _repair_index(self):
+        log_size = self._log.seek(0, os.SEEK_END)
+        index_size = self._index.seek(0, os.SEEK_END)
+        count = index_size // _OFFSET.size
+
+        # Drop a partial trailing record and any offsets past the end of the log
+        with open(self.index_path, 'rb') as index:
+            while count:
+                index.seek((count - 1) * _OFFSET.size)
+                if _OFFSET.unpack(index.read(_OFFSET.size))[0] < log_size:
+                    break
+                count -= 1
+            if count:
+                index.seek((count - 1) * _OFFSET.size)
+                last_offset = _OFFSET.unpack(index.read(_OFFSET.size))[0]
+            else:
+                last_offset = None
+
+        # Index any complete lines written after the last indexed one
+        with open(self.path, 'rb') as log:
+            position = 0
+            if last_offset is not None:
+                log.seek(last_offset)
+                if log.readline().endswith(b'\n'):
+                    position = log.tell()
+                else:
+                    # The last indexed line is itself torn
+                    count -= 1
+                    position = last_offset
+            if count * _OFFSET.size != index_size:
+                self._index.truncate(count * _OFFSET.size)
+            log.seek(position)
+            offsets = []
+            for line in log:
+                if not line.endswith(b'\n'):
+                    # Drop the torn tail of an interrupted write
+                    self._log.truncate(position)
+                    break
+                offsets.append(position)
+                position += len(line)
+        if offsets:
+            self._index.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+            self._index.flush()
+        return count + len(offsets)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, expression, text, timestamp=None):
+        """Add an entry; it is flushed to disk before this returns"""
+        entry = HistoryEntry(_clean(expression or ''), _clean(text), timestamp or time.time())
+        line = f"{entry.expression}\t{entry.text}\t{entry.timestamp:.3f}\n".encode('utf-8')
+        offset = self._log.seek(0, os.SEEK_END)
+        self._log.write(line)
+        self._log.flush()
+        # The index is written second, so a crash in between is repaired on open
+        self._index.write(_OFFSET.pack(offset))
+        self._index.flush()
+        self._count += 1
+        return entry
+
+    def recent(self, count):
+        """The newest count entries, oldest first"""
+        count = min(count, self._count)
+        if count <= 0:
+            return []
+        with open(self.index_path, 'rb') as index:
+            index.seek((self._count - count) * _OFFSET.size)
+            start = _OFFSET.unpack(index.read(_OFFSET.size))[0]
+        with open(self.path, 'rb') as log:
+            log.seek(start)
+            return [self._parse(line) for line in log.read().splitlines()[:count]]
+
+    def search(self, query, prefix=False, limit=100):
+        """Entries matching query, newest first
+
+        With prefix=True the expression must start with query; otherwise
+        query may appear anywhere in the expression or result text.
+        """
+        if not query:
+            return self.recent(limit)[::-1]
+        if not self._count:
+            return []
+        needle = query.encode('utf-8')
+        results = []
+        with open(self.path, 'rb') as log, mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if prefix:
+                needle = b'\n' + needle
+            end = len(data)
+            while len(results) < limit:
+                position = data.rfind(needle, 0, end)
+                if position < 0:
+                    break
+                if prefix:
+                    start = position + 1
+                else:
+                    start = data.rfind(b'\n', 0, position) + 1
+                line_end = data.find(b'\n', start)
+                entry = self._parse(data[start:line_end])
+                if prefix or query in entry.expression or query in entry.text:
+                    results.append(entry)
+                end = start
+            # The first line has no newline in front of it
+            if prefix and len(results) < limit and data[:len(needle) - 1] == needle[1:]:
+                results.append(self._parse(data[:data.find(b'\n')]))
+        return results
+
+    @staticmethod
+    def _parse(line):
+        expression, text, timestamp = line.decode('utf-8').rsplit('\t', 2)
+        return HistoryEntry(expression, text, float(timestamp))
+
+    def close(self):
+        self._log.close()
+        self._index.close()
@@ -0,0 +1,117 @@
+from expression import BINARY_OPERATORS, TOKEN_PATTERN, ExpressionError, compile_expression, normalize, SizeBudget
+
+# How many characters past the end of a token the tokenizer may have read
+# (the "e-5" of an exponent), so tokens this close to an edit are re-read
+_LOOKAHEAD = 3
+
+# Tokens after which a + or - is binary rather than a sign
+_OPERAND_END = ('number', 'name', ')')
+
+
+def _common_prefix(a, b):
+    """Length of the common prefix, comparing slices so long inputs stay fast"""
+    if a.startswith(b):
+        return len(b)
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class IncrementalEvaluator:
+    """Evaluates successive edits of one expression, redoing only what changed
+
+    The expression is kept as its top-level additive terms, the parts
+    between + and - signs outside parentheses. Addition runs left to right,
+    so the running total after each finished term is cached; after an edit,
+    tokens and totals before the edited position are reused and only the
+    suffix is tokenized and evaluated again. Results match evaluate().
+
+    With budget, each update computes integer powers and products of at
+    most that many bits in total and raises ResultTooLarge past it.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = None if budget is None else SizeBudget(budget)
+        self.reset()
+
+    def reset(self):
+        self.text = ''
+        self._tokens = []  # (kind, text, start, end, paren depth after the token)
+        self._splits = []  # indices of tokens that are top-level binary + or -
+        self._totals = []  # running total up to the term ended by each split
+
+    @property
+    def is_literal(self):
+        """True when the expression is a plain number, optionally signed"""
+        tokens = self._tokens
+        if len(tokens) == 2 and tokens[0][1] in ('+', '-'):
+            tokens = tokens[1:]
+        return len(tokens) == 1 and tokens[0][0] == 'number'
+
+    def update(self, text, variables=None):
+        """Evaluate text, reusing the work done for the previous text
+
+        Cached totals assume variables did not change; call reset() when they do.
+        """
+        text = normalize(text)
+        common = _common_prefix(text, self.text)
+
+        keep = len(self._tokens)
+        while keep and self._tokens[keep - 1][3] + _LOOKAHEAD > common:
+            keep -= 1
+        del self._tokens[keep:]
+        while self._splits and self._splits[-1] >= keep:
+            self._splits.pop()
+        del self._totals[len(self._splits):]
+        self.text = text
+        self._tokenize(self._tokens[-1][3] if self._tokens else 0)
+
+        if self.budget is None:
+            return self._evaluate(variables)
+        with self.budget:
+            return self._evaluate(variables)
+
+    def _evaluate(self, variables):
+        text = self.text
+        budgeted = self.budget is not None
+        total = self._totals[-1] if self._totals else None
+        for index in range(len(self._totals), len(self._splits) + 1):
+            start = self._tokens[self._splits[index - 1]][3] if index else 0
+            end = self._tokens[self._splits[index]][2] if index < len(self._splits) else len(text)
+            value = compile_expression(text[start:end], budgeted=budgeted)(variables)
+            if index:
+                value = BINARY_OPERATORS[self._tokens[self._splits[index - 1]][1]](total, value)
+            total = value
+            if index < len(self._splits):
+                self._totals.append(total)
+        return total
+
+    def _tokenize(self, position):
+        tokens = self._tokens
+        depth = tokens[-1][4] if tokens else 0
+        previous = None
+        if tokens:
+            # Same rule as below: a closing parenthesis ends an operand
+            previous = ')' if tokens[-1][1] == ')' else tokens[-1][0]
+        text = self.text
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise ExpressionError(f"Unexpected character {text[position]!r}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'op':
+                if value == '(':
+                    depth += 1
+                elif value == ')':
+                    depth -= 1
+                elif value in ('+', '-') and depth == 0 and previous in _OPERAND_END:
+                    self._splits.append(len(tokens))
+            tokens.append((kind, value, match.start(kind), match.end(), depth))
+            previous = value if value == ')' else kind
+            position = match.end()
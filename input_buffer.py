@@ -0,0 +1,63 @@
+class InputBuffer:
+    """Editable calculator input with O(1) appends and backspaces
+
+    Characters are kept in a list, and a leading minus sign is stored as a
+    flag so toggling the sign never copies the rest of the input. The full
+    string is only built when it is needed for evaluation.
+    """
+
+    __slots__ = ('_chars', '_negative')
+
+    def __init__(self, text="0"):
+        self._chars = []
+        self._negative = False
+        self.set(text)
+
+    def set(self, text):
+        self._negative = text.startswith('-')
+        self._chars = list(text[1:] if self._negative else text)
+
+    def text(self):
+        body = ''.join(self._chars)
+        return '-' + body if self._negative else body
+
+    def __len__(self):
+        return len(self._chars) + self._negative
+
+    def is_zero(self):
+        return not self._negative and self._chars == ['0']
+
+    def last(self):
+        """Last character, or '' when the input is empty"""
+        if self._chars:
+            return self._chars[-1]
+        return '-' if self._negative else ''
+
+    def append(self, text):
+        self._chars.extend(text)
+
+    def append_number(self, number):
+        if self.is_zero() and number != ".":
+            self.set(number)
+        else:
+            self.append(number)
+
+    def append_operator(self, operator):
+        last = self.last()
+        if last and last not in "+-*/%":
+            self.append(operator)
+
+    def backspace(self):
+        if len(self) > 1:
+            self._chars.pop()
+        else:
+            self.set("0")
+
+    def toggle_sign(self):
+        self._negative = not self._negative
+
+    def tail(self, width):
+        """The last width characters as shown on the display, with an ellipsis if cut"""
+        if len(self) <= width:
+            return self.text()
+        return '…' + ''.join(self._chars[len(self._chars) - width + 1:])
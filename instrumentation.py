@@ -0,0 +1,185 @@
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Instrumentation is decided when a module is imported: with it disabled,
+# timed() hands back the undecorated function so hot paths pay nothing.
+# Set CALCULATOR_METRICS to a file path (or call enable() before importing
+# the engine or GUI) to turn it on; the dump format follows the extension,
+# Prometheus text for .prom/.txt and JSON otherwise.
+METRICS_PATH = os.environ.get('CALCULATOR_METRICS') or None
+ENABLED = METRICS_PATH is not None
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Main loop delays longer than this count as a stall
+STALL_THRESHOLD = 0.1
+
+
+def enable(path):
+    global ENABLED, METRICS_PATH
+    if not ENABLED:
+        atexit.register(_dump_at_exit)
+    ENABLED = True
+    METRICS_PATH = path
+
+
+def _dump_at_exit():
+    try:
+        metrics.dump()
+    except OSError:
+        pass
+
+
+class Histogram:
+    """Latency histogram with fixed buckets plus count, sum and max"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        buckets = {str(bound): count for bound, count in zip(BUCKETS, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        return {'count': self.count, 'sum': self.total, 'max': self.max, 'buckets': buckets}
+
+
+class Metrics:
+    """Thread-safe registry of latency histograms and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'histograms': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric = _metric_name(name) + '_seconds'
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.total}")
+                lines.append(f"{metric}_count {histogram.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = _metric_name(name) + '_total'
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=None):
+        """Write the metrics to path (default METRICS_PATH) and return the path"""
+        path = path or METRICS_PATH
+        if path.endswith(('.prom', '.txt')):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temp_path, path)
+        return path
+
+
+def _metric_name(name):
+    return 'calculator_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+
+metrics = Metrics()
+
+if ENABLED:
+    atexit.register(_dump_at_exit)
+
+
+def observe(name, seconds):
+    if ENABLED:
+        metrics.observe(name, seconds)
+
+
+def timed(name):
+    """Record the duration of each call under name when instrumentation is enabled"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class EventLoopMonitor:
+    """Heartbeat that measures Tk main loop stalls from after() drift
+
+    Every interval it records how late the callback fired; anything later
+    than STALL_THRESHOLD is also counted as a stall.
+    """
+
+    def __init__(self, root, interval_ms=50):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.interval_ms = interval_ms
+        self._expected = None
+        self._after_id = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        metrics.observe('tk.event_loop_lag', lag)
+        if lag > STALL_THRESHOLD:
+            metrics.increment('tk.stalls')
+        self._expected = now + self.interval
+        self._after_id = self.root.after(self.interval_ms, self._beat)
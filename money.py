@@ -0,0 +1,380 @@
+import decimal
+import math
+import re
+from decimal import (ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_DOWN, ROUND_HALF_EVEN,
+                     ROUND_HALF_UP, ROUND_UP)
+from itertools import repeat
+from operator import getitem, truediv
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Decimal places of each currency's minor unit (ISO 4217); others use 2
+MINOR_UNITS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0, 'KRW': 0,
+    'PYG': 0, 'RWF': 0, 'UGX': 0, 'UYI': 0, 'VND': 0, 'VUV': 0, 'XAF': 0, 'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+DEFAULT_MINOR_UNITS = 2
+
+# Rounding applied when a result falls between two minor units; any of the
+# decimal module's ROUND_* modes except ROUND_05UP
+DEFAULT_ROUNDING = ROUND_HALF_EVEN
+
+# Batches work in int64 on pairs whose numerator and denominator are below
+# this; a remainder of a few denominators then still fits
+_MAX_BATCH_TERM = 2 ** 60
+
+# Most decimals to_minor_many() scales in bulk; 10**18 still fits in int64
+_MAX_BULK_DECIMALS = 18
+
+# Batch results must stay below this many minor units for the float
+# estimate to be within a few units of the exact quotient
+_MAX_BATCH_UNITS = 2 ** 52
+
+# Below this, a float parsed from decimal text and scaled to an integer is
+# within a quarter of it, so to_minor_many() can round it exactly
+_EXACT_FLOAT_UNITS = 2 ** 50
+
+# Scaling by a power of ten is exact in this context, however many digits
+_EXACT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+# Amounts such as "12", "-0.5" or "3." without an exponent
+_PLAIN_NUMBER = re.compile(r'\s*([-+]?)(?=\.?\d)(\d*)\.?(\d*)\s*$')
+
+
+def minor_units(code):
+    return MINOR_UNITS.get(code, DEFAULT_MINOR_UNITS)
+
+
+def to_minor(amount, code, rounding=DEFAULT_ROUNDING):
+    """Amount (a str, int, float or Decimal in major units) as integer minor units"""
+    if isinstance(amount, int):
+        return amount * 10 ** minor_units(code)
+    if isinstance(amount, float):
+        # The shortest repr is what the user typed, not the binary value
+        amount = repr(amount)
+    if isinstance(amount, str):
+        match = _PLAIN_NUMBER.match(amount)
+        if match:
+            # Plain decimal text is scaled with string and integer operations,
+            # which is several times faster than going through Decimal
+            sign, whole, fraction = match.groups()
+            places = minor_units(code)
+            extra = len(fraction) - places
+            units = int(sign + (whole or '0') + fraction.ljust(places, '0'))
+            if extra <= 0:
+                return units
+            divisor = 10 ** extra
+            quotient, remainder = divmod(units, divisor)
+            return round_quotient(quotient, remainder, divisor, rounding)
+    value = decimal.Decimal(amount).scaleb(minor_units(code), _EXACT)
+    return int(value.to_integral_value(rounding=rounding))
+
+
+def format_minor(units, code):
+    """Minor units as a plain decimal string in major units, e.g. 123456 USD -> "1234.56" """
+    places = minor_units(code)
+    if not places:
+        return str(units)
+    whole, fraction = divmod(abs(units), 10 ** places)
+    return f"{'-' if units < 0 else ''}{whole}.{fraction:0{places}d}"
+
+
+def to_minor_many(amounts, codes, rounding=DEFAULT_ROUNDING):
+    """to_minor() over a column of amounts; codes may be a single code
+
+    Returns an int64 NumPy array when NumPy is installed and a list of
+    ints otherwise. Plain decimal text, the common case, is parsed as
+    floats in bulk: each is scaled by 10**(its own decimals) and rounded to
+    the integer its digits spell, which is exact below 2**50, then rounded
+    to minor units like round_quotient(). Anything else, such as amounts
+    with an exponent, goes through to_minor() one by one.
+    """
+    if np is None:
+        if isinstance(codes, str):
+            return [to_minor(amount, codes, rounding) for amount in amounts]
+        return [to_minor(amount, code, rounding) for amount, code in zip(amounts, codes)]
+
+    texts = amounts if all(isinstance(amount, str) for amount in amounts) else list(map(str, amounts))
+    count = len(texts)
+    places = (np.full(count, minor_units(codes)) if isinstance(codes, str)
+              else np.fromiter(map(MINOR_UNITS.get, codes, repeat(DEFAULT_MINOR_UNITS)), dtype=np.int64, count=count))
+    try:
+        decimals = _decimal_places(texts)
+        digits = np.fromiter(map(float, texts), dtype=float, count=count) * np.power(10.0, np.maximum(decimals, 0))
+    except ValueError:
+        decimals = np.full(count, -1)
+        digits = np.zeros(count)
+    with np.errstate(invalid='ignore'):
+        simple = (decimals >= 0) & (decimals <= _MAX_BULK_DECIMALS) & (np.abs(digits) < _EXACT_FLOAT_UNITS)
+    digits = np.rint(np.where(simple, digits, 0)).astype(np.int64)
+    extra = decimals - places
+    divisor = np.power(np.int64(10), np.maximum(extra, 0))
+    quotient, remainder = np.divmod(digits * np.power(np.int64(10), np.maximum(-extra, 0)), divisor)
+    units = round_quotient(quotient, remainder, divisor, rounding)
+    for position in np.flatnonzero(~simple).tolist():
+        code = codes if isinstance(codes, str) else codes[position]
+        units[position] = to_minor(texts[position], code, rounding)
+    return units
+
+
+def _decimal_places(texts):
+    # Digits after the point in each text, or -1 when it has an exponent;
+    # counted on the bytes of all texts joined, without a Python loop.
+    # Raises ValueError when the rows cannot be told apart.
+    joined = '\n'.join(texts).encode()
+    chars = np.frombuffer(joined, dtype=np.uint8)
+    ends = np.append(np.flatnonzero(chars == ord('\n')), len(chars))
+    starts = np.append(0, ends[:-1] + 1)
+    if len(ends) != len(texts) or (starts >= ends).any():
+        raise ValueError("Amounts must be non-empty single-line text")
+    positions = np.where(chars == ord('.'), np.arange(len(chars)), -1)
+    dots = np.maximum.reduceat(positions, starts)
+    decimals = np.where(dots >= starts, ends - dots - 1, 0)
+    decimals[np.logical_or.reduceat((chars | 0x20) == ord('e'), starts)] = -1
+    return decimals
+
+
+def format_many(units, codes):
+    """format_minor() over a column of minor units; codes may be a single code
+
+    Below 2**52 units the quotient units / 10**places is within half a
+    unit in the last place, so formatting it as a float to that many
+    places gives the exact digits, about twice as fast.
+    """
+    if np is not None and isinstance(units, np.ndarray):
+        units = units.tolist()
+    if isinstance(codes, str):
+        codes = [codes] * len(units)
+    if not units or max(map(abs, units)) >= _MAX_BATCH_UNITS:
+        return list(map(format_minor, units, codes))
+    places = list(map(MINOR_UNITS.get, codes, repeat(DEFAULT_MINOR_UNITS)))
+    scales = {count: 10 ** count for count in set(places)}
+    specs = {count: f'.{count}f' for count in scales}
+    return list(map(format, map(truediv, units, map(scales.__getitem__, places)), map(specs.__getitem__, places)))
+
+
+def to_decimal(units, code):
+    return decimal.Decimal(units).scaleb(-minor_units(code), _EXACT)
+
+
+def round_quotient(quotient, remainder, divisor, rounding=DEFAULT_ROUNDING):
+    """Round quotient + remainder / divisor to an integer
+
+    quotient and remainder are from floor division, so 0 <= remainder <
+    divisor; all three may be ints or NumPy integer arrays. Modes follow
+    the decimal module, so ties and negative values round as Decimal does.
+    """
+    inexact = remainder > 0
+    negative = quotient < 0
+    if rounding == ROUND_FLOOR:
+        return quotient
+    if rounding == ROUND_CEILING:
+        return quotient + inexact
+    if rounding == ROUND_DOWN:
+        return quotient + (inexact & negative)
+    if rounding == ROUND_UP:
+        return quotient + (inexact & (quotient >= 0))
+    twice = remainder * 2
+    above = twice > divisor
+    tie = twice == divisor
+    if rounding == ROUND_HALF_UP:
+        return quotient + (above | (tie & (quotient >= 0)))
+    if rounding == ROUND_HALF_DOWN:
+        return quotient + (above | (tie & negative))
+    if rounding == ROUND_HALF_EVEN:
+        return quotient + (above | (tie & (quotient % 2 == 1)))
+    raise ValueError(f"Unsupported rounding mode {rounding!r}")
+
+
+class MoneyTable:
+    """Exact currency conversion on integer minor units
+
+    Each pair's cross-rate, including the change in minor units, is kept
+    as an exact fraction in lowest terms, built from the decimal text of
+    the published rates and cached on first use. A conversion is then
+    divmod(amount * numerator, denominator), rounded once to a whole
+    minor unit, which is what Decimal gives with enough precision. Batches
+    run on int64 arrays: a float estimate of each quotient is corrected
+    against the exact fraction with wrapping integer arithmetic.
+    """
+
+    def __init__(self, rates):
+        self.codes = sorted(rates)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        # Each rate as the integer ratio of its decimal text
+        self._rates = [decimal.Decimal(repr(float(rates[code]))).as_integer_ratio() for code in self.codes]
+        self._pairs = {}
+        self._rows = None
+        self._matrices = None
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def _code_index(self, code):
+        try:
+            return self.index[code]
+        except KeyError:
+            raise KeyError(f"Currency {code!r} not found in exchange rates") from None
+
+    def _pair(self, i, j):
+        # (numerator, denominator) converting minor units of codes[i] into codes[j]
+        pair = self._pairs.get((i, j))
+        if pair is None:
+            from_numerator, from_denominator = self._rates[i]
+            to_numerator, to_denominator = self._rates[j]
+            numerator = to_numerator * from_denominator
+            denominator = to_denominator * from_numerator
+            shift = minor_units(self.codes[j]) - minor_units(self.codes[i])
+            if shift > 0:
+                numerator *= 10 ** shift
+            else:
+                denominator *= 10 ** -shift
+            common = math.gcd(numerator, denominator)
+            pair = self._pairs[(i, j)] = (numerator // common, denominator // common)
+        return pair
+
+    def cross_rate(self, from_curr, to_curr):
+        """(numerator, denominator): one minor unit of from_curr is their ratio in to_curr's"""
+        return self._pair(self._code_index(from_curr), self._code_index(to_curr))
+
+    def convert(self, units, from_curr, to_curr, rounding=DEFAULT_ROUNDING):
+        """Convert an integer number of minor units, returning minor units"""
+        numerator, denominator = self.cross_rate(from_curr, to_curr)
+        quotient, remainder = divmod(units * numerator, denominator)
+        return round_quotient(quotient, remainder, denominator, rounding)
+
+    def matrices(self):
+        """Numerator, denominator and float factor matrices for every pair, built once
+
+        Pairs whose terms do not fit in _MAX_BATCH_TERM have a zero
+        denominator, and batches convert them one by one.
+        """
+        if self._matrices is None:
+            count = len(self.codes)
+            numerators = np.zeros(count * count, dtype=np.int64)
+            denominators = np.zeros(count * count, dtype=np.int64)
+            factors = np.empty(count * count)
+            for i in range(count):
+                for j in range(count):
+                    numerator, denominator = self._pair(i, j)
+                    position = i * count + j
+                    factors[position] = numerator / denominator
+                    if max(numerator, denominator) < _MAX_BATCH_TERM:
+                        numerators[position] = numerator
+                        denominators[position] = denominator
+            self._matrices = (numerators, denominators, factors)
+        return self._matrices
+
+    def convert_many(self, units, from_codes, to_codes, rounding=DEFAULT_ROUNDING):
+        """Convert a column of minor-unit amounts; either code argument may be a single code
+
+        Returns an int64 NumPy array when NumPy is installed and a list of
+        ints otherwise. Results are identical to convert() on each amount.
+        """
+        if np is None:
+            return self._convert_list(units, from_codes, to_codes, rounding)
+
+        units = np.asarray(units, dtype=np.int64)
+        pairs = self._indices(from_codes) * len(self.codes) + self._indices(to_codes)
+        numerators, denominators, factors = self.matrices()
+        numerator = np.broadcast_to(numerators.take(pairs), units.shape)
+        denominator = np.broadcast_to(denominators.take(pairs), units.shape)
+        estimate = units * factors.take(pairs)
+        if len(units) and np.abs(estimate).max() >= _MAX_BATCH_UNITS:
+            raise OverflowError("Amounts too large for a batch conversion; use convert()")
+
+        # Rows of oversized pairs get a dummy divisor here and are redone below
+        large = denominator == 0
+        divisor = np.where(large, 1, denominator)
+        quotient = np.where(large, 0, np.floor(estimate)).astype(np.int64)
+        # The true remainder is within a few divisors of this, so wrapping
+        # int64 arithmetic gives it exactly
+        with np.errstate(over='ignore'):
+            remainder = units * numerator - quotient * divisor
+        while True:
+            low = remainder < 0
+            high = remainder >= divisor
+            if not (low.any() or high.any()):
+                break
+            quotient += high.astype(np.int64) - low
+            remainder += np.where(low, divisor, 0) - np.where(high, divisor, 0)
+        results = round_quotient(quotient, remainder, divisor, rounding)
+        for position in np.flatnonzero(large).tolist():
+            from_curr = from_codes if isinstance(from_codes, str) else str(from_codes[position])
+            to_curr = to_codes if isinstance(to_codes, str) else str(to_codes[position])
+            results[position] = self.convert(int(units[position]), from_curr, to_curr, rounding)
+        return results
+
+    def _convert_list(self, units, from_codes, to_codes, rounding):
+        # convert_many() without NumPy. Each row's terms come from plain
+        # nested dicts keyed by code, looked up in C-level map() calls, which
+        # is cheaper than indices or tuple keys; each mode is then a single
+        # comprehension over plain ints.
+        try:
+            return self._convert_rows(units, from_codes, to_codes, rounding)
+        except KeyError as error:
+            raise KeyError(f"Currency {error.args[0]!r} not found in exchange rates") from None
+
+    def _term_rows(self):
+        # {from code: {to code: (numerator, denominator, 2 * numerator, 2 * denominator)}}
+        # for every pair, built once like matrices()
+        if self._rows is None:
+            self._rows = {}
+            for i, code in enumerate(self.codes):
+                row = self._rows[code] = {}
+                for j, target in enumerate(self.codes):
+                    numerator, denominator = self._pair(i, j)
+                    row[target] = (numerator, denominator, 2 * numerator, 2 * denominator)
+        return self._rows
+
+    def _convert_rows(self, units, from_codes, to_codes, rounding):
+        rows = self._term_rows()
+        if isinstance(from_codes, str):
+            row = rows[from_codes]
+            terms = repeat(row[to_codes]) if isinstance(to_codes, str) else map(row.__getitem__, to_codes)
+        elif isinstance(to_codes, str):
+            terms = map(getitem, map(rows.__getitem__, from_codes), repeat(to_codes))
+        else:
+            terms = map(getitem, map(rows.__getitem__, from_codes), to_codes)
+        pairs = zip(units, terms)
+
+        if rounding == ROUND_FLOOR:
+            return [u * n // d for u, (n, d, _, _) in pairs]
+        if rounding == ROUND_CEILING:
+            return [-(-u * n // d) for u, (n, d, _, _) in pairs]
+        # The terms are positive, so the sign of the amount is the sign of the result
+        if rounding == ROUND_DOWN:
+            return [u * n // d if u >= 0 else -(-u * n // d) for u, (n, d, _, _) in pairs]
+        if rounding == ROUND_UP:
+            return [-(-u * n // d) if u >= 0 else u * n // d for u, (n, d, _, _) in pairs]
+
+        # floor((2p + d) / 2d) is the nearest integer to p / d with ties
+        # rounded up; a zero remainder marks a tie, which the mode may move
+        # down by one
+        if rounding == ROUND_HALF_EVEN:
+            return [x // d2 if (x := u * n2 + d) % d2 else x // d2 - (x // d2 & 1)
+                    for u, (_, d, n2, d2) in pairs]
+        if rounding == ROUND_HALF_UP:
+            return [x // d2 if (x := u * n2 + d) % d2 else x // d2 - (u < 0)
+                    for u, (_, d, n2, d2) in pairs]
+        if rounding == ROUND_HALF_DOWN:
+            return [x // d2 if (x := u * n2 + d) % d2 else x // d2 - (u >= 0)
+                    for u, (_, d, n2, d2) in pairs]
+        raise ValueError(f"Unsupported rounding mode {rounding!r}")
+
+    def _indices(self, codes):
+        if isinstance(codes, str):
+            return self._code_index(codes)
+        if isinstance(codes, np.ndarray):
+            unique, inverse = np.unique(codes, return_inverse=True)
+            lookup = np.array([self._code_index(str(code)) for code in unique], dtype=np.intp)
+            return lookup[inverse]
+        # For a list, a dict lookup per code beats np.unique(), which sorts
+        try:
+            return np.fromiter(map(self.index.__getitem__, codes), dtype=np.intp, count=len(codes))
+        except KeyError as error:
+            raise KeyError(f"Currency {error.args[0]!r} not found in exchange rates") from None
@@ -0,0 +1,346 @@
+import bisect
+import csv
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+from array import array
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bump when the on-disk layout changes; older stores are treated as empty
+HISTORY_SCHEMA_VERSION = 1
+
+NAN = float('nan')
+
+# Three-letter currency codes; each one also names a column file, so
+# nothing else may reach the file system
+CODE_PATTERN = re.compile(r'[A-Z]{3}')
+
+# Per-currency file of one byte per stored day, 1 where the day quoted it
+_QUOTED_SUFFIX = '.quoted.u1'
+
+# Day number of 1970-01-01, where NumPy's datetime64 counts from
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+def default_rate_history_path():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'plp-calculator', 'rate-history')
+
+
+def day_number(day):
+    """Proleptic ordinal of a date, datetime or ISO "YYYY-MM-DD" string; ints pass through"""
+    if isinstance(day, int):
+        return day
+    if isinstance(day, str):
+        day = date.fromisoformat(day.strip()[:10])
+    return day.toordinal()
+
+
+def _usd_based(rates, base):
+    # Snapshots quoted against another base are converted to the USD base
+    rates = {code.upper(): float(rate) for code, rate in rates.items()}
+    base = (base or 'USD').upper()
+    rates.setdefault(base, 1.0)
+    for code in rates:
+        if not CODE_PATTERN.fullmatch(code):
+            raise ValueError(f"Invalid currency code {code!r}")
+    if base != 'USD':
+        if 'USD' not in rates:
+            raise ValueError(f"Snapshot based on {base} has no USD rate")
+        usd = rates['USD']
+        rates = {code: rate / usd for code, rate in rates.items()}
+    return rates
+
+
+def read_snapshots(path):
+    """Yield (day, rates) pairs from a CSV or JSON file of daily rates
+
+    CSV files are either wide, "date,EUR,GBP,..." with one row per day, or
+    long, "date,currency,rate" with one row per rate. JSON files hold one
+    snapshot like the live API returns ({"date": ..., "base": ..., "rates":
+    {...}}), a list of those, a time series ({"rates": {date: {...}}}) or a
+    plain {date: {code: rate}} mapping. Rates are converted to a USD base.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        yield from _json_snapshots(data)
+        return
+
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = [field.strip() for field in next(reader, [])]
+        if [field.lower() for field in header] == ['date', 'currency', 'rate']:
+            days = {}
+            for row in reader:
+                if row:
+                    days.setdefault(row[0], {})[row[1].strip()] = row[2]
+            for day, rates in days.items():
+                yield day_number(day), _usd_based(rates, 'USD')
+            return
+        codes = header[1:]
+        for row in reader:
+            if row:
+                rates = {code: value for code, value in zip(codes, row[1:]) if value.strip()}
+                yield day_number(row[0]), _usd_based(rates, 'USD')
+
+
+def _json_snapshots(data):
+    if isinstance(data, list):
+        for item in data:
+            yield from _json_snapshots(item)
+        return
+    if 'rates' in data:
+        rates = data['rates']
+        if rates and all(isinstance(value, dict) for value in rates.values()):
+            for day, day_rates in rates.items():
+                yield day_number(day), _usd_based(day_rates, data.get('base'))
+        else:
+            yield day_number(data['date']), _usd_based(rates, data.get('base'))
+        return
+    for day, rates in data.items():
+        yield day_number(day), _usd_based(rates, 'USD')
+
+
+class RateHistory:
+    """Daily USD based exchange rates stored column by column on disk
+
+    The store is a directory holding one little-endian file of day numbers
+    and one float64 file per currency, all in date order; meta.json names
+    the current data directory and is replaced atomically on every write.
+    With NumPy the rate columns are memory-mapped and range queries return
+    array views; without it they are read into array.array objects.
+    Point lookups bisect the date column, so they are O(log n), and a date
+    between stored days uses the latest earlier day. A currency missing
+    from a day's data carries its previous value forward; a byte file per
+    currency marks the days that were really quoted, so an import that
+    fills a gap carries the new value forward instead.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_rate_history_path()
+        self.meta_path = os.path.join(self.path, 'meta.json')
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            meta = None
+        if not meta or meta.get('schema') != HISTORY_SCHEMA_VERSION or not meta.get('count'):
+            meta = {'codes': [], 'count': 0, 'data': None}
+        self.codes = meta['codes']
+        self._code_set = frozenset(self.codes)
+        self.count = meta['count']
+        self.data_path = meta['data'] and os.path.join(self.path, meta['data'])
+        self._columns = {}
+        # Day numbers are small and always read into memory, where bisect is
+        # faster than on a memory map
+        self.dates = self._read('dates.i4', 'i') if self.count else array('i')
+
+    def _read(self, name, typecode):
+        path = os.path.join(self.data_path, name)
+        if np is not None and typecode == 'd':
+            return np.memmap(path, dtype='<f8', mode='r', shape=(self.count,))
+        values = array(typecode)
+        with open(path, 'rb') as file:
+            values.fromfile(file, self.count)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, code):
+        return code in self._code_set
+
+    @property
+    def first_date(self):
+        return date.fromordinal(int(self.dates[0])) if self.count else None
+
+    @property
+    def last_date(self):
+        return date.fromordinal(int(self.dates[-1])) if self.count else None
+
+    def column(self, code):
+        """All stored rates for code, in date order"""
+        column = self._columns.get(code)
+        if column is None:
+            if code not in self:
+                raise KeyError(f"Currency {code!r} not found in rate history")
+            column = self._columns[code] = self._read(code + '.f8', 'd')
+        return column
+
+    def _position(self, day):
+        position = bisect.bisect_right(self.dates, day_number(day)) - 1
+        if position < 0:
+            raise KeyError(f"No rates stored on or before {day}")
+        return position
+
+    def rate(self, code, day):
+        """USD rate of code on day, or on the latest stored day before it"""
+        value = float(self.column(code)[self._position(day)])
+        if math.isnan(value):
+            raise KeyError(f"No {code} rate stored on or before {day}")
+        return value
+
+    def rates_on(self, day):
+        """All rates known on day as a {code: rate} dict, e.g. for a RateTable"""
+        position = self._position(day)
+        rates = {}
+        for code in self.codes:
+            value = float(self.column(code)[position])
+            if not math.isnan(value):
+                rates[code] = value
+        return rates
+
+    def convert(self, amount, from_curr, to_curr, day):
+        return amount * self.rate(to_curr, day) / self.rate(from_curr, day)
+
+    def money_table(self, codes, day):
+        """MoneyTable for exact minor-unit conversion between codes at day's rates"""
+        from money import MoneyTable
+        return MoneyTable({code: self.rate(code, day) for code in codes})
+
+    def series(self, code, start=None, end=None):
+        """Day numbers and rates of code between start and end inclusive
+
+        Both are slices of the stored columns (views with NumPy); use
+        date.fromordinal() to turn a day number back into a date.
+        """
+        low = 0 if start is None else bisect.bisect_left(self.dates, day_number(start))
+        high = self.count if end is None else bisect.bisect_right(self.dates, day_number(end))
+        dates = self.dates if np is None else np.frombuffer(self.dates, dtype=np.int32)
+        return dates[low:high], self.column(code)[low:high]
+
+    def convert_many(self, amounts, from_codes, to_codes, days):
+        """Convert a column of amounts, each at the rates of its own day
+
+        Either code argument may be a single code, and days may also be a
+        NumPy array of day numbers or datetime64 values. Pairs with no rate
+        on a day give NaN. Returns a NumPy array, or a list without NumPy.
+        """
+        if np is not None:
+            if isinstance(days, np.ndarray) and days.dtype.kind == 'M':
+                numbers = days.astype('datetime64[D]').astype(np.int64) + _EPOCH_DAY
+            elif isinstance(days, np.ndarray) and days.dtype.kind in 'iu':
+                numbers = days
+            else:
+                numbers = np.fromiter(map(day_number, days), dtype=np.int64, count=len(days))
+            dates = np.frombuffer(self.dates, dtype=np.int32)
+            positions = np.searchsorted(dates, numbers, side='right') - 1
+            if len(positions) and positions.min() < 0:
+                raise KeyError("Some dates are before the first stored day")
+            amounts = np.asarray(amounts, dtype=float)
+            return amounts * self._gather(to_codes, positions) / self._gather(from_codes, positions)
+
+        positions = [bisect.bisect_right(self.dates, day_number(day)) - 1 for day in days]
+        if positions and min(positions) < 0:
+            raise KeyError("Some dates are before the first stored day")
+        if isinstance(from_codes, str):
+            from_codes = [from_codes] * len(positions)
+        if isinstance(to_codes, str):
+            to_codes = [to_codes] * len(positions)
+        return [amount * self.column(to_code)[position] / self.column(from_code)[position]
+                for amount, from_code, to_code, position in zip(amounts, from_codes, to_codes, positions)]
+
+    def _gather(self, codes, positions):
+        if isinstance(codes, str):
+            return self.column(codes)[positions]
+        unique, inverse = np.unique(np.asarray(codes), return_inverse=True)
+        values = np.empty(len(positions))
+        for index, code in enumerate(unique):
+            mask = inverse == index
+            values[mask] = self.column(str(code))[positions[mask]]
+        return values
+
+    def import_files(self, paths):
+        """Bulk import CSV or JSON files and return the number of days read"""
+        snapshots = []
+        for path in paths:
+            snapshots.extend(read_snapshots(path))
+        return self.import_snapshots(snapshots)
+
+    def import_snapshots(self, snapshots):
+        """Merge (day, {code: rate}) pairs into the store, newer data winning
+
+        Rates are USD based, so USD itself is always stored at 1. The whole
+        store is rewritten column by column into a fresh data directory,
+        which is then published by replacing meta.json.
+        """
+        incoming = {}
+        for day, rates in snapshots:
+            incoming.setdefault(day_number(day), {}).update(_usd_based(rates, 'USD'))
+        if not incoming:
+            return 0
+
+        days = sorted(set(int(day) for day in self.dates) | set(incoming))
+        row = {day: index for index, day in enumerate(days)}
+        codes = sorted(set(self.codes).union(*incoming.values()))
+        old_rows = [row[int(day)] for day in self.dates]
+
+        data_name = f"data-{time.time_ns()}"
+        data_path = os.path.join(self.path, data_name)
+        os.makedirs(data_path)
+        self._write(os.path.join(data_path, 'dates.i4'), 'i', days)
+        for code in codes:
+            # Start from the quoted values only and carry them forward again
+            column = [NAN] * len(days)
+            if code in self:
+                for index, value, quoted in zip(old_rows, self.column(code), self._quoted(code)):
+                    if quoted:
+                        column[index] = float(value)
+            for day, rates in incoming.items():
+                if code in rates:
+                    column[row[day]] = rates[code]
+            with open(os.path.join(data_path, code + _QUOTED_SUFFIX), 'wb') as file:
+                file.write(bytes(not math.isnan(value) for value in column))
+            previous = NAN
+            for index, value in enumerate(column):
+                if math.isnan(value):
+                    column[index] = previous
+                else:
+                    previous = value
+            self._write(os.path.join(data_path, code + '.f8'), 'd', column)
+
+        meta = {'schema': HISTORY_SCHEMA_VERSION, 'data': data_name, 'codes': codes, 'count': len(days)}
+        temp_path = self.meta_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(temp_path, self.meta_path)
+
+        old_data = self.data_path
+        self._load()
+        if old_data:
+            # Open memory maps can keep the old files busy on some platforms
+            shutil.rmtree(old_data, ignore_errors=True)
+        return len(incoming)
+
+    def _quoted(self, code):
+        """One flag per stored day, true where code was quoted rather than carried forward"""
+        path = os.path.join(self.data_path, code + _QUOTED_SUFFIX)
+        try:
+            with open(path, 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            # Stores written before the flags existed only know what was filled
+            return [not math.isnan(value) for value in self.column(code)]
+
+    @staticmethod
+    def _write(path, typecode, values):
+        values = array(typecode, values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        with open(path, 'wb') as file:
+            values.tofile(file)
@@ -0,0 +1,139 @@
+import bisect
+import tkinter as tk
+
+# Height of one rate row on the canvas, in pixels
+ROW_HEIGHT = 18
+
+
+class PrefixIndex:
+    """Sorted keys answering prefix queries with two binary searches"""
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, prefix):
+        """Keys starting with prefix, in sorted order"""
+        if not prefix:
+            return self.keys
+        low = bisect.bisect_left(self.keys, prefix)
+        high = bisect.bisect_left(self.keys, prefix + '￿', low)
+        return self.keys[low:high]
+
+
+class RateListView:
+    """Searchable list of every exchange rate that only draws visible rows
+
+    The canvas holds one text item per visible row; scrolling and filtering
+    re-label those items rather than creating widgets for all currencies.
+    Typing in the filter box narrows the list through a PrefixIndex of the
+    currency codes, and set_rates() relabels only the visible rows whose
+    rate changed. Clicking a row passes its code to on_pick.
+    """
+
+    def __init__(self, parent, symbols, on_pick=None, rows=8):
+        self.symbols = symbols
+        self.on_pick = on_pick
+        self.rates = {}
+        self.index = PrefixIndex(())
+        self.codes = []
+        self.top = 0
+        self.items = []
+        self.shown = {}
+
+        self.frame = tk.Frame(parent, bg='#1a1a1a')
+        search_frame = tk.Frame(self.frame, bg='#1a1a1a')
+        search_frame.pack(fill='x')
+        tk.Label(search_frame, text="Find:", bg='#1a1a1a', fg='white').pack(side='left')
+        self.query = tk.StringVar()
+        tk.Entry(search_frame, textvariable=self.query, width=8, bg='#2d2d2d', fg='white',
+                 insertbackground='white').pack(side='left', padx=5)
+        self.status = tk.Label(search_frame, text="", bg='#1a1a1a', fg='#888', anchor='e')
+        self.status.pack(side='right', fill='x', expand=True)
+
+        list_frame = tk.Frame(self.frame, bg='#1a1a1a')
+        list_frame.pack(fill='both', expand=True, pady=5)
+        self.scrollbar = tk.Scrollbar(list_frame, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas = tk.Canvas(list_frame, height=rows * ROW_HEIGHT, bg='#2d2d2d', highlightthickness=0)
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.query.trace_add('write', lambda *args: self.apply_filter())
+        self.canvas.bind('<Configure>', lambda event: self.render())
+        self.canvas.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        self.canvas.bind('<Button-4>', lambda event: self.scroll(-1))
+        self.canvas.bind('<Button-5>', lambda event: self.scroll(1))
+        self.canvas.bind('<Button-1>', self._pick)
+
+    def set_rates(self, rates, status=""):
+        """Show new rates, relabelling only visible rows whose rate changed"""
+        old = self.rates
+        self.rates = dict(rates)
+        self.status.config(text=status)
+        if old.keys() != self.rates.keys():
+            self.index = PrefixIndex(self.rates)
+            self.apply_filter(keep_position=True)
+            return
+        for code, rate in self.rates.items():
+            if old[code] != rate:
+                item = self.shown.get(code)
+                if item is not None:
+                    self.canvas.itemconfigure(item, text=self._row_text(code))
+
+    def apply_filter(self, keep_position=False):
+        self.codes = self.index.match(self.query.get().strip().upper())
+        if not keep_position:
+            self.top = 0
+        self.render()
+
+    def _visible_rows(self):
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            # Not laid out yet; use the requested height
+            height = int(self.canvas.cget('height'))
+        return max(1, height // ROW_HEIGHT)
+
+    def render(self):
+        """Relabel the pooled row items for the rows currently in view"""
+        visible = self._visible_rows()
+        self.top = max(0, min(self.top, len(self.codes) - visible))
+        while len(self.items) < visible:
+            y = len(self.items) * ROW_HEIGHT + 2
+            self.items.append(self.canvas.create_text(6, y, anchor='nw', fill='white', font=('Courier', 10)))
+        self.shown = {}
+        for row, item in enumerate(self.items):
+            position = self.top + row
+            if row < visible and position < len(self.codes):
+                code = self.codes[position]
+                self.shown[code] = item
+                self.canvas.itemconfigure(item, text=self._row_text(code))
+            else:
+                self.canvas.itemconfigure(item, text="")
+        total = len(self.codes) or 1
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+
+    def _row_text(self, code):
+        symbol = self.symbols.get(code, '')
+        return f"{code:<4} 1 USD = {symbol}{self.rates[code]:.4f}"
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+
+    def yview(self, *args):
+        # Scrollbar protocol: ("moveto", fraction) or ("scroll", count, "units"/"pages")
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.codes))
+        elif args[0] == 'scroll':
+            count = int(args[1])
+            self.top += count * self._visible_rows() if args[2] == 'pages' else count
+        self.render()
+
+    def _pick(self, event):
+        # Rows below the last visible one are blank, even if codes follow
+        row = event.y // ROW_HEIGHT
+        position = self.top + row
+        if self.on_pick and 0 <= row < self._visible_rows() and position < len(self.codes):
+            self.on_pick(self.codes[position])
@@ -0,0 +1,297 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from instrumentation import timed
+
+RATES_URL = 'https://api.exchangerate-api.com/v4/latest/USD'
+
+# Providers queried by default, in order of preference
+DEFAULT_PROVIDER_URLS = [
+    ('exchangerate-api', RATES_URL),
+    ('open-er-api', 'https://open.er-api.com/v6/latest/USD'),
+    ('frankfurter', 'https://api.frankfurter.app/latest?from=USD'),
+]
+
+# Seconds to wait for a provider before also asking the next one
+DEFAULT_HEDGE_AFTER = 0.75
+
+# Bump when the layout of the cache file changes; older files are ignored
+CACHE_SCHEMA_VERSION = 1
+
+# Cached rates younger than this are used without contacting the API
+DEFAULT_TTL = 6 * 60 * 60
+
+# Rates used when the exchange rate API cannot be reached
+FALLBACK_RATES = {
+    'USD': 1.0, 'EUR': 0.85, 'GBP': 0.73, 'JPY': 110.0,
+    'CAD': 1.25, 'AUD': 1.35, 'CHF': 0.92, 'CNY': 6.45,
+    'INR': 74.5, 'KRW': 1180.0
+}
+
+
+def default_cache_path():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'plp-calculator', 'rates.json')
+
+
+ProviderResponse = namedtuple('ProviderResponse', 'provider rates etag last_modified not_modified')
+
+
+class RatesUnavailable(Exception):
+    """Raised when no provider returned usable rates in time"""
+
+
+class RateProvider:
+    """A source of USD based exchange rates reached over HTTP
+
+    Subclasses can override parse() for APIs with a different payload. Each
+    worker thread keeps its own keep-alive session, so repeated and hedged
+    requests reuse connections.
+    """
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self._local = threading.local()
+
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def parse(self, data):
+        rates = data['rates']
+        if not isinstance(rates, dict) or not rates:
+            raise ValueError("No rates in response")
+        rates = {code: float(rate) for code, rate in rates.items()}
+        if any(rate <= 0 for rate in rates.values()):
+            raise ValueError("Non-positive rate in response")
+        rates['USD'] = 1.0  # Base currency
+        return rates
+
+    def fetch(self, etag=None, last_modified=None, timeout=5):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self.session().get(self.url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and (etag or last_modified):
+            return ProviderResponse(self.name, None, etag, last_modified, True)
+        if response.status_code != 200:
+            raise Exception(f"{self.name}: API request failed with status {response.status_code}")
+        return ProviderResponse(self.name, self.parse(response.json()), response.headers.get('ETag'),
+                                response.headers.get('Last-Modified'), False)
+
+    def __repr__(self):
+        return f"RateProvider({self.name!r}, {self.url!r})"
+
+
+def default_providers():
+    return [RateProvider(name, url) for name, url in DEFAULT_PROVIDER_URLS]
+
+
+class HedgedFetcher:
+    """Query rate providers concurrently and return the first valid answer
+
+    The first provider is asked straight away. If it has not answered
+    within hedge_after seconds, or fails, the next one is asked as well,
+    cycling back to retry earlier providers until max_attempts requests have
+    been sent or the timeout passes. Requests run on a small persistent
+    thread pool so provider sessions stay warm between refreshes.
+    """
+
+    def __init__(self, providers, timeout=5, hedge_after=DEFAULT_HEDGE_AFTER, max_attempts=None):
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts or 2 * len(self.providers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=len(self.providers) + 1,
+                                                    thread_name_prefix='rates')
+            return self._executor
+
+    def fetch(self, entry=None):
+        """Return a ProviderResponse, revalidating entry with the provider that produced it"""
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        pool = self._pool()
+        deadline = time.monotonic() + self.timeout
+        pending = set()
+        errors = []
+        launched = 0
+
+        def launch():
+            nonlocal launched
+            provider = self.providers[launched % len(self.providers)]
+            launched += 1
+            etag = last_modified = None
+            if entry and entry.get('provider') == provider.name:
+                etag, last_modified = entry.get('etag'), entry.get('last_modified')
+            pending.add(pool.submit(provider.fetch, etag, last_modified, self.timeout))
+
+        launch()
+        next_hedge = time.monotonic() + self.hedge_after
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            can_launch = launched < self.max_attempts
+            wait_until = min(deadline, next_hedge) if can_launch else deadline
+            done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(e)
+            if can_launch and (not pending or time.monotonic() >= next_hedge):
+                launch()
+                next_hedge = time.monotonic() + self.hedge_after
+            elif not pending:
+                break
+        raise RatesUnavailable("; ".join(str(e) for e in errors) or "Timed out waiting for rate providers")
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class RateCache:
+    """On-disk exchange rate cache with TTL and conditional refresh
+
+    load() returns whatever is on disk straight away, stale or not, and
+    refresh() revalidates it through a HedgedFetcher using ETag/Last-Modified
+    so an unchanged rate table costs a 304 instead of a full download. Pass
+    url= for a single provider (such as a local stand-in server) or
+    providers= for a custom list.
+    """
+
+    def __init__(self, path=None, url=None, ttl=DEFAULT_TTL, timeout=5, providers=None,
+                 hedge_after=DEFAULT_HEDGE_AFTER):
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        if providers is None:
+            providers = [RateProvider('custom', url)] if url else default_providers()
+        self.fetcher = HedgedFetcher(providers, timeout=timeout, hedge_after=hedge_after)
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def load(self):
+        """Read the cache file, returning None if it is missing or unusable"""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('schema') != CACHE_SCHEMA_VERSION:
+            return None
+        if not isinstance(entry.get('rates'), dict) or not entry['rates']:
+            return None
+        return entry
+
+    def save(self, entry):
+        """Write the cache file atomically so readers never see a partial file"""
+        import tempfile
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.rates-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(entry, file)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def is_stale(self, entry, now=None):
+        if entry is None:
+            return True
+        now = time.time() if now is None else now
+        return now - entry.get('fetched_at', 0) > entry.get('ttl', self.ttl)
+
+    @timed('rates.fetch')
+    def fetch(self, entry=None):
+        """Fetch rates from the providers, revalidating entry if one is given
+
+        Returns a new cache entry and saves it, or raises on failure.
+        """
+        response = self.fetcher.fetch(entry)
+        if response.not_modified:
+            new_entry = dict(entry, fetched_at=time.time(), ttl=self.ttl)
+        else:
+            new_entry = {
+                'schema': CACHE_SCHEMA_VERSION,
+                'fetched_at': time.time(),
+                'ttl': self.ttl,
+                'provider': response.provider,
+                'etag': response.etag,
+                'last_modified': response.last_modified,
+                'rates': response.rates,
+            }
+        self.save(new_entry)
+        return new_entry
+
+    def refresh(self, entry=None):
+        """Fetch in the calling thread, returning the new entry or None on failure"""
+        try:
+            return self.fetch(entry)
+        except Exception as e:
+            print(f"Failed to load exchange rates: {e}", file=sys.stderr)
+            return None
+
+    def refresh_async(self, entry, callback):
+        """Revalidate in a daemon thread and pass the new entry to callback
+
+        Only one refresh runs at a time; callback is not called on failure.
+        """
+        with self._lock:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+
+        def run():
+            try:
+                new_entry = self.refresh(entry)
+                if new_entry is not None:
+                    callback(new_entry)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+def fetch_exchange_rates(cache=None):
+    """Return USD based rates for one-shot use, refreshing the cache if stale
+
+    Falls back to a stale cache and then to the built-in rates when the API
+    cannot be reached.
+    """
+    cache = cache or RateCache()
+    entry = cache.load()
+    if cache.is_stale(entry):
+        entry = cache.refresh(entry) or entry
+    if entry is None:
+        print("Using built-in fallback exchange rates", file=sys.stderr)
+        return dict(FALLBACK_RATES)
+    return entry['rates']
@@ -0,0 +1,423 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import expression
+import money
+from engine import CalculatorEngine
+from rates import FALLBACK_RATES, RateCache
+
+# Seconds a request waits for others to share its batch, and the largest batch
+BATCH_WINDOW = 0.002
+MAX_BATCH = 1024
+
+# Longest request line accepted, in bytes
+MAX_LINE = 1 << 20
+
+# Responses a connection may have outstanding before reading pauses
+MAX_PENDING = 4096
+
+# How often the server checks whether the cached rates have gone stale
+RATE_CHECK_INTERVAL = 60
+
+# Seconds a batch of expressions may run before its requests fail
+EVALUATE_TIMEOUT = 10.0
+
+# Total bits of integer powers and products one expression may compute;
+# results over 14000 bits cannot be sent back anyway, and the budget keeps
+# in-process evaluation (--workers 0), whose thread cannot be killed, short
+EVALUATE_MAX_BITS = 1 << 22
+
+_EVALUATE_BUDGET = expression.SizeBudget(EVALUATE_MAX_BITS)
+
+
+def evaluate_batch(texts):
+    """Evaluate expressions in a worker process, returning (ok, value) pairs"""
+    results = []
+    for text in texts:
+        try:
+            with _EVALUATE_BUDGET:
+                value = expression.compile_expression(text, budgeted=True)()
+            results.append((True, _json_value(value)))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+    return results
+
+
+def _json_value(value):
+    # JSON has no infinities or NaN, and huge integers cannot become text
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, int) and value.bit_length() > 14000:
+        raise expression.ResultTooLarge("Result too large to display")
+    return value
+
+
+def _function_result(result):
+    # The vectorized paths give NaN and infinities where the scalar math
+    # functions (and so evaluate) raise; JSON has no way to send them either
+    if math.isnan(result):
+        return ValueError("Math domain error")
+    if math.isinf(result):
+        return OverflowError("Math range error")
+    return result
+
+
+class MicroBatcher:
+    """Gathers requests arriving within a short window into one call
+
+    process receives the list of items and returns one result per item;
+    a result that is an exception fails only its own request.
+    """
+
+    def __init__(self, process, window=BATCH_WINDOW, max_size=MAX_BATCH):
+        self.process = process
+        self.window = window
+        self.max_size = max_size
+        self._items = []
+        self._futures = []
+        self._timer = None
+
+    def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        if items:
+            asyncio.create_task(self._run(items, futures))
+
+    async def _run(self, items, futures):
+        try:
+            results = await self.process(items)
+        except Exception as e:
+            results = [e] * len(items)
+        for future, result in zip(futures, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class CalculatorServer:
+    """Long-running calculator service speaking newline-delimited JSON
+
+    Each request line is an object with an "op" of "evaluate" (with
+    "expression"), "function" ("function", "value"), "convert" ("amount",
+    "from", "to", optional "as_of") or "rates", plus an optional "id" that
+    is echoed back. Each response line holds "result" or "error", and
+    responses on a connection come back in request order, so requests can
+    be pipelined. Conversions and scientific functions are micro-batched
+    into vectorized calls against one warm rate table; expressions are
+    batched out to a process pool. A batch that runs past timeout seconds
+    fails, and its pool's workers are killed and replaced.
+    """
+
+    def __init__(self, workers=None, offline=False, rate_cache=None, timeout=EVALUATE_TIMEOUT):
+        self.workers = workers
+        self.offline = offline
+        self.rate_cache = rate_cache or RateCache()
+        self.timeout = timeout
+        self.engine = CalculatorEngine()
+        self.pool = None
+        self.convert_batcher = MicroBatcher(self._convert_batch)
+        self.function_batcher = MicroBatcher(self._function_batch)
+        self.evaluate_batcher = MicroBatcher(self._evaluate_batch)
+
+    def load_rates(self):
+        if self.offline:
+            self.engine.set_rates(dict(FALLBACK_RATES), "Built-in fallback rates (offline)")
+            return
+        entry = self.rate_cache.load()
+        if self.rate_cache.is_stale(entry):
+            entry = self.rate_cache.refresh(entry) or entry
+        self.engine.apply_rates_entry(entry)
+        self._rates_entry = entry
+
+    async def _watch_rates(self):
+        # Revalidate in the background; the engine swaps tables under its lock
+        def publish(entry):
+            self._rates_entry = entry
+            self.engine.apply_rates_entry(entry)
+
+        while True:
+            await asyncio.sleep(RATE_CHECK_INTERVAL)
+            if self.rate_cache.is_stale(self._rates_entry):
+                self.rate_cache.refresh_async(self._rates_entry, publish)
+
+    async def _convert_batch(self, items):
+        table = self.engine.rates.table
+        results = [None] * len(items)
+        positions, amounts, from_codes, to_codes = [], [], [], []
+        for position, (amount, from_curr, to_curr) in enumerate(items):
+            if from_curr in table and to_curr in table:
+                positions.append(position)
+                amounts.append(amount)
+                from_codes.append(from_curr)
+                to_codes.append(to_curr)
+            else:
+                results[position] = KeyError("Currency not found in exchange rates")
+        if positions:
+            money_table = table.money
+            try:
+                units = money.to_minor_many(amounts, from_codes)
+                converted = money.format_many(money_table.convert_many(units, from_codes, to_codes), to_codes)
+            except (ArithmeticError, ValueError):
+                # An invalid or oversized amount; convert one by one so it
+                # fails only its own request
+                converted = []
+                for row in zip(amounts, from_codes, to_codes):
+                    try:
+                        converted.append(_convert_one(money_table, *row))
+                    except ValueError as e:
+                        converted.append(e)
+            for position, value in zip(positions, converted):
+                results[position] = value
+        return results
+
+    async def _function_batch(self, items):
+        from vectorized import apply_function
+
+        groups = {}
+        for position, (func, value) in enumerate(items):
+            groups.setdefault(func, []).append((position, value))
+        results = [None] * len(items)
+        for func, members in groups.items():
+            values = apply_function(func, [value for position, value in members])
+            for (position, value), result in zip(members, values):
+                results[position] = _function_result(float(result))
+        return results
+
+    async def _evaluate_batch(self, texts):
+        try:
+            pairs = await self._run_batch(texts)
+        except BrokenProcessPool:
+            # A worker died, perhaps killed along with a batch that timed
+            # out; the pool has been replaced, so try once more there
+            try:
+                pairs = await self._run_batch(texts)
+            except BrokenProcessPool:
+                raise expression.ExpressionError("Worker process failed") from None
+        return [value if ok else expression.ExpressionError(value) for ok, value in pairs]
+
+    async def _run_batch(self, texts):
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, evaluate_batch, texts), self.timeout)
+        except asyncio.TimeoutError:
+            if pool is not None:
+                self._replace_pool(pool)
+            raise expression.ExpressionError("Evaluation timed out") from None
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise
+
+    def _start_pool(self):
+        # Spawned rather than forked, so workers started while serving do
+        # not inherit client sockets and hold connections open
+        self.pool = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return self.pool
+
+    def _replace_pool(self, pool):
+        # A running call cannot be cancelled, so the old pool's workers are
+        # killed; batches still on it fail with BrokenProcessPool and retry
+        if self.pool is pool:
+            self._start_pool()
+        _terminate_pool(pool)
+
+    def dispatch(self, request):
+        """Start handling a decoded request and return a future for its result"""
+        op = request.get('op')
+        if op == 'evaluate':
+            return self.evaluate_batcher.submit(str(_field(request, 'expression')))
+        if op == 'function':
+            func = _field(request, 'function')
+            if func not in expression.FUNCTIONS:
+                raise ValueError(f"Unknown function {func!r}")
+            return self.function_batcher.submit((func, float(_field(request, 'value'))))
+        if op == 'convert':
+            amount = _field(request, 'amount')
+            if isinstance(amount, bool) or not isinstance(amount, (int, float, str)):
+                raise ValueError("Amount must be a number")
+            # Amounts travel as decimal text so no digit is lost to binary floats
+            amount = amount if isinstance(amount, str) else repr(amount)
+            from_curr = str(_field(request, 'from')).upper()
+            to_curr = str(_field(request, 'to')).upper()
+            if request.get('as_of'):
+                # Dated conversions are a single bisect each, so they skip batching
+                table = self.engine.rate_history.money_table((from_curr, to_curr), request['as_of'])
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(_convert_one(table, amount, from_curr, to_curr))
+                return future
+            return self.convert_batcher.submit((amount, from_curr, to_curr))
+        if op == 'rates':
+            snapshot = self.engine.rates
+            future = asyncio.get_running_loop().create_future()
+            future.set_result({'version': snapshot.version, 'status': snapshot.status, 'rates': snapshot.rates})
+            return future
+        raise ValueError(f"Unknown op {op!r}")
+
+    async def handle_connection(self, reader, writer):
+        responses = asyncio.Queue(MAX_PENDING)
+        sender = asyncio.create_task(self._send(responses, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    await responses.put((None, _failed("Request line too long")))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get('id')
+                    future = self.dispatch(request)
+                except Exception as e:
+                    future = _failed(_message(e))
+                await responses.put((request_id, future))
+        except ConnectionError:
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+
+    async def _send(self, responses, writer):
+        try:
+            while True:
+                item = await responses.get()
+                if item is None:
+                    break
+                request_id, future = item
+                try:
+                    response = {'result': await future}
+                except Exception as e:
+                    response = {'error': _message(e)}
+                if request_id is not None:
+                    response['id'] = request_id
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                if responses.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None, ready=None):
+        """Serve until cancelled; ready, if given, is called with the bound address"""
+        self.load_rates()
+        if self.workers != 0:
+            # Start every worker now so the first requests do not pay for it
+            pool = self._start_pool()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(pool, evaluate_batch, [])
+                                   for _ in range(self.workers or os.cpu_count() or 1)])
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path, limit=MAX_LINE)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+            address = '%s:%d' % server.sockets[0].getsockname()[:2]
+        watcher = None if self.offline else asyncio.create_task(self._watch_rates())
+        print(f"Calculator service listening on {address}", file=sys.stderr, flush=True)
+        if ready:
+            ready(address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher:
+                watcher.cancel()
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            if unix_path:
+                try:
+                    os.unlink(unix_path)
+                except OSError:
+                    pass
+
+
+def _terminate_pool(pool):
+    # ProcessPoolExecutor has no public way to stop a running call, so its
+    # worker processes are terminated directly
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _convert_one(table, amount, from_curr, to_curr):
+    # One conversion as minor-unit text
+    try:
+        units = money.to_minor(amount, from_curr)
+    except (ArithmeticError, ValueError):
+        raise ValueError(f"Invalid amount {amount!r}") from None
+    return money.format_minor(table.convert(units, from_curr, to_curr), to_curr)
+
+
+def _field(request, name):
+    try:
+        return request[name]
+    except KeyError:
+        raise ValueError(f"Missing field {name!r}") from None
+
+
+def _failed(message):
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(ValueError(message))
+    return future
+
+
+def _message(error):
+    if isinstance(error, KeyError) and error.args:
+        # str() of a KeyError adds quotes around the message
+        return str(error.args[0])
+    return str(error) or type(error).__name__
+
+
+def run_server(address, unix_path=None, workers=None, offline=False):
+    """Run the service in the foreground until interrupted"""
+    host, _, port = (address or '127.0.0.1:8765').rpartition(':')
+    server = CalculatorServer(workers=workers, offline=offline)
+
+    async def main():
+        task = asyncio.create_task(server.serve(host or '127.0.0.1', int(port), unix_path))
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, 'SIGTERM'):
+            try:
+                loop.add_signal_handler(signal.SIGTERM, task.cancel)
+            except NotImplementedError:
+                pass
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,223 @@
+import re
+from collections import namedtuple
+from contextlib import nullcontext
+
+from bignum import format_value
+from expression import CONSTANTS, FUNCTIONS, ExpressionError, SizeBudget, compile_expression, normalize
+
+# "name = expression" or "name(param, ...) = expression"
+DEFINITION_PATTERN = re.compile(r"""
+    \s*(?P<name>[A-Za-z_]\w*)\s*
+    (?P<call>\(\s*(?P<params>[A-Za-z_]\w*(?:\s*,\s*[A-Za-z_]\w*)*)?\s*\))?
+    \s*=(?!=)(?P<body>.*)$""", re.VERBOSE | re.DOTALL)
+
+Definition = namedtuple('Definition', 'name params source compiled')
+
+
+def parse_definition(text):
+    """Split text into (name, params, body), params being None for a variable, or return None"""
+    match = DEFINITION_PATTERN.match(text)
+    if not match:
+        return None
+    params = None
+    if match.group('call'):
+        params = tuple(param.strip() for param in (match.group('params') or '').split(',') if param.strip())
+    return match.group('name'), params, match.group('body').strip()
+
+
+class UserFunction:
+    """A function defined in a sheet, bound to the values it referenced
+
+    Instances only hold the source text and plain values, so they can be
+    pickled to the evaluation worker; the body is compiled on first call.
+    It is compiled budgeted, so calls made inside a SizeBudget block, such
+    as from the live preview, are charged to it.
+    """
+
+    __slots__ = ('params', 'source', 'bound', '_compiled')
+
+    def __init__(self, params, source, bound):
+        self.params = params
+        self.source = source
+        self.bound = bound
+        self._compiled = None
+
+    def __call__(self, *args):
+        if len(args) != len(self.params):
+            raise ExpressionError(f"Expected {len(self.params)} argument(s), got {len(args)}")
+        if self._compiled is None:
+            self._compiled = compile_expression(self.source, budgeted=True)
+        env = dict(self.bound)
+        env.update(zip(self.params, args))
+        return self._compiled(env)
+
+    def __eq__(self, other):
+        return (isinstance(other, UserFunction) and self.params == other.params
+                and self.source == other.source and self.bound == other.bound)
+
+    def __reduce__(self):
+        return UserFunction, (self.params, self.source, self.bound)
+
+    def __repr__(self):
+        return f"{self.source!r} of ({', '.join(self.params)})"
+
+
+class Sheet:
+    """Named variables and functions that recompute when their inputs change
+
+    Each definition is a node in a dependency graph. Changing one
+    re-evaluates only the nodes that depend on it, in topological order,
+    and a node whose value comes out unchanged stops the change from
+    spreading further. Results are memoized in `values`, which is also the
+    variables mapping to evaluate other expressions against.
+
+    With budget, compiling a definition and evaluating each node computes
+    integer powers and products of at most that many bits, and a node over
+    it gets a ResultTooLarge error like any other.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = nullcontext() if budget is None else SizeBudget(budget)
+        self.definitions = {}
+        self.values = {}
+        self.errors = {}
+        self.dependencies = {}
+        self.dependents = {}
+        # Bumped whenever any value changes, so callers can drop stale caches
+        self.version = 0
+
+    def __contains__(self, name):
+        return name in self.definitions
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def define(self, text):
+        """Add or replace a definition from "name = ..." text and return the names recomputed"""
+        parsed = parse_definition(text)
+        if parsed is None:
+            raise ExpressionError("Expected a definition like 'rate = 1.07' or 'f(x) = x*rate'")
+        return self.set(*parsed)
+
+    def set(self, name, params, source):
+        """Add or replace a definition; params is None for a variable"""
+        if name in FUNCTIONS or name in CONSTANTS:
+            raise ExpressionError(f"{name!r} is built in and cannot be redefined")
+        if params is not None and (len(set(params)) != len(params) or name in params):
+            raise ExpressionError("Function parameters must be distinct from each other and the function")
+        source = normalize(source)
+        with self.budget:
+            compiled = compile_expression(source, budgeted=True)
+        dependencies = compiled.names - set(params or ())
+        if self._reaches(dependencies, name):
+            raise ExpressionError(f"Circular reference involving {name!r}")
+
+        self._unlink(name)
+        self.definitions[name] = Definition(name, params, source, compiled)
+        self.dependencies[name] = dependencies
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(name)
+        return self._recompute(name)
+
+    def remove(self, name):
+        """Delete a definition and return the names recomputed because of it"""
+        if name not in self.definitions:
+            raise KeyError(name)
+        self._unlink(name)
+        del self.definitions[name]
+        del self.dependencies[name]
+        self.values.pop(name, None)
+        self.errors.pop(name, None)
+        self.version += 1
+        return self._recompute(name)
+
+    def evaluate(self, text):
+        return compile_expression(text)(self.values)
+
+    def describe(self, name):
+        """One line showing a definition and its current value or error"""
+        definition = self.definitions[name]
+        if definition.params is not None:
+            return f"{name}({', '.join(definition.params)}) = {definition.source}"
+        if name in self.errors:
+            return f"{name} = {definition.source}  → {self.errors[name]}"
+        value = format_value(self.values[name])
+        if definition.compiled.names:
+            return f"{name} = {definition.source}  → {value}"
+        return f"{name} = {value}"
+
+    def _unlink(self, name):
+        for dependency in self.dependencies.get(name, ()):
+            dependents = self.dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(name)
+                if not dependents:
+                    del self.dependents[dependency]
+
+    def _reaches(self, start, target):
+        """Whether target can be reached from the names in start by following dependencies"""
+        stack = list(start)
+        seen = set()
+        while stack:
+            name = stack.pop()
+            if name == target:
+                return True
+            if name not in seen:
+                seen.add(name)
+                stack.extend(self.dependencies.get(name, ()))
+        return False
+
+    def _recompute(self, root):
+        # Collect everything downstream of root and count, for each, how many
+        # of its dependencies are also downstream
+        affected = {root}
+        stack = [root]
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    stack.append(dependent)
+        pending = {name: sum(1 for dependency in self.dependencies.get(name, ()) if dependency in affected)
+                   for name in affected}
+
+        # Kahn's algorithm over the affected nodes only; a node is evaluated
+        # again only if root or one of its dependencies actually changed
+        ready = [name for name, count in pending.items() if count == 0]
+        # A removed root has no value of its own but still changes its dependents
+        changed = set() if root in self.definitions else {root}
+        recomputed = []
+        while ready:
+            name = ready.pop()
+            if name in self.definitions and (name == root or changed & self.dependencies[name]):
+                recomputed.append(name)
+                if self._evaluate(name):
+                    changed.add(name)
+            for dependent in self.dependents.get(name, ()):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        return recomputed
+
+    def _evaluate(self, name):
+        """Evaluate one node and return whether its value or error changed"""
+        definition = self.definitions[name]
+        old = (self.values.get(name), self.errors.get(name))
+        try:
+            if definition.params is not None:
+                bound = {dependency: self.values[dependency]
+                         for dependency in self.dependencies[name] if dependency in self.values}
+                value = UserFunction(definition.params, definition.source, bound)
+            else:
+                with self.budget:
+                    value = definition.compiled(self.values)
+        except Exception as e:
+            self.values.pop(name, None)
+            self.errors[name] = str(e)
+        else:
+            self.values[name] = value
+            self.errors.pop(name, None)
+        new = (self.values.get(name), self.errors.get(name))
+        if new == old and type(new[0]) is type(old[0]):
+            return False
+        self.version += 1
+        return True
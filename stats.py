@@ -0,0 +1,356 @@
+import math
+import os
+import random
+import re
+from collections import namedtuple
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quantiles reported in every summary
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# With NumPy, files up to this size are read whole for exact quantiles
+IN_MEMORY_BYTES = 64 << 20
+
+# Items kept per sketch level; quantile ranks are off by about 1/SKETCH_SIZE
+# of the count at worst, and memory grows only with log(count)
+SKETCH_SIZE = 1024
+
+# Lines read per chunk when streaming a file
+CHUNK_LINES = 1 << 16
+
+_TEXT_SEPARATORS = re.compile(r'[\s,;]+')
+
+Summary = namedtuple('Summary', 'count sum mean variance stdev min max quantiles skipped exact')
+
+
+class RunningStats:
+    """Count, sum, mean, variance and extremes of a stream in constant memory
+
+    Welford's update keeps the mean and the sum of squared deviations, which
+    does not cancel catastrophically like the sum-of-squares formula, and
+    the sum is compensated (Neumaier). extend() summarizes a NumPy chunk in
+    one vectorized pass and merge()s it in with Chan's pairwise formula.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', '_sum', '_compensation')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sum = 0.0
+        self._compensation = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self._add_to_sum(value)
+
+    def extend(self, values):
+        if np is not None and isinstance(values, np.ndarray):
+            if len(values):
+                chunk = RunningStats()
+                chunk.count = len(values)
+                chunk.mean = float(values.mean())
+                chunk.m2 = float(np.square(values - chunk.mean).sum())
+                chunk.min = float(values.min())
+                chunk.max = float(values.max())
+                chunk._sum = float(values.sum())
+                self.merge(chunk)
+            return
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Fold another accumulator's values into this one"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add_to_sum(other._sum)
+        self._compensation += other._compensation
+
+    def _add_to_sum(self, value):
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    @property
+    def sum(self):
+        return self._sum + self._compensation
+
+    @property
+    def variance(self):
+        """Sample variance, NaN for fewer than two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """Approximate quantiles of a stream in O(k log(n/k)) memory
+
+    A compactor sketch in the style of KLL: values collect in level 0, and
+    when a level holds k items it is sorted and every other one, starting
+    at a random offset, moves up a level where each item stands for twice
+    as many values. Until the first compaction the quantiles are exact.
+    """
+
+    def __init__(self, k=SKETCH_SIZE, seed=None):
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        """Number of items retained"""
+        return sum(len(items) for items in self.levels)
+
+    @property
+    def exact(self):
+        return len(self.levels) == 1
+
+    def add(self, value):
+        level = self.levels[0]
+        level.append(value)
+        self.count += 1
+        if len(level) >= self.k:
+            self._compact(0)
+
+    def extend(self, values):
+        if np is not None and isinstance(values, np.ndarray):
+            self.count += len(values)
+            if len(values) <= self.k:
+                self._insert(0, values.tolist())
+                return
+            # Halving a sorted chunk is the same as compacting it level by
+            # level, without a Python loop over every value
+            values = np.sort(values)
+            level = 0
+            while len(values) > self.k:
+                values = values[self._random.getrandbits(1)::2]
+                level += 1
+            self._insert(level, values.tolist())
+            return
+        for value in values:
+            self.add(value)
+
+    def _insert(self, level, items):
+        while len(self.levels) <= level:
+            self.levels.append([])
+        self.levels[level].extend(items)
+        if len(self.levels[level]) >= self.k:
+            self._compact(level)
+
+    def _compact(self, level):
+        items = self.levels[level]
+        items.sort()
+        # An odd item out stays behind so weights stay exact
+        kept = [items.pop()] if len(items) % 2 else []
+        promoted = items[self._random.getrandbits(1)::2]
+        self.levels[level] = kept
+        self._insert(level + 1, promoted)
+
+    def quantiles(self, qs=QUANTILES):
+        """{q: value} for each fraction q, interpolated like NumPy while exact"""
+        if not self.count:
+            return {q: math.nan for q in qs}
+        if self.exact:
+            return exact_quantiles(sorted(self.levels[0]), qs)
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self.levels) for value in items)
+        total = sum(weight for value, weight in weighted)
+        results = {}
+        for q in qs:
+            target = q * total
+            seen = 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    break
+            results[q] = value
+        return results
+
+
+def exact_quantiles(ordered, qs=QUANTILES):
+    """Linearly interpolated quantiles of sorted values, as numpy.quantile gives"""
+    if not len(ordered):
+        return {q: math.nan for q in qs}
+    if np is not None and isinstance(ordered, np.ndarray):
+        return dict(zip(qs, np.quantile(ordered, qs).tolist()))
+    last = len(ordered) - 1
+    results = {}
+    for q in qs:
+        position = q * last
+        low = int(position)
+        high = min(low + 1, last)
+        results[q] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return results
+
+
+def parse_text(text):
+    """Numbers in pasted text separated by whitespace, commas or semicolons
+
+    Returns (values, skipped), skipping headers and other tokens that are
+    not finite numbers.
+    """
+    values = []
+    skipped = 0
+    for token in _TEXT_SEPARATORS.split(text):
+        if token:
+            try:
+                value = float(token)
+            except ValueError:
+                value = math.nan
+            if math.isfinite(value):
+                values.append(value)
+            else:
+                skipped += 1
+    return values, skipped
+
+
+def parse_lines(lines, column=0):
+    """Numbers from one column of delimited byte lines, and how many lines had none"""
+    lines = list(lines)
+    delimiter = _delimiter(lines)
+    if delimiter is False and column:
+        delimiter = None
+    try:
+        # Clean chunks convert in one pass at C speed; anything else falls
+        # back to checking line by line
+        fields = lines if delimiter is False else [line.split(delimiter)[column] for line in lines]
+        values = list(map(float, fields))
+        if math.isfinite(sum(values)):
+            return values, 0
+    except (ValueError, IndexError):
+        pass
+
+    values = []
+    skipped = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            value = float(line if delimiter is False else line.split(delimiter)[column])
+        except (ValueError, IndexError):
+            value = math.nan
+        if math.isfinite(value):
+            values.append(value)
+        else:
+            skipped += 1
+    return values, skipped
+
+
+def _delimiter(lines):
+    # Sniffed from the last line, which is past any header; None splits on
+    # runs of whitespace and False means one value per line
+    for line in reversed(lines):
+        line = line.strip()
+        if line:
+            for delimiter in (b',', b';', b'\t'):
+                if delimiter in line:
+                    return delimiter
+            return None if b' ' in line else False
+    return False
+
+
+def summarize_values(values, skipped=0):
+    """Exact summary of values already in memory"""
+    stats = RunningStats()
+    if np is not None:
+        values = np.sort(np.asarray(values, dtype=float))
+        stats.extend(values)
+    else:
+        values = sorted(values)
+        stats.extend(values)
+        stats._sum, stats._compensation = math.fsum(values), 0.0
+    return _summary(stats, exact_quantiles(values), skipped, True)
+
+
+def summarize_text(text):
+    values, skipped = parse_text(text)
+    return summarize_values(values, skipped)
+
+
+def summarize_file(path, column=0, progress=None, in_memory_bytes=IN_MEMORY_BYTES):
+    """Summarize one column of a text or CSV file of numbers
+
+    With NumPy, files up to in_memory_bytes are read whole for exact
+    results. Larger files (or any file without NumPy) are streamed once in
+    chunks through RunningStats and a QuantileSketch, so memory stays
+    bounded however big the file is. progress, if given, is called with the
+    fraction of the file read so far.
+    """
+    size = os.path.getsize(path)
+    in_memory = np is not None and size <= in_memory_bytes
+    stats = RunningStats()
+    sketch = QuantileSketch()
+    chunks = []
+    skipped = 0
+    with open(path, 'rb') as file:
+        while True:
+            lines = list(islice(file, CHUNK_LINES))
+            if not lines:
+                break
+            values, chunk_skipped = parse_lines(lines, column)
+            skipped += chunk_skipped
+            if np is not None:
+                values = np.array(values, dtype=float)
+            if in_memory:
+                chunks.append(values)
+            else:
+                stats.extend(values)
+                sketch.extend(values)
+            if progress and size:
+                progress(file.tell() / size)
+    if in_memory:
+        return summarize_values(np.concatenate(chunks) if chunks else [], skipped)
+    return _summary(stats, sketch.quantiles(), skipped, sketch.exact)
+
+
+def _summary(stats, quantiles, skipped, exact):
+    if not stats.count:
+        return Summary(0, 0.0, math.nan, math.nan, math.nan, math.nan, math.nan, quantiles, skipped, exact)
+    return Summary(stats.count, stats.sum, stats.mean, stats.variance, stats.stdev,
+                   stats.min, stats.max, quantiles, skipped, exact)
+
+
+def format_summary(summary):
+    """Lines describing a summary, for the statistics panel and the command line"""
+    lines = [
+        f"count     {summary.count}",
+        f"sum       {summary.sum:.12g}",
+        f"mean      {summary.mean:.12g}",
+        f"variance  {summary.variance:.12g}",
+        f"stdev     {summary.stdev:.12g}",
+        f"min       {summary.min:.12g}",
+        f"max       {summary.max:.12g}",
+    ]
+    marker = "" if summary.exact else "≈"
+    for q, value in summary.quantiles.items():
+        lines.append(f"{marker}p{q * 100:g}".ljust(10) + f"{value:.12g}")
+    if summary.skipped:
+        lines.append(f"skipped   {summary.skipped} non-numeric entries")
+    return lines
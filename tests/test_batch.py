@@ -0,0 +1,85 @@
+import io
+import time
+
+import pytest
+
+import batch
+import money
+from batch import process_chunk, process_line, run_batch, run_batch_file
+from currency import RateTable
+from rates import FALLBACK_RATES
+
+# Expressions, conversions in every accepted form and lines that fail
+LINES = ['1 + 2', '', '100 USD to EUR', '2.5 gbp -> jpy', '10 EUR → USD', '2**200', 'nonsense', '1/0',
+         '10 XXX to USD', '  7 * 6  ', '0.005 USD in EUR', '1e3 JPY to KRW', '-12.34 CHF to CAD', '3**5000']
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        return pytest.importorskip('numpy')
+    monkeypatch.setattr(money, 'np', None)
+    return None
+
+
+@pytest.fixture
+def table():
+    return RateTable(dict(FALLBACK_RATES))
+
+
+def test_process_line(table):
+    assert process_line('1 + 2', table) == '3'
+    assert process_line('', table) == ''
+    assert process_line('100 USD to EUR', table) == '85.00'
+    assert process_line('1000 jpy in usd', table) == '9.09'
+    assert process_line('nonsense', table) == 'Error'
+    assert process_line('10 XXX to USD', table) == 'Error'
+    assert process_line('10**5000', table) == '1' + '0' * 5000
+
+
+def test_huge_lines_hit_the_budget(table):
+    start = time.perf_counter()
+    assert process_line('*'.join(['7**370000'] * 6), table) == 'Error'
+    assert time.perf_counter() - start < 2
+    assert process_line('7**370000', table).startswith('1')
+
+
+def test_chunk_converts_currency_lines_in_one_call(table, backend, monkeypatch):
+    calls = []
+    convert_many = money.MoneyTable.convert_many
+
+    def counted(self, *args, **kwargs):
+        calls.append(args)
+        return convert_many(self, *args, **kwargs)
+
+    monkeypatch.setattr(money.MoneyTable, 'convert_many', counted)
+    assert process_chunk(LINES, table) == [process_line(line, table) for line in LINES]
+    assert len(calls) == 1
+    assert list(calls[0][1]) == ['USD', 'GBP', 'EUR', 'USD', 'JPY', 'CHF']
+
+
+def test_overflow_falls_back_to_single_conversions(table, backend):
+    lines = ['1e20 USD to JPY', '5 USD to EUR', '-9e17 EUR to KRW']
+    assert process_chunk(lines, table) == [process_line(line, table) for line in lines]
+    assert process_chunk(lines, table)[1] == '4.25'
+
+
+def test_chunk_uses_the_worker_table():
+    batch.init_worker(dict(FALLBACK_RATES))
+    assert process_chunk(['100 USD to EUR']) == ['85.00']
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_run_batch_keeps_input_order(table, workers):
+    lines = [line for _ in range(20) for line in LINES]
+    output = io.StringIO()
+    run_batch(iter(lines), output, dict(FALLBACK_RATES), workers=workers, chunk_size=9)
+    assert output.getvalue() == ''.join(process_line(line, table) + '\n' for line in lines)
+
+
+def test_run_batch_file(tmp_path, table):
+    source = tmp_path / 'input.txt'
+    source.write_text('\n'.join(LINES) + '\n', encoding='utf-8')
+    target = tmp_path / 'output.txt'
+    run_batch_file(str(source), str(target), dict(FALLBACK_RATES), workers=0, chunk_size=4)
+    assert target.read_text(encoding='utf-8').splitlines() == [process_line(line, table) for line in LINES]
@@ -0,0 +1,77 @@
+import sys
+import time
+from fractions import Fraction
+
+import pytest
+
+import bignum
+from engine import CalculatorEngine
+from expression import ResultTooLarge
+
+# Six of these multiplied together took seconds before the display budget
+SIX_FACTORS = '*'.join(['7**370000'] * 6)
+
+
+@pytest.fixture
+def long_str():
+    # str() refuses more than 4300 digits unless the limit is lifted
+    limit = getattr(sys, 'get_int_max_str_digits', lambda: None)()
+    if limit is not None:
+        sys.set_int_max_str_digits(0)
+    yield str
+    if limit is not None:
+        sys.set_int_max_str_digits(limit)
+
+
+# Integers as (base, exponent, sign), so test ids stay short
+NUMBERS = [(0, 1, 1), (7, 1, 1), (12345, 1, -1), (10, 1000, 1), (3, 20000, 1), (7, 9000, -1), (2, 70000, 1)]
+
+
+@pytest.mark.parametrize('base, exponent, sign', NUMBERS)
+def test_expand_matches_str(base, exponent, sign, long_str):
+    n = sign * base ** exponent
+    assert bignum.to_decimal_string(n) == long_str(n)
+    assert bignum.to_decimal_string(n - sign) == long_str(n - sign)
+
+
+@pytest.mark.parametrize('base, exponent, sign', NUMBERS[3:] + [(10, 1300, 1), (10, 2000, 1)])
+def test_leading_digits_and_count(base, exponent, sign, long_str):
+    for n in (sign * base ** exponent, sign * (base ** exponent - 1), sign * (base ** exponent + 1)):
+        text = long_str(abs(n))
+        assert bignum.digit_count(n) == len(text)
+        assert bignum.leading_digits(n) == text[:bignum.LEAD_DIGITS]
+        assert bignum.trailing_digits(n) == text[-bignum.TRAIL_DIGITS:]
+
+
+def test_format_value():
+    assert bignum.format_value(12) == '12'
+    assert bignum.format_value(Fraction(3, 4)) == '3/4'
+    assert bignum.format_value(Fraction(8, 1)) == '8'
+    assert bignum.format_value(2.5) == '2.5'
+    assert bignum.format_value(10 ** 2000) == '1e+2000'
+    assert bignum.format_value(-(2 ** 9000)) == '-' + bignum.scientific(2 ** 9000)
+    assert bignum.format_value(Fraction(10 ** 2000, 3)) == '≈3.33333333333e+1999'
+    assert bignum.abbreviate(3 ** 5000).endswith(f'{bignum.trailing_digits(3 ** 5000)} (2386 digits)')
+
+
+def test_expand_fractions(long_str):
+    value = Fraction(3 ** 4000, 2 ** 9001)
+    assert bignum.expand(value) == f'{long_str(3 ** 4000)}/{long_str(2 ** 9001)}'
+    assert bignum.is_big(value) and not bignum.is_big(Fraction(1, 3))
+
+
+def test_exact_scientific_function_keeps_values_exact():
+    engine = CalculatorEngine()
+    assert engine.scientific_function('square', '1/3', exact=True) == Fraction(1, 9)
+    assert engine.scientific_function('cube', '2**100', exact=True) == 2 ** 300
+    assert engine.scientific_function('sqrt', '16', exact=True) == 4.0
+    assert engine.scientific_function('square', 'x', exact=True, value=10 ** 5000) == 10 ** 10000
+
+
+@pytest.mark.parametrize('text', [SIX_FACTORS, '*'.join(['(7**370000/3)'] * 6), '(2/3)**300000*(2/3)**300000'])
+def test_exact_display_has_a_size_budget(text):
+    engine = CalculatorEngine()
+    start = time.perf_counter()
+    with pytest.raises(ResultTooLarge):
+        engine.scientific_function('sqrt', text, exact=True)
+    assert time.perf_counter() - start < 2
@@ -0,0 +1,89 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import currency
+from currency import RateTable
+from rates import FALLBACK_RATES
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        return pytest.importorskip('numpy')
+    monkeypatch.setattr(currency, 'np', None)
+    return None
+
+
+@pytest.fixture
+def table(backend):
+    return RateTable(dict(FALLBACK_RATES))
+
+
+def test_rates_and_cross_rates(table):
+    assert len(table) == len(FALLBACK_RATES)
+    assert 'EUR' in table and 'XXX' not in table
+    assert table.rate('USD', 'JPY') == FALLBACK_RATES['JPY']
+    assert table.rate('EUR', 'EUR') == 1.0
+    assert table.rate('EUR', 'GBP') == pytest.approx(FALLBACK_RATES['GBP'] / FALLBACK_RATES['EUR'], rel=1e-15)
+    assert table.rate('GBP', 'EUR') * table.rate('EUR', 'GBP') == pytest.approx(1.0, rel=1e-15)
+    assert table.convert_one(10, 'USD', 'EUR') == pytest.approx(10 * FALLBACK_RATES['EUR'])
+    with pytest.raises(KeyError, match='not found'):
+        table.rate('USD', 'XXX')
+
+
+def test_bulk_conversion_matches_one_by_one(table, backend):
+    generator = random.Random(8)
+    codes = table.codes
+    amounts = [generator.uniform(-1000, 1000) for _ in range(2000)]
+    from_codes = [generator.choice(codes) for _ in amounts]
+    to_codes = [generator.choice(codes) for _ in amounts]
+    expected = [table.convert_one(amount, f, t) for amount, f, t in zip(amounts, from_codes, to_codes)]
+    results = table.convert(amounts, from_codes, to_codes)
+    assert isinstance(results, list) == (backend is None)
+    assert [float(result) for result in results] == expected
+    if backend is not None:
+        arrays = table.convert(backend.array(amounts), backend.array(from_codes), backend.array(to_codes))
+        assert arrays.tolist() == expected
+
+
+def test_single_codes_broadcast(table):
+    amounts = [1.0, 2.5, 100.0]
+    assert [float(value) for value in table.convert(amounts, 'USD', 'JPY')] == [
+        amount * FALLBACK_RATES['JPY'] for amount in amounts]
+    assert [float(value) for value in table.convert(amounts, ['EUR', 'GBP', 'USD'], 'USD')] == [
+        table.convert_one(amount, code, 'USD') for amount, code in zip(amounts, ['EUR', 'GBP', 'USD'])]
+    assert len(table.convert([], [], [])) == 0
+
+
+def test_unknown_codes_name_the_code(table, backend):
+    with pytest.raises(KeyError, match="'XXX'"):
+        table.convert([1.0, 2.0], ['USD', 'XXX'], 'EUR')
+    with pytest.raises(KeyError, match="'QQQ'"):
+        table.convert([1.0], 'QQQ', 'EUR')
+    if backend is not None:
+        with pytest.raises(KeyError, match="'XXX'"):
+            table.convert(backend.array([1.0, 2.0]), backend.array(['USD', 'XXX']), 'EUR')
+
+
+def test_indices(table):
+    assert table.indices('USD') == table.codes.index('USD')
+    assert [int(index) for index in table.indices(['USD', 'EUR', 'USD'])] == [
+        table.codes.index('USD'), table.codes.index('EUR'), table.codes.index('USD')]
+
+
+def test_money_table_is_built_once(table):
+    money = table.money
+    assert table.money is money
+    assert money.convert(100, 'USD', 'EUR') == 85
+
+
+def test_setting_rates_does_not_import_numpy():
+    script = ('import sys; from engine import CalculatorEngine; from rates import FALLBACK_RATES; '
+              'CalculatorEngine(dict(FALLBACK_RATES)); print("numpy" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
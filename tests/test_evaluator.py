@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+import expression
+from evaluator import BackgroundEvaluator
+from expression import ResultTooLarge, check_power, compile_expression, evaluate
+
+# Sixteen of these take the better part of a minute to multiply
+SLOW = '*'.join(['7**370000'] * 16)
+
+
+@pytest.mark.parametrize('text', ['9**9**9', '2**2**2**2**2**2', '10**10**10', '(9**9)**(9**9)', 'x**9**9'])
+def test_power_towers_fail_fast(text):
+    start = time.perf_counter()
+    with pytest.raises(ResultTooLarge):
+        evaluate(text, {'x': 7})
+    assert time.perf_counter() - start < 0.1
+
+
+def test_check_power_limits():
+    limit = expression.MAX_POWER_BITS
+    check_power(2, limit)
+    with pytest.raises(ResultTooLarge):
+        check_power(2, limit + 1)
+    with pytest.raises(ResultTooLarge):
+        check_power(-3, limit)
+    # Bases 0, 1 and -1, floats and non-positive exponents never grow
+    for base, exponent in [(1, 10 ** 12), (-1, 10 ** 12), (0, 10 ** 12), (2.0, 10 ** 6), (2, -10 ** 9)]:
+        check_power(base, exponent)
+    check_power(2, limit * 4, limit * 4)
+
+
+def test_exact_mode_has_its_own_limit():
+    bits = expression.MAX_POWER_BITS * 2
+    assert evaluate(f'2**{bits}', exact=True) == 2 ** bits
+    with pytest.raises(ResultTooLarge):
+        evaluate(f'2**{bits}')
+    with pytest.raises(ResultTooLarge):
+        evaluate(f'(1/3)**{expression.EXACT_MAX_POWER_BITS}', exact=True)
+
+
+def test_folded_tower_fails_at_compile_time():
+    with pytest.raises(ResultTooLarge):
+        compile_expression('1 + 9**9**9')
+
+
+@pytest.fixture
+def evaluator():
+    background = BackgroundEvaluator(timeout=2.0)
+    background.start()
+    yield background
+    background.close()
+
+
+def result(evaluator, timeout=30):
+    return evaluator.results.get(timeout=timeout)
+
+
+def test_results_and_errors(evaluator):
+    job = evaluator.submit('6 × 7')
+    assert result(evaluator) == (job, 'ok', '6*7', '42', None)
+    job = evaluator.submit('1/0')
+    assert result(evaluator)[:2] == (job, 'error')
+    job = evaluator.submit('9**9**9')
+    assert result(evaluator)[:2] == (job, 'too_large')
+    job = evaluator.submit('x + 1', {'x': 2})
+    assert result(evaluator)[:4] == (job, 'ok', 'x+1', '3')
+    assert not evaluator.busy
+
+
+def test_timeout_kills_the_worker_and_the_next_job_runs(evaluator):
+    start = time.monotonic()
+    job = evaluator.submit(SLOW)
+    assert evaluator.busy
+    with pytest.raises(RuntimeError):
+        evaluator.submit('1')
+    assert result(evaluator)[:2] == (job, 'timeout')
+    assert time.monotonic() - start < 10
+    job = evaluator.submit('2+2')
+    assert result(evaluator)[:4] == (job, 'ok', '2+2', '4')
+
+
+def test_cancel(evaluator):
+    job = evaluator.submit(SLOW)
+    time.sleep(0.2)
+    evaluator.cancel()
+    assert result(evaluator, timeout=5)[:2] == (job, 'cancelled')
+    job = evaluator.submit('3*3')
+    assert result(evaluator)[:4] == (job, 'ok', '3*3', '9')
@@ -0,0 +1,129 @@
+import math
+import random
+
+import pytest
+
+import expression
+from expression import ExpressionError, compile_expression, evaluate, normalize
+
+OPERATORS = ['+', '-', '*', '/', '//', '%', '**']
+
+
+def random_expression(generator, depth=3):
+    if depth == 0 or generator.random() < 0.3:
+        number = generator.choice([str(generator.randint(0, 20)), f'{generator.uniform(0, 10):.3f}'])
+        return ('-' + number) if generator.random() < 0.15 else number
+    op = generator.choice(OPERATORS)
+    left = random_expression(generator, depth - 1)
+    right = str(generator.randint(0, 3)) if op == '**' else random_expression(generator, depth - 1)
+    text = f'{left}{op}{right}'
+    return f'({text})' if generator.random() < 0.5 else text
+
+
+def python_value(text):
+    try:
+        return eval(text, {'__builtins__': {}})
+    except ZeroDivisionError:
+        return ZeroDivisionError
+    except (OverflowError, ValueError, TypeError):
+        return None
+
+
+def test_matches_python_semantics():
+    generator = random.Random(11)
+    checked = 0
+    while checked < 2000:
+        text = random_expression(generator)
+        expected = python_value(text)
+        if expected is None or isinstance(expected, complex):
+            continue
+        if expected is ZeroDivisionError:
+            with pytest.raises(ZeroDivisionError):
+                evaluate(text)
+        else:
+            result = evaluate(text)
+            assert type(result) is type(expected), text
+            assert result == expected or (math.isnan(result) and math.isnan(expected)), text
+        checked += 1
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('-2**2', -4),
+    ('2**-1', 0.5),
+    ('2**3**2', 512),
+    ('(-2)**2', 4),
+    ('7//2*2', 6),
+    ('-7//2', -4),
+    ('-7%3', 2),
+    ('1e3+.5', 1000.5),
+    ('--3', 3),
+    ('+3-+2', 1),
+    ('2*(3+4)*5', 70),
+    ('10-4-3', 3),
+    ('2**2**-1', 2 ** 2 ** -1),
+])
+def test_precedence_and_associativity(text, expected):
+    assert evaluate(text) == expected
+
+
+def test_display_symbols_and_whitespace():
+    assert normalize(' 6 × 7 ÷ 2 − 1 ') == '6*7/2-1'
+    assert evaluate('6 × 7 ÷ 2 − 1') == 20.0
+    assert evaluate('2×π') == 2 * math.pi
+
+
+def test_functions_constants_and_variables():
+    assert evaluate('sqrt(16)+cbrt(27)') == pytest.approx(7.0)
+    assert evaluate('sin(30)') == pytest.approx(0.5)
+    assert evaluate('log(1000)+ln(e)') == pytest.approx(4.0)
+    assert evaluate('square(3)+cube(2)') == 17
+    assert evaluate('x*y+1', {'x': 3, 'y': 4}) == 13
+    assert evaluate('f(2, 3)', {'f': lambda a, b: a * 10 + b}) == 23
+
+
+@pytest.mark.parametrize('text, message', [
+    ('1+', None),
+    ('(1+2', None),
+    ('1+2)', None),
+    ('2 $ 3', 'Unexpected character'),
+    ('y+1', "Unknown name 'y'"),
+    ('g(1)', "Unknown function 'g'"),
+    ('sqrt(1, 2)', 'takes exactly one argument'),
+    ('', None),
+])
+def test_errors(text, message):
+    with pytest.raises(ExpressionError) as error:
+        evaluate(text)
+    if message:
+        assert message in str(error.value)
+
+
+def test_not_a_function():
+    with pytest.raises(ExpressionError, match="'x' is not a function"):
+        evaluate('x(1)', {'x': 2})
+
+
+def test_compiled_expressions_are_cached_and_rebindable():
+    expression.clear_cache()
+    first = compile_expression('a * 2 + b')
+    assert compile_expression(' a*2+b ') is first
+    assert first.names == {'a', 'b'}
+    assert first({'a': 1, 'b': 1}) == 3
+    assert first({'a': 5, 'b': 0}) == 10
+    assert expression.cache_info().hits == 1
+
+
+def test_constant_prefix_is_folded_but_errors_wait_for_evaluation():
+    compiled = compile_expression('1/0 + x')
+    with pytest.raises(ZeroDivisionError):
+        compiled({'x': 1})
+
+
+def test_exact_mode():
+    from fractions import Fraction
+    assert evaluate('1/3 + 1/6', exact=True) == Fraction(1, 2)
+    assert evaluate('0.1 + 0.2', exact=True) == Fraction(3, 10)
+    assert evaluate('4/2', exact=True) == 2 and type(evaluate('4/2', exact=True)) is int
+    assert evaluate('2**-2', exact=True) == Fraction(1, 4)
+    with pytest.raises(ZeroDivisionError):
+        evaluate('0**-1', exact=True)
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from history import _OFFSET, HistoryEntry, HistoryLog
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'data' / 'history.log')
+
+
+def fill(path, count):
+    log = HistoryLog(path)
+    for i in range(count):
+        log.append(f'{i}+1', str(i + 1), timestamp=1000.0 + i)
+    log.close()
+
+
+def expected(start, stop):
+    return [HistoryEntry(f'{i}+1', str(i + 1), 1000.0 + i) for i in range(start, stop)]
+
+
+def test_entries_persist_across_reopen(path):
+    fill(path, 5)
+    log = HistoryLog(path)
+    assert len(log) == 5
+    assert log.recent(3) == expected(2, 5)
+    assert log.recent(50) == expected(0, 5)
+    assert log.recent(0) == []
+    log.close()
+
+
+def test_torn_tail_is_dropped_and_appends_continue(path):
+    fill(path, 4)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as file:
+        file.write('9*9\t8'.encode('utf-8'))
+    log = HistoryLog(path)
+    assert len(log) == 4
+    assert os.path.getsize(path) == size
+    assert log.recent(10) == expected(0, 4)
+    log.append('2*3', '6', timestamp=2000.0)
+    log.close()
+    log = HistoryLog(path)
+    assert log.recent(2) == expected(3, 4) + [HistoryEntry('2*3', '6', 2000.0)]
+    log.close()
+
+
+def test_crash_before_the_index_write_is_reindexed(path):
+    fill(path, 6)
+    index_path = path + '.idx'
+    with open(index_path, 'r+b') as index:
+        index.truncate(4 * _OFFSET.size)
+    log = HistoryLog(path)
+    assert len(log) == 6
+    assert log.recent(6) == expected(0, 6)
+    log.close()
+    assert os.path.getsize(index_path) == 6 * _OFFSET.size
+
+
+def test_partial_index_record_is_repaired(path):
+    fill(path, 3)
+    with open(path + '.idx', 'ab') as index:
+        index.write(b'\x01\x02\x03')
+    log = HistoryLog(path)
+    assert len(log) == 3
+    assert log.recent(3) == expected(0, 3)
+    log.close()
+
+
+def test_torn_line_that_was_already_indexed_is_dropped(path):
+    fill(path, 5)
+    with open(path, 'rb') as file:
+        lines = file.readlines()
+    with open(path, 'wb') as file:
+        file.writelines(lines[:2])
+        file.write(lines[2][:4])
+    log = HistoryLog(path)
+    assert len(log) == 2
+    assert log.recent(5) == expected(0, 2)
+    assert os.path.getsize(path) == len(lines[0]) + len(lines[1])
+    log.append('7', '7', timestamp=3000.0)
+    assert log.recent(1) == [HistoryEntry('7', '7', 3000.0)]
+    log.close()
+
+
+def test_empty_index_is_rebuilt_from_the_log(path):
+    fill(path, 3)
+    os.remove(path + '.idx')
+    log = HistoryLog(path)
+    assert log.recent(3) == expected(0, 3)
+    log.close()
+
+
+def test_fields_are_cleaned(path):
+    log = HistoryLog(path)
+    entry = log.append('1\t+\n2', 'three\r', timestamp=5.0)
+    assert entry == HistoryEntry('1 + 2', 'three ', 5.0)
+    assert log.recent(1) == [entry]
+    log.close()
+
+
+def test_search(path):
+    log = HistoryLog(path)
+    for expression, text in [('sqrt(16)', '4'), ('2+2', '4'), ('π×2', '6.28'), ('sqrt(9)', '3'), ('12*2', '24')]:
+        log.append(expression, text, timestamp=1.0)
+    assert [entry.expression for entry in log.search('sqrt')] == ['sqrt(9)', 'sqrt(16)']
+    assert [entry.expression for entry in log.search('4')] == ['12*2', '2+2', 'sqrt(16)']
+    assert [entry.expression for entry in log.search('2', prefix=True)] == ['2+2']
+    assert [entry.expression for entry in log.search('sqrt', prefix=True, limit=1)] == ['sqrt(9)']
+    assert [entry.expression for entry in log.search('π')] == ['π×2']
+    # The timestamp column never matches
+    assert log.search('1.000') == []
+    assert [entry.expression for entry in log.search('', limit=2)] == ['12*2', 'sqrt(9)']
+    log.close()
+
+
+def test_search_empty_log(path):
+    log = HistoryLog(path)
+    assert log.search('x') == []
+    assert log.search('x', prefix=True) == []
+    log.close()
@@ -0,0 +1,114 @@
+import random
+import time
+
+import pytest
+
+from expression import ResultTooLarge, SizeBudget, evaluate
+from incremental import IncrementalEvaluator
+from sheet import Sheet
+
+TERMS = ['12', '3.5', '2**10', '7*8', '(1+2)*3', '10/4', '2**-1', '1e-5', 'x', 'sqrt(16)', '-(4-9)',
+         '17//5', '17%5', 'x*x', 'square(3)']
+
+
+def random_text(generator, count):
+    parts = [generator.choice(TERMS)]
+    for _ in range(count - 1):
+        parts.append(generator.choice('+-*'))
+        parts.append(generator.choice(TERMS))
+    return ''.join(parts)
+
+
+def test_typing_matches_full_evaluation():
+    generator = random.Random(3)
+    variables = {'x': 6}
+    for _ in range(20):
+        text = random_text(generator, 12)
+        evaluator = IncrementalEvaluator()
+        for end in range(1, len(text) + 1):
+            try:
+                expected = evaluate(text[:end], variables)
+            except Exception:
+                continue
+            assert evaluator.update(text[:end], variables) == pytest.approx(expected, rel=1e-12)
+
+
+def test_edits_in_the_middle_match_full_evaluation():
+    generator = random.Random(5)
+    variables = {'x': 2}
+    evaluator = IncrementalEvaluator()
+    text = random_text(generator, 30)
+    for _ in range(200):
+        position = generator.randrange(len(text) + 1)
+        edited = text[:position] + generator.choice(['+1', '*2', '-x', '']) + text[position + 2:]
+        try:
+            expected = evaluate(edited, variables)
+        except Exception:
+            evaluator.reset()
+            continue
+        text = edited
+        assert evaluator.update(text, variables) == pytest.approx(expected, rel=1e-12)
+
+
+def test_reused_prefix_with_exponent_lookahead():
+    evaluator = IncrementalEvaluator()
+    assert evaluator.update('1+2') == 3
+    assert evaluator.update('1+2e-5') == evaluate('1+2e-5')
+    assert evaluator.update('1+2e-5+3') == evaluate('1+2e-5+3')
+
+
+def test_minus_after_kept_parenthesis_is_binary():
+    evaluator = IncrementalEvaluator()
+    evaluator.update('8--(4-9)-17')
+    assert evaluator.update('8--(4-9)-17%5') == evaluate('8--(4-9)-17%5')
+
+
+def test_is_literal():
+    evaluator = IncrementalEvaluator()
+    evaluator.update('-42')
+    assert evaluator.is_literal
+    evaluator.update('-42+1')
+    assert not evaluator.is_literal
+
+
+@pytest.mark.parametrize('count', [4, 8, 16])
+def test_budget_stops_huge_products_quickly(count):
+    evaluator = IncrementalEvaluator(1 << 16)
+    start = time.perf_counter()
+    with pytest.raises(ResultTooLarge):
+        evaluator.update('*'.join(['7**370000'] * count))
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize('text', ['cube(cube(cube(cube(cube(9**99)))))', 'x*x*x*x', '2**40000*2**40000'])
+def test_budget_covers_functions_variables_and_folding(text):
+    evaluator = IncrementalEvaluator(1 << 16)
+    with pytest.raises(ResultTooLarge):
+        evaluator.update(text, {'x': 3 ** 20000})
+
+
+@pytest.mark.parametrize('depth', [8, 10])
+def test_budget_covers_user_functions(depth):
+    sheet = Sheet()
+    sheet.define('g(x) = x*x')
+    evaluator = IncrementalEvaluator(1 << 16)
+    start = time.perf_counter()
+    with pytest.raises(ResultTooLarge):
+        evaluator.update('g(' * depth + '3**40000' + ')' * depth, sheet.values)
+    assert time.perf_counter() - start < 0.5
+    # Outside a budget the same function runs unlimited
+    assert sheet.values['g'](3 ** 40000) == 3 ** 80000
+
+
+def test_budget_is_per_update():
+    evaluator = IncrementalEvaluator(1 << 16)
+    for end in range(1, 6):
+        text = '+'.join(['x*x'] * end)
+        assert evaluator.update(text, {'x': 3 ** 5000}) == end * 3 ** 10000
+    assert evaluator.update('2**1000*3') == evaluate('2**1000*3')
+
+
+def test_budget_only_applies_inside_block():
+    assert evaluate('2**40000*2**40000') == 2 ** 80000
+    with SizeBudget(100):
+        assert evaluate('2**40000*2**40000') == 2 ** 80000
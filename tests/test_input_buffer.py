@@ -0,0 +1,92 @@
+import pytest
+
+from input_buffer import InputBuffer
+
+
+def test_starts_at_zero_and_replaces_it():
+    buffer = InputBuffer()
+    assert buffer.text() == '0' and buffer.is_zero() and len(buffer) == 1
+    buffer.append_number('7')
+    assert buffer.text() == '7'
+    buffer.set('0')
+    buffer.append_number('.')
+    buffer.append_number('5')
+    assert buffer.text() == '0.5' and not buffer.is_zero()
+
+
+def test_operators_are_not_doubled():
+    buffer = InputBuffer('12')
+    buffer.append_operator('+')
+    buffer.append_operator('*')
+    assert buffer.text() == '12+'
+    buffer.append_number('3')
+    buffer.append_operator('/')
+    assert buffer.text() == '12+3/'
+    empty = InputBuffer('')
+    empty.append_operator('+')
+    assert empty.text() == '' and empty.last() == ''
+
+
+def test_backspace():
+    buffer = InputBuffer('123')
+    buffer.backspace()
+    assert buffer.text() == '12'
+    buffer.backspace()
+    buffer.backspace()
+    assert buffer.text() == '0'
+    buffer.backspace()
+    assert buffer.text() == '0'
+    InputBuffer('').backspace()
+
+
+def test_backspace_keeps_the_sign_until_it_is_alone():
+    buffer = InputBuffer('-45')
+    buffer.backspace()
+    assert buffer.text() == '-4'
+    buffer.backspace()
+    assert buffer.text() == '-' and len(buffer) == 1 and buffer.last() == '-'
+    buffer.backspace()
+    assert buffer.text() == '0' and buffer.is_zero()
+
+
+def test_minus_alone():
+    buffer = InputBuffer('-')
+    assert buffer.text() == '-' and len(buffer) == 1 and not buffer.is_zero()
+    buffer.append_operator('+')
+    assert buffer.text() == '-'
+    buffer.append_number('0')
+    assert buffer.text() == '-0' and not buffer.is_zero()
+    buffer.toggle_sign()
+    assert buffer.text() == '0' and buffer.is_zero()
+
+
+def test_toggle_sign_round_trips():
+    buffer = InputBuffer('3.5*2')
+    buffer.toggle_sign()
+    assert buffer.text() == '-3.5*2' and len(buffer) == 6 and buffer.last() == '2'
+    buffer.toggle_sign()
+    assert buffer.text() == '3.5*2'
+    buffer.set('-8')
+    buffer.toggle_sign()
+    assert buffer.text() == '8'
+
+
+@pytest.mark.parametrize('text, width, expected', [
+    ('12345', 5, '12345'),
+    ('12345', 9, '12345'),
+    ('123456', 5, '…3456'),
+    ('-1234', 5, '-1234'),
+    ('-12345', 5, '…2345'),
+    ('123', 2, '…3'),
+    ('123', 1, '…'),
+])
+def test_tail(text, width, expected):
+    assert InputBuffer(text).tail(width) == expected
+
+
+def test_tail_of_long_input():
+    buffer = InputBuffer('0')
+    for _ in range(10000):
+        buffer.append('9+')
+    tail = buffer.tail(20)
+    assert len(tail) == 20 and tail == '…' + buffer.text()[-19:]
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import instrumentation
+from instrumentation import BUCKETS, EventLoopMonitor, Histogram, Metrics, timed
+
+
+class FakeRoot:
+    """Stands in for a Tk root: after() callbacks are kept, not scheduled"""
+
+    def __init__(self):
+        self.scheduled = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.scheduled[self.next_id] = (ms, callback)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        del self.scheduled[after_id]
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    registry = Metrics()
+    monkeypatch.setattr(instrumentation, 'metrics', registry)
+    return registry
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'ENABLED', True)
+
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    # A value on a bound falls in that bucket, as Prometheus' "le" means
+    for seconds in (0.000001, BUCKETS[0], 0.00002, 0.0007, BUCKETS[-1], 10.0):
+        histogram.observe(seconds)
+    assert histogram.counts == [2, 1, 0, 0, 1, 0, 0, 0, 0, 0, 0, 1, 1]
+    assert histogram.count == 6 and histogram.max == 10.0
+    assert histogram.total == pytest.approx(15.000728)
+    buckets = histogram.to_dict()['buckets']
+    assert list(buckets) == [str(bound) for bound in BUCKETS] + ['+Inf']
+    assert buckets['1e-05'] == 2 and buckets['+Inf'] == 1
+
+
+def test_prometheus_buckets_are_cumulative():
+    registry = Metrics()
+    for seconds in (0.00002, 0.003, 0.003, 0.2, 7.0):
+        registry.observe('engine.calculate', seconds)
+    registry.increment('gui.redraws', 3)
+    registry.increment('gui.redraws')
+    lines = registry.to_prometheus().splitlines()
+    assert lines[0] == '# TYPE calculator_engine_calculate_seconds histogram'
+    counts = [int(line.rsplit(' ', 1)[1]) for line in lines if '_bucket{' in line]
+    assert counts == [0, 1, 1, 1, 1, 3, 3, 3, 3, 4, 4, 4, 5]
+    assert lines[len(BUCKETS)] == 'calculator_engine_calculate_seconds_bucket{le="5.0"} 4'
+    assert 'calculator_engine_calculate_seconds_bucket{le="+Inf"} 5' in lines
+    assert 'calculator_engine_calculate_seconds_count 5' in lines
+    assert lines[-2:] == ['# TYPE calculator_gui_redraws_total counter', 'calculator_gui_redraws_total 4']
+
+
+def test_dump_follows_the_extension(tmp_path):
+    registry = Metrics()
+    registry.observe('batch.chunk', 0.5)
+    assert registry.dump(str(tmp_path / 'metrics.json')) == str(tmp_path / 'metrics.json')
+    data = json.loads((tmp_path / 'metrics.json').read_text())
+    assert data['histograms']['batch.chunk']['count'] == 1
+    prometheus = tmp_path / 'metrics.prom'
+    registry.dump(str(prometheus))
+    assert prometheus.read_text() == registry.to_prometheus()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['metrics.json', 'metrics.prom']
+
+
+def test_timed_is_a_no_op_when_disabled(monkeypatch, metrics):
+    monkeypatch.setattr(instrumentation, 'ENABLED', False)
+
+    def add(a, b):
+        return a + b
+
+    assert timed('add')(add) is add
+    instrumentation.observe('add', 1.0)
+    assert metrics.histograms == {}
+
+
+def test_timed_records_calls_and_failures(enabled, metrics):
+    @timed('engine.divide')
+    def divide(a, b):
+        return a / b
+
+    assert divide(6, 3) == 2 and divide.__name__ == 'divide'
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+    assert metrics.histograms['engine.divide'].count == 2
+
+
+def test_enable(monkeypatch):
+    registered = []
+    monkeypatch.setattr(instrumentation, 'ENABLED', False)
+    monkeypatch.setattr(instrumentation, 'METRICS_PATH', None)
+    monkeypatch.setattr(instrumentation.atexit, 'register', registered.append)
+    instrumentation.enable('metrics.prom')
+    instrumentation.enable('other.json')
+    assert instrumentation.ENABLED and instrumentation.METRICS_PATH == 'other.json'
+    assert registered == [instrumentation._dump_at_exit]
+
+
+def test_event_loop_monitor(metrics, monkeypatch):
+    root = FakeRoot()
+    clock = [100.0]
+    monkeypatch.setattr(instrumentation.time, 'perf_counter', lambda: clock[0])
+    monitor = EventLoopMonitor(root, interval_ms=50)
+    monitor.start()
+    (after_id, (ms, beat)), = root.scheduled.items()
+    assert ms == 50
+    # On time, a little late, then a stall
+    for delay in (0.05, 0.06, 0.3):
+        clock[0] += delay
+        root.scheduled.clear()
+        beat()
+        (after_id, (ms, beat)), = root.scheduled.items()
+    histogram = metrics.histograms['tk.event_loop_lag']
+    assert histogram.count == 3
+    assert histogram.max == pytest.approx(0.25)
+    assert histogram.total == pytest.approx(0.26)
+    assert metrics.counters == {'tk.stalls': 1}
+    monitor.stop()
+    assert root.scheduled == {}
+    monitor.stop()
@@ -0,0 +1,141 @@
+import decimal
+import random
+from decimal import Decimal
+
+import pytest
+
+import money
+from engine import CalculatorEngine
+from rates import FALLBACK_RATES
+
+MODES = [decimal.ROUND_HALF_EVEN, decimal.ROUND_HALF_UP, decimal.ROUND_HALF_DOWN, decimal.ROUND_UP,
+         decimal.ROUND_DOWN, decimal.ROUND_FLOOR, decimal.ROUND_CEILING]
+
+# Enough digits that the reference division never rounds across a tie
+REFERENCE = decimal.Context(prec=100)
+
+
+def reference(units, from_curr, to_curr, rounding, rates=FALLBACK_RATES):
+    # The conversion done in Decimal from the rates' decimal text
+    amount = Decimal(units).scaleb(-money.minor_units(from_curr))
+    value = REFERENCE.divide(REFERENCE.multiply(amount, Decimal(repr(float(rates[to_curr])))),
+                             Decimal(repr(float(rates[from_curr]))))
+    return int(value.scaleb(money.minor_units(to_curr)).to_integral_value(rounding=rounding))
+
+
+def random_rows(count, codes, seed=1, sizes=(2, 4, 7, 12)):
+    generator = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        digits = generator.choice(sizes)
+        rows.append((generator.randrange(-10 ** digits, 10 ** digits),
+                     generator.choice(codes), generator.choice(codes)))
+    return rows
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def batch_backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(money, 'np', None)
+    return request.param
+
+
+@pytest.mark.parametrize('rounding', MODES)
+def test_convert_matches_decimal(rounding):
+    table = money.MoneyTable(FALLBACK_RATES)
+    for units, from_curr, to_curr in random_rows(3000, sorted(FALLBACK_RATES)):
+        assert table.convert(units, from_curr, to_curr, rounding) == reference(units, from_curr, to_curr, rounding)
+
+
+@pytest.mark.parametrize('rounding', MODES)
+def test_convert_many_matches_decimal(rounding, batch_backend):
+    table = money.MoneyTable(FALLBACK_RATES)
+    units, from_codes, to_codes = map(list, zip(*random_rows(3000, sorted(FALLBACK_RATES), seed=2)))
+    expected = [reference(*row, rounding) for row in zip(units, from_codes, to_codes)]
+    assert list(table.convert_many(units, from_codes, to_codes, rounding)) == expected
+    assert list(table.convert_many(units, 'JPY', 'USD', rounding)) == [
+        reference(amount, 'JPY', 'USD', rounding) for amount in units]
+    assert list(table.convert_many(units, from_codes, 'EUR', rounding)) == [
+        reference(amount, code, 'EUR', rounding) for amount, code in zip(units, from_codes)]
+    assert list(table.convert_many(units, 'KRW', to_codes, rounding)) == [
+        reference(amount, 'KRW', code, rounding) for amount, code in zip(units, to_codes)]
+
+
+@pytest.mark.parametrize('amount, from_curr, to_curr, rounding, expected', [
+    ('110', 'JPY', 'USD', decimal.ROUND_DOWN, '1.00'),
+    ('11000', 'JPY', 'EUR', decimal.ROUND_UP, '85.00'),
+    ('7.45', 'INR', 'USD', decimal.ROUND_DOWN, '0.10'),
+    ('4392135', 'JPY', 'CAD', decimal.ROUND_HALF_EVEN, '49910.62'),
+])
+def test_exact_results(amount, from_curr, to_curr, rounding, expected, batch_backend):
+    table = money.MoneyTable(FALLBACK_RATES)
+    units = money.to_minor(amount, from_curr)
+    assert money.format_minor(table.convert(units, from_curr, to_curr, rounding), to_curr) == expected
+    converted = table.convert_many([units], [from_curr], [to_curr], rounding)
+    assert money.format_many(converted, to_curr) == [expected]
+
+
+@pytest.mark.parametrize('rounding', MODES)
+def test_ties(rounding, batch_backend):
+    # One cent is exactly half a cent of TIE, so odd amounts fall on ties
+    rates = {'USD': 1.0, 'TIE': 0.5}
+    table = money.MoneyTable(rates)
+    units = list(range(-7, 8))
+    expected = [reference(amount, 'USD', 'TIE', rounding, rates) for amount in units]
+    assert [table.convert(amount, 'USD', 'TIE', rounding) for amount in units] == expected
+    assert list(table.convert_many(units, 'USD', 'TIE', rounding)) == expected
+
+
+def test_oversized_pairs_fall_back_to_python_ints(batch_backend):
+    rates = {'USD': 1.0, 'AAA': 0.12345678901234567, 'BBB': 9876.5432109876543}
+    table = money.MoneyTable(rates)
+    rows = random_rows(500, sorted(rates), seed=3, sizes=(2, 4, 7))
+    units, from_codes, to_codes = map(list, zip(*rows))
+    expected = [reference(*row, money.DEFAULT_ROUNDING, rates) for row in rows]
+    assert list(table.convert_many(units, from_codes, to_codes)) == expected
+
+
+def test_unsupported_rounding(batch_backend):
+    table = money.MoneyTable(FALLBACK_RATES)
+    with pytest.raises(ValueError):
+        table.convert(101, 'USD', 'EUR', decimal.ROUND_05UP)
+    with pytest.raises(ValueError):
+        table.convert_many([101], ['USD'], 'EUR', decimal.ROUND_05UP)
+
+
+def test_unknown_codes_in_batches(batch_backend):
+    table = money.MoneyTable(FALLBACK_RATES)
+    with pytest.raises(KeyError, match="'XXX'"):
+        table.convert_many([1, 2], ['USD', 'XXX'], 'EUR')
+    with pytest.raises(KeyError, match="'QQQ'"):
+        table.convert_many([1, 2], 'USD', ['EUR', 'QQQ'])
+
+
+@pytest.mark.parametrize('rounding', MODES)
+def test_to_minor_matches_decimal(rounding, batch_backend):
+    texts = ['0', '12', '-0.5', '3.', '.25', '1.005', '-2.675', '0.0000001', '1e3', '15e-3', ' 2.5 ', '1_000',
+             '123456789.123456789', '-99.995']
+    for code in ('USD', 'JPY', 'KWD'):
+        expected = [int(Decimal(text.strip()).scaleb(money.minor_units(code)).to_integral_value(rounding=rounding))
+                    for text in texts]
+        assert [money.to_minor(text, code, rounding) for text in texts] == expected
+        assert list(money.to_minor_many(texts, code, rounding)) == expected
+
+
+def test_format():
+    assert money.format_minor(-5, 'USD') == '-0.05'
+    assert money.format_minor(123456, 'JPY') == '123456'
+    assert money.format_minor(1234567, 'KWD') == '1234.567'
+    units = [0, -1, 5, 2 ** 52 - 1, -(2 ** 52) + 1, 10 ** 20]
+    for code in ('USD', 'JPY', 'KWD'):
+        assert money.format_many(units, code) == [money.format_minor(amount, code) for amount in units]
+    assert str(money.to_decimal(123456789012345678901234567890123, 'USD')) == '1234567890123456789012345678901.23'
+
+
+def test_engine_returns_decimal_minor_units(tmp_path):
+    engine = CalculatorEngine(dict(FALLBACK_RATES), rate_history_path=str(tmp_path))
+    assert engine.convert_currency('4392135', 'JPY', 'CAD') == Decimal('49910.62')
+    assert engine.convert_currency(1, 'JPY', 'USD', rounding=decimal.ROUND_UP) == Decimal('0.01')
+    assert engine.recent_history(1) == ['¥1 → $0.01']
@@ -0,0 +1,226 @@
+import json
+import math
+import random
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import rate_history
+from engine import CalculatorEngine
+from rate_history import RateHistory, day_number, read_snapshots
+
+# Stored days, deliberately uneven: a weekend gap and a longer one
+DAYS = ['2024-01-02', '2024-01-03', '2024-01-05', '2024-01-08', '2024-02-01']
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        return pytest.importorskip('numpy')
+    monkeypatch.setattr(rate_history, 'np', None)
+    return None
+
+
+@pytest.fixture
+def history(tmp_path, backend):
+    store = RateHistory(str(tmp_path / 'rates'))
+    snapshots = []
+    for index, day in enumerate(DAYS):
+        rates = {'EUR': 0.90 + index / 100, 'JPY': 140.0 + index}
+        # GBP only starts on the third day and skips the fourth
+        if index in (2, 4):
+            rates['GBP'] = 0.78 + index / 100
+        snapshots.append((day, rates))
+    assert store.import_snapshots(snapshots) == len(DAYS)
+    return store
+
+
+@pytest.mark.parametrize('day, index', [
+    ('2024-01-02', 0),
+    ('2024-01-03', 1),
+    # Between stored days the latest earlier day applies
+    ('2024-01-04', 1),
+    ('2024-01-06', 2),
+    ('2024-01-07', 2),
+    ('2024-01-08', 3),
+    ('2024-01-31', 3),
+    ('2024-02-01', 4),
+    # After the last stored day it keeps applying
+    ('2030-06-30', 4),
+])
+def test_as_of_lookup(history, day, index):
+    assert history.rate('EUR', day) == pytest.approx(0.90 + index / 100)
+    assert history.rate('JPY', date.fromisoformat(day)) == 140.0 + index
+    assert history.rates_on(day_number(day))['JPY'] == 140.0 + index
+
+
+@pytest.mark.parametrize('day', ['2024-01-01', '1999-12-31', date(2024, 1, 1)])
+def test_before_the_first_day_is_a_key_error(history, day):
+    with pytest.raises(KeyError):
+        history.rate('EUR', day)
+    with pytest.raises(KeyError):
+        history.rates_on(day)
+    with pytest.raises(KeyError):
+        history.convert_many([1.0, 1.0], 'EUR', 'JPY', ['2024-01-05', day])
+
+
+def test_missing_currency_carries_forward(history):
+    with pytest.raises(KeyError):
+        history.rate('GBP', '2024-01-03')
+    assert 'GBP' not in history.rates_on('2024-01-04')
+    assert history.rate('GBP', '2024-01-05') == pytest.approx(0.80)
+    assert history.rate('GBP', '2024-01-08') == pytest.approx(0.80)
+    assert history.rate('GBP', '2024-03-01') == pytest.approx(0.82)
+    with pytest.raises(KeyError):
+        history.rate('CHF', '2024-01-05')
+
+
+def test_day_formats_agree(history):
+    day = date(2024, 1, 6)
+    expected = history.rate('EUR', day)
+    for form in ['2024-01-06', ' 2024-01-06T12:00:00 ', datetime(2024, 1, 6, 23, 59), day.toordinal()]:
+        assert history.rate('EUR', form) == expected
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    (None, None, DAYS),
+    ('2024-01-03', '2024-01-08', DAYS[1:4]),
+    ('2024-01-04', '2024-01-07', DAYS[2:3]),
+    ('2024-01-06', '2024-01-07', []),
+    ('2023-01-01', '2024-01-02', DAYS[:1]),
+    ('2024-02-01', None, DAYS[4:]),
+    ('2024-02-02', None, []),
+])
+def test_series_bounds_are_inclusive(history, start, end, expected):
+    days, rates = history.series('JPY', start, end)
+    assert [date.fromordinal(int(day)).isoformat() for day in days] == expected
+    assert [float(rate) for rate in rates] == [140.0 + DAYS.index(day) for day in expected]
+
+
+def test_convert_many_matches_point_lookups(history, backend):
+    generator = random.Random(6)
+    first = day_number(DAYS[0])
+    days = [first + generator.randint(0, 60) for _ in range(500)]
+    codes = ['EUR', 'JPY', 'GBP']
+    from_codes = [generator.choice(codes) for _ in days]
+    to_codes = [generator.choice(codes) for _ in days]
+    amounts = [generator.uniform(1, 1000) for _ in days]
+    if backend is not None:
+        days = backend.array(days)
+    converted = history.convert_many(amounts, from_codes, to_codes, days)
+    for amount, from_code, to_code, day, value in zip(amounts, from_codes, to_codes, days, converted):
+        try:
+            expected = history.convert(amount, from_code, to_code, int(day))
+        except KeyError:
+            assert math.isnan(value)
+        else:
+            assert value == pytest.approx(expected, rel=1e-15)
+
+
+def test_convert_many_accepts_datetime64(history, backend):
+    if backend is None:
+        pytest.skip('datetime64 days need NumPy')
+    np = backend
+    days = np.array(['2024-01-02', '2024-01-04', '2025-01-01'], dtype='datetime64[D]')
+    converted = history.convert_many([1.0, 1.0, 1.0], 'EUR', 'JPY', days)
+    expected = [history.convert(1.0, 'EUR', 'JPY', str(day)) for day in days]
+    assert list(converted) == pytest.approx(expected)
+
+
+def test_merges_persist_and_newer_data_wins(history, tmp_path):
+    assert history.import_snapshots([('2024-01-04', {'EUR': 0.5}), ('2024-01-02', {'EUR': 0.7})]) == 2
+    reopened = RateHistory(str(tmp_path / 'rates'))
+    assert len(reopened) == len(DAYS) + 1
+    assert reopened.first_date == date(2024, 1, 2) and reopened.last_date == date(2024, 2, 1)
+    assert reopened.rate('EUR', '2024-01-02') == 0.7
+    assert reopened.rate('EUR', '2024-01-04') == 0.5
+    # JPY was not in the new day's data, so it carries the previous day's value
+    assert reopened.rate('JPY', '2024-01-04') == 141.0
+    assert reopened.rate('EUR', '2024-01-05') == pytest.approx(0.92)
+    assert sorted(path.name for path in (tmp_path / 'rates').iterdir() if path.is_dir()) == [
+        reopened.data_path.rsplit('/', 1)[-1]]
+
+
+def test_backfilled_gap_is_carried_forward(tmp_path, backend):
+    store = RateHistory(str(tmp_path / 'rates'))
+    store.import_snapshots([('2024-01-01', {'EUR': 0.90}), ('2024-01-03', {'GBP': 0.80}),
+                            ('2024-01-05', {'GBP': 0.81})])
+    assert store.rate('EUR', '2024-01-03') == 0.90
+    store.import_snapshots([('2024-01-02', {'EUR': 0.95})])
+    assert store.rate('EUR', '2024-01-01') == 0.90
+    assert store.rate('EUR', '2024-01-03') == 0.95
+    assert store.rate('EUR', '2024-01-05') == 0.95
+    store.import_snapshots([('2024-01-04', {'EUR': 0.97, 'GBP': 0.70})])
+    assert [float(rate) for rate in store.series('EUR')[1]] == [0.90, 0.95, 0.95, 0.97, 0.97]
+    assert [float(rate) for rate in store.series('GBP')[1]][2:] == [0.80, 0.70, 0.81]
+
+
+def test_store_without_quoted_flags_treats_stored_values_as_quoted(tmp_path):
+    store = RateHistory(str(tmp_path / 'rates'))
+    store.import_snapshots([('2024-01-01', {'EUR': 0.90}), ('2024-01-03', {'GBP': 0.80})])
+    for path in (tmp_path / 'rates').glob('*/*.quoted.u1'):
+        path.unlink()
+    store = RateHistory(str(tmp_path / 'rates'))
+    store.import_snapshots([('2024-01-02', {'EUR': 0.95})])
+    assert store.rate('EUR', '2024-01-02') == 0.95
+    assert store.rate('EUR', '2024-01-03') == 0.90
+    with pytest.raises(KeyError):
+        store.rate('GBP', '2024-01-02')
+
+
+def test_empty_and_corrupt_stores(tmp_path):
+    store = RateHistory(str(tmp_path / 'none'))
+    assert len(store) == 0 and store.first_date is None
+    with pytest.raises(KeyError):
+        store.rate('EUR', '2024-01-02')
+    (tmp_path / 'none').mkdir()
+    (tmp_path / 'none' / 'meta.json').write_text('{"schema": 99, "count": 3}')
+    assert len(RateHistory(str(tmp_path / 'none'))) == 0
+
+
+def test_read_snapshots(tmp_path):
+    wide = tmp_path / 'wide.csv'
+    wide.write_text('date,EUR,JPY\n2024-01-02,0.9,140\n2024-01-03,,141\n')
+    assert list(read_snapshots(str(wide))) == [
+        (day_number('2024-01-02'), {'EUR': 0.9, 'JPY': 140.0, 'USD': 1.0}),
+        (day_number('2024-01-03'), {'JPY': 141.0, 'USD': 1.0}),
+    ]
+    long = tmp_path / 'long.csv'
+    long.write_text('date,currency,rate\n2024-01-02,eur,0.9\n2024-01-02,JPY,140\n')
+    assert list(read_snapshots(str(long))) == [(day_number('2024-01-02'), {'EUR': 0.9, 'JPY': 140.0, 'USD': 1.0})]
+    series = tmp_path / 'series.json'
+    series.write_text(json.dumps({'base': 'EUR', 'rates': {'2024-01-02': {'USD': 2.0, 'JPY': 300.0}}}))
+    assert list(read_snapshots(str(series))) == [
+        (day_number('2024-01-02'), {'USD': 1.0, 'JPY': 150.0, 'EUR': 0.5})]
+    single = tmp_path / 'single.json'
+    single.write_text(json.dumps([{'date': '2024-01-02', 'base': 'USD', 'rates': {'EUR': 0.9}}]))
+    assert list(read_snapshots(str(single))) == [(day_number('2024-01-02'), {'EUR': 0.9, 'USD': 1.0})]
+    bad = tmp_path / 'bad.json'
+    bad.write_text(json.dumps({'date': '2024-01-02', 'base': 'EUR', 'rates': {'JPY': 160.0}}))
+    with pytest.raises(ValueError):
+        list(read_snapshots(str(bad)))
+
+
+@pytest.mark.parametrize('header', ['../../ESCAPED', 'EU', 'EURO', 'E/R', ''])
+def test_invalid_codes_are_rejected_before_writing(tmp_path, header):
+    path = tmp_path / 'rates.csv'
+    path.write_text(f'date,EUR,{header}\n2024-01-02,0.9,1.5\n')
+    store = RateHistory(str(tmp_path / 'store' / 'rates'))
+    with pytest.raises(ValueError, match='Invalid currency code'):
+        store.import_files([str(path)])
+    with pytest.raises(ValueError, match='Invalid currency code'):
+        store.import_snapshots([('2024-01-02', {header: 1.5})])
+    assert not (tmp_path / 'store').exists()
+    assert len(store) == 0
+
+
+def test_engine_converts_as_of(tmp_path):
+    engine = CalculatorEngine({'USD': 1.0, 'EUR': 0.5}, rate_history_path=str(tmp_path))
+    engine.rate_history.import_snapshots([('2024-01-02', {'EUR': 0.9}), ('2024-01-05', {'EUR': 0.8})])
+    assert engine.convert_currency('100', 'USD', 'EUR', as_of='2024-01-04') == Decimal('90.00')
+    assert engine.convert_currency('100', 'USD', 'EUR', as_of=date(2024, 1, 5)) == Decimal('80.00')
+    assert engine.convert_currency('100', 'USD', 'EUR') == Decimal('50.00')
+    with pytest.raises(KeyError):
+        engine.convert_currency('100', 'USD', 'EUR', as_of='2024-01-01')
+    assert engine.recent_history(1) == ['$100.00 → €50.00']
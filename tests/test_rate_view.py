@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+import pytest
+
+# rate_view imports tkinter, which some Python builds leave out
+rate_view = pytest.importorskip('rate_view')
+ROW_HEIGHT = rate_view.ROW_HEIGHT
+PrefixIndex = rate_view.PrefixIndex
+RateListView = rate_view.RateListView
+
+CODES = ['AUD', 'CAD', 'CHF', 'CNY', 'EUR', 'GBP', 'INR', 'JPY', 'KRW', 'USD']
+
+
+class FakeCanvas:
+    """The parts of a Tk canvas the view uses, with item texts kept in a dict"""
+
+    def __init__(self, height):
+        self.height = height
+        self.texts = {}
+
+    def winfo_height(self):
+        return self.height
+
+    def cget(self, option):
+        return str(self.height)
+
+    def create_text(self, x, y, **options):
+        item = len(self.texts) + 1
+        self.texts[item] = ''
+        return item
+
+    def itemconfigure(self, item, text):
+        self.texts[item] = text
+
+
+def make_view(rows=4, height=None, on_pick=None):
+    # A RateListView wired to fakes instead of widgets, as __init__ leaves it
+    view = RateListView.__new__(RateListView)
+    view.symbols = {'EUR': '€'}
+    view.on_pick = on_pick
+    view.rates = {}
+    view.index = PrefixIndex(())
+    view.codes = []
+    view.top = 0
+    view.items = []
+    view.shown = {}
+    view.canvas = FakeCanvas(rows * ROW_HEIGHT if height is None else height)
+    view.scrollbar = SimpleNamespace(set=lambda first, last: setattr(view, 'thumb', (first, last)))
+    view.query = SimpleNamespace(get=lambda: view.text)
+    view.text = ''
+    view.status = SimpleNamespace(config=lambda text: setattr(view, 'status_text', text))
+    view.set_rates({code: 1.0 + i for i, code in enumerate(CODES)}, "Fresh")
+    return view
+
+
+def visible(view):
+    return [text.split()[0] for text in view.canvas.texts.values() if text]
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('', CODES),
+    ('C', ['CAD', 'CHF', 'CNY']),
+    ('CH', ['CHF']),
+    ('CHF', ['CHF']),
+    ('CHFX', []),
+    ('A', ['AUD']),
+    ('U', ['USD']),
+    ('Z', []),
+    ('0', []),
+])
+def test_prefix_match(prefix, expected):
+    index = PrefixIndex(reversed(CODES))
+    assert len(index) == len(CODES)
+    assert index.match(prefix) == expected
+
+
+def test_renders_only_visible_rows():
+    view = make_view(rows=4)
+    assert len(view.canvas.texts) == 4
+    assert visible(view) == CODES[:4]
+    assert view.canvas.texts[1] == 'AUD  1 USD = 1.0000'
+    assert view.thumb == (0.0, 0.4)
+    assert view.status_text == "Fresh"
+
+
+@pytest.mark.parametrize('rows, top', [(3, 3), (-1, 0), (100, 6), (-100, 0)])
+def test_scroll_is_clamped(rows, top):
+    view = make_view(rows=4)
+    view.scroll(rows)
+    assert view.top == top
+    assert visible(view) == CODES[top:top + 4]
+    assert view.thumb == (top / 10, (top + 4) / 10)
+
+
+@pytest.mark.parametrize('args, top', [
+    (('moveto', '0.5'), 5),
+    (('moveto', '1.0'), 6),
+    (('moveto', '-0.2'), 0),
+    (('scroll', '1', 'units'), 1),
+    (('scroll', '1', 'pages'), 4),
+    (('scroll', '-1', 'pages'), 0),
+])
+def test_yview(args, top):
+    view = make_view(rows=4)
+    view.yview(*args)
+    assert view.top == top
+
+
+def test_filter_resets_the_position_and_shrinks_the_list():
+    view = make_view(rows=4)
+    view.scroll(5)
+    view.text = ' c '
+    view.apply_filter()
+    assert view.top == 0 and view.codes == ['CAD', 'CHF', 'CNY']
+    assert visible(view) == ['CAD', 'CHF', 'CNY']
+    assert view.thumb == (0.0, 1.0)
+    view.text = 'q'
+    view.apply_filter()
+    assert visible(view) == [] and view.thumb == (0.0, 1.0)
+
+
+def test_unlaid_canvas_uses_the_requested_height():
+    view = make_view(rows=3, height=1)
+    view.canvas.cget = lambda option: str(3 * ROW_HEIGHT)
+    view.render()
+    assert visible(view) == CODES[:3]
+
+
+def test_set_rates_relabels_changed_visible_rows():
+    view = make_view(rows=4)
+    rates = dict(view.rates, EUR=0.5, CAD=9.0)
+    view.set_rates(rates)
+    assert view.canvas.texts[2] == 'CAD  1 USD = 9.0000'
+    assert 'EUR' not in view.shown
+    view.scroll(4)
+    assert view.canvas.texts[1] == 'EUR  1 USD = €0.5000'
+    view.set_rates({'EUR': 0.9, 'USD': 1.0})
+    assert view.codes == ['EUR', 'USD'] and view.top == 0
+
+
+def test_pick():
+    picked = []
+    view = make_view(rows=4, height=4 * ROW_HEIGHT + 10, on_pick=picked.append)
+    view.scroll(2)
+    for y in (0, ROW_HEIGHT * 3 + 1, ROW_HEIGHT * 4 + 2, -5):
+        view._pick(SimpleNamespace(y=y))
+    assert picked == ['CHF', 'GBP']
+    view.text = 'J'
+    view.apply_filter()
+    view._pick(SimpleNamespace(y=ROW_HEIGHT))
+    assert picked == ['CHF', 'GBP']
@@ -0,0 +1,292 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from engine import CalculatorEngine
+from rates import (CACHE_SCHEMA_VERSION, FALLBACK_RATES, HedgedFetcher, RateCache, RateProvider, RatesUnavailable,
+                   fetch_exchange_rates)
+
+OLD_RATES = {'USD': 1.0, 'EUR': 0.85, 'JPY': 110.0}
+NEW_RATES = {'USD': 1.0, 'EUR': 0.9, 'JPY': 150.0}
+
+
+class RatesHandler(BaseHTTPRequestHandler):
+    # Serves self.server.rates with an ETag, honouring If-None-Match
+
+    def do_GET(self):
+        server = self.server
+        server.seen.append(dict(self.headers))
+        time.sleep(server.delay)
+        if server.status != 200:
+            self.send_response(server.status)
+            self.end_headers()
+            return
+        if server.etag and self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({'rates': server.rates}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if server.etag:
+            self.send_header('ETag', server.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def rate_server():
+    """Start local rate servers: rate_server(rates, etag=None, delay=0, status=200)"""
+    pytest.importorskip('requests')
+    servers = []
+
+    def start(rates=NEW_RATES, etag=None, delay=0, status=200):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), RatesHandler)
+        server.daemon_threads = True
+        server.rates, server.etag, server.delay, server.status = rates, etag, delay, status
+        server.seen = []
+        server.url = f'http://127.0.0.1:{server.server_address[1]}/latest'
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def closed_url():
+    # A port that was free a moment ago, so connections are refused
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/latest'
+
+
+def entry(age, rates=OLD_RATES, etag=None, provider='custom', ttl=3600):
+    return {'schema': CACHE_SCHEMA_VERSION, 'fetched_at': time.time() - age, 'ttl': ttl,
+            'provider': provider, 'etag': etag, 'last_modified': None, 'rates': dict(rates)}
+
+
+def test_fresh_cache_is_used_without_contacting_the_server(tmp_path, rate_server):
+    server = rate_server()
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=server.url, timeout=2)
+    cache.save(entry(age=10))
+    loaded = cache.load()
+    assert loaded['rates'] == OLD_RATES
+    assert not cache.is_stale(loaded)
+    assert fetch_exchange_rates(cache) == OLD_RATES
+    assert server.seen == []
+
+
+def test_stale_cache_is_refreshed_and_saved(tmp_path, rate_server):
+    server = rate_server()
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=server.url, timeout=2)
+    cache.save(entry(age=7200))
+    assert cache.is_stale(cache.load())
+    assert fetch_exchange_rates(cache) == NEW_RATES
+    assert len(server.seen) == 1
+    saved = cache.load()
+    assert saved['rates'] == NEW_RATES
+    assert not cache.is_stale(saved)
+
+
+def test_not_modified_keeps_rates_and_bumps_fetched_at(tmp_path, rate_server):
+    # The server would send NEW_RATES on a 200, so keeping OLD_RATES proves the 304 path
+    server = rate_server(etag='"v1"')
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=server.url, timeout=2)
+    old = entry(age=7200, etag='"v1"')
+    cache.save(old)
+    before = time.time()
+    new = cache.fetch(cache.load())
+    assert server.seen[0].get('If-None-Match') == '"v1"'
+    assert new['rates'] == OLD_RATES
+    assert new['etag'] == '"v1"'
+    assert new['fetched_at'] >= before > old['fetched_at']
+    assert cache.load() == new
+
+
+def test_etag_is_only_sent_to_the_provider_that_issued_it(tmp_path, rate_server):
+    server = rate_server(etag='"v1"')
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=server.url, timeout=2)
+    new = cache.fetch(entry(age=7200, etag='"v1"', provider='elsewhere'))
+    assert 'If-None-Match' not in server.seen[0]
+    assert new['rates'] == NEW_RATES
+    assert new['provider'] == 'custom'
+
+
+@pytest.mark.parametrize('content', [
+    json.dumps(dict(entry(age=0), schema=CACHE_SCHEMA_VERSION + 1)),
+    json.dumps({key: value for key, value in entry(age=0).items() if key != 'schema'}),
+    json.dumps(dict(entry(age=0), rates={})),
+    json.dumps([1, 2, 3]),
+    '{"schema": 1, "rates": {"USD"',
+])
+def test_unusable_cache_files_are_ignored(tmp_path, content):
+    path = tmp_path / 'rates.json'
+    path.write_text(content, encoding='utf-8')
+    assert RateCache(path=str(path)).load() is None
+
+
+def test_missing_cache_file(tmp_path):
+    assert RateCache(path=str(tmp_path / 'missing' / 'rates.json')).load() is None
+
+
+def test_save_creates_directories_and_replaces_the_file(tmp_path):
+    path = tmp_path / 'nested' / 'rates.json'
+    cache = RateCache(path=str(path))
+    cache.save(entry(age=0))
+    cache.save(entry(age=0, rates=NEW_RATES))
+    assert cache.load()['rates'] == NEW_RATES
+    assert os.listdir(path.parent) == ['rates.json']
+
+
+def test_failed_save_leaves_the_old_file_and_no_temporary(tmp_path):
+    path = tmp_path / 'rates.json'
+    cache = RateCache(path=str(path))
+    cache.save(entry(age=0))
+    original = path.read_bytes()
+    # json.dump fails part way through, after some of the file is written
+    broken = dict(entry(age=0), rates={'USD': 1.0, 'EUR': object()})
+    with pytest.raises(TypeError):
+        cache.save(broken)
+    assert path.read_bytes() == original
+    assert os.listdir(tmp_path) == ['rates.json']
+
+
+def test_offline_falls_back_to_the_stale_cache(tmp_path, closed_url):
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=closed_url, timeout=2)
+    cache.save(entry(age=7200))
+    assert fetch_exchange_rates(cache) == OLD_RATES
+    assert cache.load()['rates'] == OLD_RATES
+
+
+def test_offline_without_cache_uses_fallback_rates(tmp_path, closed_url):
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=closed_url, timeout=2)
+    rates = fetch_exchange_rates(cache)
+    assert rates == FALLBACK_RATES
+    assert rates is not FALLBACK_RATES
+    assert cache.load() is None
+
+
+def test_server_error_falls_back_to_the_stale_cache(tmp_path, rate_server):
+    server = rate_server(status=503)
+    cache = RateCache(path=str(tmp_path / 'rates.json'), url=server.url, timeout=2)
+    cache.save(entry(age=7200))
+    assert fetch_exchange_rates(cache) == OLD_RATES
+    assert server.seen
+
+
+@pytest.fixture
+def hedged():
+    """Build HedgedFetchers over (name, server) pairs and close them afterwards"""
+    fetchers = []
+
+    def build(*servers, **options):
+        fetcher = HedgedFetcher([RateProvider(name, server.url) for name, server in servers], **options)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield build
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def test_hedge_fires_after_hedge_after_and_fast_answer_wins(rate_server, hedged):
+    slow = rate_server(OLD_RATES, delay=1.5)
+    fast = rate_server(NEW_RATES)
+    fetcher = hedged(('slow', slow), ('fast', fast), hedge_after=0.2, timeout=5)
+    start = time.monotonic()
+    response = fetcher.fetch()
+    elapsed = time.monotonic() - start
+    assert response.provider == 'fast'
+    assert response.rates == NEW_RATES
+    assert 0.2 <= elapsed < 1.0
+    assert len(slow.seen) == 1 and len(fast.seen) == 1
+
+
+def test_no_hedge_when_the_first_provider_answers_in_time(rate_server, hedged):
+    first = rate_server(OLD_RATES)
+    second = rate_server(NEW_RATES)
+    fetcher = hedged(('first', first), ('second', second), hedge_after=1.0, timeout=5)
+    assert fetcher.fetch().provider == 'first'
+    assert second.seen == []
+
+
+@pytest.mark.parametrize('failing', [{'status': 500}, {'rates': {'EUR': -1.0}}, {'rates': {}}])
+def test_failing_provider_falls_through_without_waiting(rate_server, hedged, failing):
+    broken = rate_server(**failing)
+    working = rate_server(NEW_RATES)
+    fetcher = hedged(('broken', broken), ('working', working), hedge_after=3.0, timeout=5)
+    start = time.monotonic()
+    response = fetcher.fetch()
+    assert response.provider == 'working'
+    assert time.monotonic() - start < 1.0
+
+
+def test_unavailable_after_max_attempts(rate_server, hedged):
+    first = rate_server(status=500)
+    second = rate_server(status=502)
+    fetcher = hedged(('first', first), ('second', second), hedge_after=3.0, timeout=5, max_attempts=3)
+    with pytest.raises(RatesUnavailable) as error:
+        fetcher.fetch()
+    # Providers are retried in turn until max_attempts requests were sent
+    assert len(first.seen) == 2 and len(second.seen) == 1
+    assert 'status 500' in str(error.value) and 'status 502' in str(error.value)
+
+
+def test_unavailable_after_timeout(rate_server, hedged):
+    slow = rate_server(delay=2.0)
+    fetcher = hedged(('slow', slow), hedge_after=10.0, timeout=0.3)
+    start = time.monotonic()
+    with pytest.raises(RatesUnavailable):
+        fetcher.fetch()
+    assert time.monotonic() - start < 1.0
+
+
+def test_older_fetch_cannot_replace_newer_rates():
+    engine = CalculatorEngine()
+    published = []
+    engine.rates_listeners.append(published.append)
+    assert engine.set_rates(dict(NEW_RATES), 'new', fetched_at=200.0)
+    version = engine.rates_version
+    assert not engine.set_rates(dict(OLD_RATES), 'old', fetched_at=100.0)
+    assert not engine.apply_rates_entry(entry(age=0, rates=OLD_RATES) | {'fetched_at': 150.0})
+    assert engine.exchange_rates == NEW_RATES
+    assert engine.rates_version == version
+    assert [snapshot.status for snapshot in published] == ['new']
+    # The same fetch time or a later one replaces the rates
+    assert engine.set_rates(dict(OLD_RATES), 'same', fetched_at=200.0)
+    assert engine.rates_version == version + 1
+
+
+def test_concurrent_publishers_leave_the_newest_rates():
+    engine = CalculatorEngine()
+    times = list(range(1, 41))
+    random.Random(7).shuffle(times)
+    barrier = threading.Barrier(len(times))
+
+    def publish(fetched_at):
+        barrier.wait()
+        engine.set_rates({'USD': 1.0, 'EUR': fetched_at / 100}, str(fetched_at), fetched_at=fetched_at)
+
+    threads = [threading.Thread(target=publish, args=(fetched_at,)) for fetched_at in times]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert engine.rates.fetched_at == max(times)
+    assert engine.rates.status == str(max(times))
+    assert engine.exchange_rates['EUR'] == max(times) / 100
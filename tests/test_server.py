@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import server
+from expression import ExpressionError
+from server import CalculatorServer, evaluate_batch
+
+
+def exchange(lines, unix_path=None, prepare=None, **options):
+    """Start an offline server, pipeline lines on one connection and return the responses"""
+    async def main():
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        calculator = CalculatorServer(offline=True, **options)
+        task = asyncio.create_task(calculator.serve(port=0, unix_path=unix_path, ready=ready.set_result))
+        try:
+            address = await asyncio.wait_for(ready, 30)
+            if prepare:
+                prepare(calculator)
+            if unix_path:
+                reader, writer = await asyncio.open_unix_connection(address)
+            else:
+                host, port = address.rsplit(':', 1)
+                reader, writer = await asyncio.open_connection(host, int(port))
+            writer.write(b''.join((line if isinstance(line, str) else json.dumps(line)).encode() + b'\n'
+                                  for line in lines))
+            writer.write_eof()
+            responses = [json.loads(line) for line in (await asyncio.wait_for(reader.read(), 60)).splitlines()]
+            writer.close()
+            return responses
+        finally:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    return asyncio.run(main())
+
+
+REQUESTS = [
+    {'id': 1, 'op': 'evaluate', 'expression': '2**10 + 1'},
+    {'id': 'two', 'op': 'convert', 'amount': 110, 'from': 'JPY', 'to': 'USD'},
+    {'op': 'evaluate', 'expression': '1/0'},
+    {'id': 4, 'op': 'function', 'function': 'sqrt', 'value': 16},
+    {'id': 5, 'op': 'convert', 'amount': '4392135', 'from': 'jpy', 'to': 'cad'},
+    'not json',
+    {'id': 7, 'op': 'nope'},
+    {'id': 8, 'op': 'convert', 'amount': 1, 'from': 'USD', 'to': 'XXX'},
+    {'id': 9, 'op': 'convert', 'amount': 'ten', 'from': 'USD', 'to': 'EUR'},
+    {'id': 10, 'op': 'evaluate'},
+    {'id': 11, 'op': 'function', 'function': 'sqrt', 'value': -1},
+    {'id': 12, 'op': 'evaluate', 'expression': '9**9**9'},
+    {'id': 13, 'op': 'evaluate', 'expression': '3*4'},
+]
+
+EXPECTED = [
+    {'id': 1, 'result': 1025},
+    {'id': 'two', 'result': '1.00'},
+    {'error': 'division by zero'},
+    {'id': 4, 'result': 4.0},
+    {'id': 5, 'result': '49910.62'},
+    None,
+    {'id': 7, 'error': "Unknown op 'nope'"},
+    {'id': 8, 'error': 'Currency not found in exchange rates'},
+    {'id': 9, 'error': "Invalid amount 'ten'"},
+    {'id': 10, 'error': "Missing field 'expression'"},
+    {'id': 11, 'error': 'Math domain error'},
+    {'id': 12, 'error': 'Result too large'},
+    {'id': 13, 'result': 12},
+]
+
+
+def check(responses):
+    assert len(responses) == len(EXPECTED)
+    for response, expected in zip(responses, EXPECTED):
+        if expected is None:
+            assert set(response) == {'error'}
+        else:
+            assert response == expected
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_pipelined_requests_answer_in_order(workers):
+    check(exchange(REQUESTS, workers=workers))
+
+
+def test_unix_socket(tmp_path):
+    if not hasattr(asyncio, 'open_unix_connection'):
+        pytest.skip("No Unix sockets")
+    path = str(tmp_path / 'calc.sock')
+    check(exchange(REQUESTS, unix_path=path, workers=0))
+    assert not os.path.exists(path)
+
+
+def test_many_pipelined_requests_keep_their_ids():
+    lines = [{'id': i, 'op': 'evaluate' if i % 2 else 'convert', 'expression': f'{i}*2',
+              'amount': i, 'from': 'USD', 'to': 'EUR'} for i in range(3000)]
+    responses = exchange(lines, workers=0)
+    assert [response['id'] for response in responses] == list(range(3000))
+    assert all(response['result'] == (i * 2 if i % 2 else f'{i * 0.85:.2f}')
+               for i, response in enumerate(responses))
+
+
+def test_rates_request():
+    response, = exchange([{'op': 'rates'}], workers=0)
+    assert response['result']['rates']['JPY'] == 110.0
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'python'])
+def test_non_finite_function_results_are_errors(backend, monkeypatch):
+    import vectorized
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(vectorized, 'np', None)
+    lines = [{'op': 'function', 'function': func, 'value': value}
+             for func, value in [('log', 0), ('square', 1e200), ('sqrt', -1), ('cube', -2), ('ln', 1e-300)]]
+    assert exchange(lines, workers=0) == [
+        {'error': 'Math range error'},
+        {'error': 'Math range error'},
+        {'error': 'Math domain error'},
+        {'result': -8.0},
+        {'result': pytest.approx(-690.7755278982137)},
+    ]
+
+
+def test_large_products_are_refused_in_process():
+    # Sixteen of these would take the better part of a minute to multiply
+    start = time.monotonic()
+    response, = exchange([{'op': 'evaluate', 'expression': '*'.join(['7**370000'] * 16)}], workers=0)
+    assert response == {'error': 'Result too large'}
+    assert time.monotonic() - start < 10
+
+
+def slow_batch(texts):
+    # Each expression is the number of seconds to hang for
+    time.sleep(sum(float(text) for text in texts))
+    return [(True, float(text)) for text in texts]
+
+
+def crash_once(texts):
+    # Kills its worker the first time a marker file is missing
+    marker = os.environ['CRASH_MARKER']
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return evaluate_batch(texts)
+
+
+def crash_always(texts):
+    if texts == ['crash']:
+        os._exit(1)
+    return evaluate_batch(texts)
+
+
+def test_batch_timeout_in_process(monkeypatch):
+    # The thread cannot be stopped, so it only hangs briefly; the reply must not wait for it
+    def prepare(calculator):
+        monkeypatch.setattr(server, 'evaluate_batch', slow_batch)
+    responses = exchange([{'id': 1, 'op': 'evaluate', 'expression': '2'}, {'id': 2, 'op': 'rates'}],
+                         prepare=prepare, workers=0, timeout=0.3)
+    assert responses[0] == {'id': 1, 'error': 'Evaluation timed out'}
+    assert responses[1]['id'] == 2
+
+
+def test_batch_timeout_kills_and_replaces_the_pool(monkeypatch):
+    monkeypatch.setattr(server, 'evaluate_batch', slow_batch)
+
+    async def main():
+        calculator = CalculatorServer(workers=2, offline=True, timeout=2)
+        old_pool = calculator._start_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(old_pool, slow_batch, ['0.1']) for _ in range(2)])
+        try:
+            hung = asyncio.ensure_future(calculator._evaluate_batch(['30']))
+            await asyncio.sleep(1.8)
+            # Still running on the old pool when the hung batch's workers are killed
+            bystander = asyncio.ensure_future(calculator._evaluate_batch(['0.5']))
+            with pytest.raises(ExpressionError, match='timed out'):
+                await hung
+            assert calculator.pool is not old_pool
+            assert await bystander == [0.5]
+            assert await calculator._evaluate_batch(['0.1']) == [0.1]
+        finally:
+            calculator.pool.shutdown()
+        return old_pool
+
+    start = time.monotonic()
+    old_pool = asyncio.run(main())
+    assert time.monotonic() - start < 10
+    assert not any(process.is_alive() for process in (old_pool._processes or {}).values())
+
+
+def test_broken_pool_is_rebuilt_and_the_batch_retried(monkeypatch, tmp_path):
+    monkeypatch.setenv('CRASH_MARKER', str(tmp_path / 'crashed'))
+
+    def prepare(calculator):
+        monkeypatch.setattr(server, 'evaluate_batch', crash_once)
+    responses = exchange([{'id': 1, 'op': 'evaluate', 'expression': '6*7'}], prepare=prepare, workers=1)
+    assert responses == [{'id': 1, 'result': 42}]
+    assert os.path.exists(tmp_path / 'crashed')
+
+
+def test_batch_that_keeps_crashing_fails_alone(monkeypatch):
+    def prepare(calculator):
+        monkeypatch.setattr(server, 'evaluate_batch', crash_always)
+
+    lines = [{'id': 1, 'op': 'evaluate', 'expression': 'crash'}]
+    responses = exchange(lines, prepare=prepare, workers=1)
+    assert responses == [{'id': 1, 'error': 'Worker process failed'}]
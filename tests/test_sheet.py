@@ -0,0 +1,162 @@
+import pickle
+import random
+import time
+
+import pytest
+
+from expression import ExpressionError
+from sheet import Sheet, UserFunction, parse_definition
+
+
+def assert_topological(sheet, recomputed):
+    position = {name: index for index, name in enumerate(recomputed)}
+    for name in recomputed:
+        for dependency in sheet.dependencies[name]:
+            if dependency in position:
+                assert position[dependency] < position[name], (dependency, name, recomputed)
+
+
+def test_chain_recomputes_in_dependency_order():
+    sheet = Sheet()
+    for text in ['a = 1', 'b = a*2', 'c = b+a', 'd = c*b', 'z = 7']:
+        sheet.define(text)
+    assert sheet.values == {'a': 1, 'b': 2, 'c': 3, 'd': 6, 'z': 7}
+    recomputed = sheet.define('a = 2')
+    assert sorted(recomputed) == ['a', 'b', 'c', 'd']
+    assert_topological(sheet, recomputed)
+    assert sheet.values == {'a': 2, 'b': 4, 'c': 6, 'd': 24, 'z': 7}
+
+
+def test_unchanged_value_stops_the_update():
+    sheet = Sheet()
+    for text in ['a = 1', 'b = a*0', 'c = b+1', 'd = a+c']:
+        sheet.define(text)
+    recomputed = sheet.define('a = 5')
+    assert sorted(recomputed) == ['a', 'b', 'd']
+    assert sheet.values['d'] == 6
+
+
+def test_random_graphs_match_a_full_recompute():
+    generator = random.Random(2)
+    for _ in range(30):
+        sheet = Sheet()
+        definitions = {}
+        names = [f'v{i}' for i in range(12)]
+        for index, name in enumerate(names):
+            inputs = generator.sample(names[:index], min(index, generator.randint(0, 3)))
+            source = '+'.join([str(generator.randint(1, 9))] + [f'{generator.randint(1, 3)}*{n}' for n in inputs])
+            definitions[name] = source
+            sheet.set(name, None, source)
+        for _ in range(10):
+            name = generator.choice(names[:4])
+            definitions[name] = str(generator.randint(0, 50))
+            recomputed = sheet.set(name, None, definitions[name])
+            assert recomputed[0] == name
+            assert_topological(sheet, recomputed)
+        expected = Sheet()
+        for name in names:
+            expected.set(name, None, definitions[name])
+        assert sheet.values == expected.values
+
+
+@pytest.mark.parametrize('texts, cycle', [
+    (['a = 1'], 'a = a + 1'),
+    (['a = 1', 'b = a*2'], 'a = b + 1'),
+    (['a = 1', 'b = a', 'c = b', 'd = c'], 'a = d'),
+    (['a = 1', 'f(x) = x + a'], 'a = f(2)'),
+])
+def test_cycles_are_rejected_and_leave_the_sheet_unchanged(texts, cycle):
+    sheet = Sheet()
+    for text in texts:
+        sheet.define(text)
+    values, dependencies, version = dict(sheet.values), dict(sheet.dependencies), sheet.version
+    with pytest.raises(ExpressionError, match='Circular reference'):
+        sheet.define(cycle)
+    assert sheet.values == values
+    assert sheet.dependencies == dependencies
+    assert sheet.version == version
+
+
+def test_forward_references_resolve_once_defined():
+    sheet = Sheet()
+    sheet.define('total = price * qty')
+    assert "Unknown name" in sheet.errors['total']
+    sheet.define('price = 2.5')
+    sheet.define('qty = 4')
+    assert sheet.values['total'] == 10.0
+    assert 'total' not in sheet.errors
+
+
+def test_remove_reports_errors_downstream():
+    sheet = Sheet()
+    for text in ['a = 3', 'b = a*a', 'c = b+1']:
+        sheet.define(text)
+    recomputed = sheet.remove('a')
+    assert recomputed == ['b', 'c']
+    assert 'a' not in sheet and 'a' not in sheet.values
+    assert set(sheet.errors) == {'b', 'c'}
+    sheet.define('a = 2')
+    assert sheet.values['c'] == 5 and not sheet.errors
+
+
+def test_functions_rebind_when_their_inputs_change():
+    sheet = Sheet()
+    for text in ['rate = 2', 'f(x) = x * rate', 'y = f(3)']:
+        sheet.define(text)
+    assert sheet.values['y'] == 6
+    sheet.define('rate = 3')
+    assert sheet.values['y'] == 9
+    function = sheet.values['f']
+    assert isinstance(function, UserFunction)
+    assert pickle.loads(pickle.dumps(function))(5) == 15
+    with pytest.raises(ExpressionError, match='Expected 1 argument'):
+        sheet.evaluate('f(1, 2)')
+
+
+def test_version_changes_only_with_values():
+    sheet = Sheet()
+    sheet.define('a = 1')
+    version = sheet.version
+    sheet.define('a = 1')
+    assert sheet.version == version
+    sheet.define('a = 1.0')
+    assert sheet.version == version + 1
+
+
+@pytest.mark.parametrize('text', ['sin = 2', 'pi = 3', 'f(x, x) = x', 'f(f) = 1'])
+def test_invalid_definitions(text):
+    with pytest.raises(ExpressionError):
+        Sheet().define(text)
+
+
+def test_parse_definition():
+    assert parse_definition('rate = 1.07') == ('rate', None, '1.07')
+    assert parse_definition(' f( x , y ) = x*y ') == ('f', ('x', 'y'), 'x*y')
+    assert parse_definition('g() = 4') == ('g', (), '4')
+    assert parse_definition('a == b') is None
+    assert parse_definition('2 + 3') is None
+
+
+def test_budget_stops_huge_definitions():
+    sheet = Sheet(1 << 20)
+    start = time.perf_counter()
+    sheet.define('a = ' + '*'.join(['7**370000'] * 16))
+    sheet.define('b = 7**370000')
+    sheet.define('c = b*b*b*b*b*b*b*b')
+    sheet.define('d = c + 1')
+    assert time.perf_counter() - start < 5
+    assert sheet.errors == {'a': 'Result too large', 'c': 'Result too large', 'd': "Unknown name 'c'"}
+    assert sheet.values['b'] == 7 ** 370000
+    # Each node gets the whole budget, not what its inputs left over
+    sheet.define('z = b*7')
+    assert sheet.values['z'] == 7 ** 370001
+
+
+def test_describe():
+    sheet = Sheet()
+    for text in ['a = 2**20000', 'b = a // 2**19990', 'f(x) = x + b', 'c = missing']:
+        sheet.define(text)
+    assert sheet.describe('a') == 'a = 3.98027684033e+6020'
+    assert sheet.describe('b') == 'b = a//2**19990  → 1024'
+    assert sheet.describe('f') == 'f(x) = x+b'
+    assert sheet.describe('c') == "c = missing  → Unknown name 'missing'"
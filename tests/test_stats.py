@@ -0,0 +1,156 @@
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+import stats
+from stats import QuantileSketch, RunningStats, parse_lines, parse_text, summarize_file, summarize_text
+
+
+def two_pass(values):
+    """Exact mean and sample variance, computed with fractions"""
+    exact = [Fraction(value) for value in values]
+    mean = sum(exact) / len(exact)
+    variance = sum((value - mean) ** 2 for value in exact) / (len(exact) - 1)
+    return float(mean), float(variance)
+
+
+def datasets():
+    generator = random.Random(4)
+    yield [generator.gauss(0, 1) for _ in range(1000)]
+    # A large offset is where the sum-of-squares formula loses every digit
+    yield [1e9 + generator.random() for _ in range(1000)]
+    yield [generator.choice([-1e6, 1e-6, 3.0]) * generator.random() for _ in range(500)]
+    yield [2.5, 2.5]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        return pytest.importorskip('numpy')
+    monkeypatch.setattr(stats, 'np', None)
+    return None
+
+
+def check(accumulator, values):
+    # Each deviation from a mean near 1e9 is only good to about 1e-7, so
+    # 1e-6 is what a stable method keeps; sum-of-squares loses every digit
+    mean, variance = two_pass(values)
+    assert accumulator.count == len(values)
+    assert accumulator.mean == pytest.approx(mean, rel=1e-12, abs=1e-12)
+    assert accumulator.variance == pytest.approx(variance, rel=1e-6)
+    assert accumulator.sum == pytest.approx(math.fsum(values), rel=1e-15, abs=1e-12)
+    assert accumulator.min == min(values) and accumulator.max == max(values)
+
+
+@pytest.mark.parametrize('values', list(datasets()))
+def test_streaming_matches_two_pass(values):
+    accumulator = RunningStats()
+    for value in values:
+        accumulator.add(value)
+    check(accumulator, values)
+
+
+@pytest.mark.parametrize('values', list(datasets()))
+def test_merged_splits_match_two_pass(values):
+    generator = random.Random(len(values))
+    for _ in range(20):
+        cuts = sorted(generator.sample(range(len(values) + 1), min(4, len(values) + 1)))
+        parts = [values[start:end] for start, end in zip([0] + cuts, cuts + [len(values)])]
+        total = RunningStats()
+        for part in parts:
+            accumulator = RunningStats()
+            accumulator.extend(part)
+            total.merge(accumulator)
+        check(total, values)
+
+
+@pytest.mark.parametrize('values', list(datasets()))
+def test_numpy_chunks_match_two_pass(values):
+    np = pytest.importorskip('numpy')
+    accumulator = RunningStats()
+    for chunk in np.array_split(np.array(values), 7):
+        accumulator.extend(chunk)
+    check(accumulator, values)
+
+
+def test_empty_and_single():
+    accumulator = RunningStats()
+    accumulator.merge(RunningStats())
+    assert accumulator.count == 0 and math.isnan(accumulator.variance)
+    accumulator.add(3.0)
+    assert accumulator.mean == 3.0 and math.isnan(accumulator.variance)
+
+
+def test_compensated_sum():
+    accumulator = RunningStats()
+    accumulator.extend([1e16, 1.0, -1e16] * 100)
+    assert accumulator.sum == 100.0
+
+
+def test_sketch_is_exact_until_full():
+    sketch = QuantileSketch(k=64, seed=1)
+    values = [float(value) for value in range(63)]
+    random.Random(1).shuffle(values)
+    sketch.extend(values)
+    assert sketch.exact
+    assert sketch.quantiles((0.0, 0.5, 1.0)) == {0.0: 0.0, 0.5: 31.0, 1.0: 62.0}
+
+
+def test_sketch_ranks_stay_close(backend):
+    count = 200000
+    generator = random.Random(9)
+    values = [generator.random() for _ in range(count)]
+    sketch = QuantileSketch(k=256, seed=3)
+    if backend is not None:
+        for start in range(0, count, 10000):
+            sketch.extend(backend.array(values[start:start + 10000]))
+    else:
+        sketch.extend(values)
+    assert not sketch.exact
+    assert sketch.count == count
+    assert len(sketch) < 256 * 12
+    ordered = sorted(values)
+    for q, value in sketch.quantiles().items():
+        rank = ordered.index(value) / count
+        assert abs(rank - q) < 0.02, (q, rank)
+
+
+def test_parse_text():
+    assert parse_text('x, 1, 2.5;3\n\tnan inf -4e2 total') == ([1.0, 2.5, 3.0, -400.0], 4)
+
+
+def test_parse_lines_columns_and_headers():
+    lines = [b'name,price\n', b'a,1.5\n', b'b,2\n', b'c,oops\n', b'\n', b'd,4\n']
+    assert parse_lines(lines, column=1) == ([1.5, 2.0, 4.0], 2)
+    assert parse_lines([b'1 2\n', b'3 4\n'], column=1) == ([2.0, 4.0], 0)
+    assert parse_lines([b'1\n', b'2\n', b'3\n']) == ([1.0, 2.0, 3.0], 0)
+
+
+def test_summarize_text(backend):
+    summary = summarize_text('1 2 3 4 x')
+    assert (summary.count, summary.sum, summary.mean, summary.skipped, summary.exact) == (4, 10.0, 2.5, 1, True)
+    assert summary.variance == pytest.approx(5 / 3)
+    assert summary.quantiles[0.5] == 2.5
+    empty = summarize_text('none here')
+    assert empty.count == 0 and math.isnan(empty.mean)
+
+
+@pytest.mark.parametrize('in_memory_bytes', [0, 1 << 30])
+def test_summarize_file_matches_two_pass(tmp_path, backend, monkeypatch, in_memory_bytes):
+    monkeypatch.setattr(stats, 'CHUNK_LINES', 1000)
+    generator = random.Random(5)
+    values = [round(1e6 + generator.gauss(0, 3), 6) for _ in range(5000)]
+    path = tmp_path / 'data.csv'
+    path.write_text('id,value\n' + ''.join(f'{i},{value}\n' for i, value in enumerate(values)))
+    progress = []
+    summary = summarize_file(str(path), column=1, progress=progress.append, in_memory_bytes=in_memory_bytes)
+    mean, variance = two_pass(values)
+    assert summary.count == 5000 and summary.skipped == 1
+    assert summary.mean == pytest.approx(mean, rel=1e-12)
+    assert summary.variance == pytest.approx(variance, rel=1e-6)
+    assert summary.sum == pytest.approx(math.fsum(values), rel=1e-15)
+    assert progress[-1] == 1.0
+    ordered = sorted(values)
+    assert summary.quantiles[0.5] == pytest.approx(ordered[2500], abs=0.1)
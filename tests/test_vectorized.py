@@ -0,0 +1,95 @@
+import math
+
+import pytest
+
+import vectorized
+from vectorized import FUNCTION_NAMES, apply_function, parse_values, value_range, write_table
+
+# Ordinary values plus every edge where the math module raises or overflows
+VALUES = [0.0, -0.0, 1.0, -1.0, 0.5, 2.0, 30.0, 90.0, -27.0, 1e-300, 1e200, -1e200, 1e308,
+          math.inf, -math.inf, math.nan]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        return pytest.importorskip('numpy')
+    monkeypatch.setattr(vectorized, 'np', None)
+    return None
+
+
+def same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == pytest.approx(b, rel=1e-12, abs=1e-300)
+
+
+@pytest.mark.parametrize('func', FUNCTION_NAMES)
+def test_python_path_matches_numpy(func, monkeypatch):
+    pytest.importorskip('numpy')
+    expected = [float(value) for value in apply_function(func, VALUES)]
+    monkeypatch.setattr(vectorized, 'np', None)
+    results = apply_function(func, VALUES)
+    assert isinstance(results, list)
+    for value, result, wanted in zip(VALUES, results, expected):
+        assert same(result, wanted), (func, value, result, wanted)
+
+
+@pytest.mark.parametrize('func, value, expected', [
+    ('log', 0.0, -math.inf),
+    ('ln', -0.0, -math.inf),
+    ('log', -1.0, math.nan),
+    ('sqrt', -4.0, math.nan),
+    ('square', 1e200, math.inf),
+    ('square', -1e200, math.inf),
+    ('cube', -1e200, -math.inf),
+    ('cbrt', -27.0, -3.0),
+    ('sin', 30.0, 0.5),
+    ('sin', math.inf, math.nan),
+    ('log', 1000.0, 3.0),
+])
+def test_edge_values(func, value, expected, backend):
+    result, = apply_function(func, [value])
+    assert same(float(result), expected)
+
+
+def test_unknown_function(backend):
+    with pytest.raises(ValueError, match='Unknown function'):
+        apply_function('exp', [1.0])
+
+
+@pytest.mark.parametrize('start, stop, step, expected', [
+    (0, 1, 0.25, [0.0, 0.25, 0.5, 0.75, 1.0]),
+    (1, 0, -0.5, [1.0, 0.5, 0.0]),
+    (0, 0.3, 0.1, [0.0, 0.1, 0.2, 0.30000000000000004]),
+    (5, 5, 1, [5.0]),
+    (0, 0.95, 0.5, [0.0, 0.5]),
+])
+def test_value_range(start, stop, step, expected, backend):
+    assert [float(value) for value in value_range(start, stop, step)] == expected
+
+
+def test_value_range_does_not_accumulate_error(backend):
+    values = value_range(0, 100000, 0.1)
+    assert len(values) == 1000001
+    assert float(values[-1]) == 100000.0
+    assert float(values[777777]) == 777777 * 0.1
+
+
+@pytest.mark.parametrize('start, stop, step', [(0, 1, 0), (1, 0, 0.5)])
+def test_bad_ranges(start, stop, step, backend):
+    with pytest.raises(ValueError):
+        value_range(start, stop, step)
+
+
+def test_parse_values(backend):
+    values = parse_values(' 1, 2.5;3\n\t-4e2  ,, 1e-3\n')
+    assert [float(value) for value in values] == [1.0, 2.5, 3.0, -400.0, 0.001]
+    assert len(parse_values('')) == 0
+    with pytest.raises(ValueError):
+        parse_values('1 two 3')
+
+
+def test_write_table(tmp_path, backend):
+    path = tmp_path / 'table.csv'
+    inputs = value_range(0, 2, 1)
+    write_table(str(path), 'square', inputs, apply_function('square', inputs))
+    assert path.read_text() == 'x,square(x)\n0.0,0.0\n1.0,1.0\n2.0,4.0\n'
@@ -0,0 +1,100 @@
+import math
+import re
+
+from expression import FUNCTIONS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FUNCTION_NAMES = ['sin', 'cos', 'tan', 'log', 'ln', 'sqrt', 'cbrt', 'square', 'cube']
+
+if np is not None:
+    # Trig works in degrees, matching scientific_function. cbrt returns the
+    # real cube root so negative inputs give a value rather than NaN.
+    NUMPY_FUNCTIONS = {
+        'sin': lambda values: np.sin(np.radians(values)),
+        'cos': lambda values: np.cos(np.radians(values)),
+        'tan': lambda values: np.tan(np.radians(values)),
+        'log': np.log10,
+        'ln': np.log,
+        'sqrt': np.sqrt,
+        'cbrt': np.cbrt,
+        'square': np.square,
+        'cube': lambda values: np.power(values, 3),
+    }
+else:
+    NUMPY_FUNCTIONS = {}
+
+
+def _python_cbrt(value):
+    return math.copysign(abs(value) ** (1/3), value)
+
+
+def _python_function(func):
+    scalar = _python_cbrt if func == 'cbrt' else FUNCTIONS[func]
+
+    def apply(value):
+        # Give what NumPy gives where the math module raises instead
+        try:
+            return float(scalar(value))
+        except OverflowError:
+            if func == 'square':
+                return math.inf
+            if func == 'cube':
+                return math.copysign(math.inf, value)
+            return math.nan
+        except ValueError:
+            # The logarithms' pole at zero is -inf; other domain errors are NaN
+            return -math.inf if func in ('log', 'ln') and value == 0 else math.nan
+    return apply
+
+
+def apply_function(func, values):
+    """Apply a scientific function to every value in one call
+
+    Returns a NumPy array when NumPy is installed and a list otherwise.
+    """
+    if func not in FUNCTION_NAMES:
+        raise ValueError(f"Unknown function {func!r}")
+    if np is not None:
+        with np.errstate(all='ignore'):
+            return NUMPY_FUNCTIONS[func](np.asarray(values, dtype=float))
+    apply = _python_function(func)
+    return [apply(value) for value in values]
+
+
+def value_range(start, stop, step):
+    """Values from start to stop inclusive in increments of step
+
+    Each value is computed as start + i * step so rounding errors do not
+    accumulate over long ranges.
+    """
+    if step == 0:
+        raise ValueError("Step must not be zero")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    if count <= 0:
+        raise ValueError("Empty range")
+    if np is not None:
+        return start + step * np.arange(count, dtype=float)
+    return [float(start + step * i) for i in range(count)]
+
+
+def parse_values(text):
+    """Parse a pasted column of numbers separated by whitespace, commas or semicolons"""
+    parts = [part for part in re.split(r'[\s,;]+', text) if part]
+    if np is not None:
+        return np.array(parts, dtype=float)
+    return [float(part) for part in parts]
+
+
+def write_table(path, func, inputs, outputs):
+    """Write a function table to a CSV file"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f"x,{func}(x)\n")
+        file.writelines(f"{x!r},{y!r}\n" for x, y in zip(_to_list(inputs), _to_list(outputs)))
+
+
+def _to_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else values